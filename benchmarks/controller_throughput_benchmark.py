@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+'''
+Frame rate at which CameraController saturates: a SyntheticStressCamera
+feeds the controller at increasing rates, and for each rate the table
+shows the rate achieved by the camera, the rate actually published on
+the PUB socket (with nobody subscribed), the frames dropped by the
+dispatcher queue and the p99 of the receive to publish latency.
+
+Usage: python benchmarks/controller_throughput_benchmark.py [rows cols]
+'''
+import itertools
+import sys
+import time
+import zmq
+from plico.rpc.zmq_remote_procedure_call import ZmqRemoteProcedureCall
+from pysilico_server.camera_controller.camera_controller import \
+    CameraController
+from pysilico_server.devices.synthetic_stress_camera import \
+    SyntheticStressCamera
+from pysilico_server.utils.frame_protocol import FrameProtocol
+
+FRAME_RATES = [1000, 2000, 5000, 10000, 20000, 50000]
+PROTOCOLS = [FrameProtocol.PICKLE, FrameProtocol.RAW]
+DURATION_SEC = 2.
+_addresses = itertools.count()
+
+
+def measure(context, shape, protocol, frameRate):
+    camera = SyntheticStressCamera(shape=shape, frameRate=frameRate)
+    sockets = [context.socket(zmq.PUB) for _ in range(3)]
+    for socket in sockets:
+        socket.bind('inproc://throughput%d' % next(_addresses))
+    replySocket = context.socket(zmq.REP)
+    sockets.append(replySocket)
+    controller = CameraController(
+        'benchmark', 0, camera, replySocket, sockets[0],
+        sockets[1], sockets[2], ZmqRemoteProcedureCall(),
+        frameProtocol=protocol)
+    try:
+        camera.startAcquisition()
+        time.sleep(DURATION_SEC)
+        camera.stopAcquisition()
+        achieved = camera.getParameters()['achievedFrameRate']
+        dispatcher = controller.getFrameDispatcherStatistics()
+        latency = controller.getLatencyHistograms()['total']
+    finally:
+        controller.stopFramePipeline()
+        for socket in sockets:
+            socket.close(linger=0)
+    return (achieved, dispatcher['publishedFrames'] / DURATION_SEC,
+            dispatcher['droppedFrames'], latency['p99Sec'])
+
+
+def main(shape=(240, 240)):
+    context = zmq.Context()
+    print('%-10s %-8s %10s %10s %12s %8s %14s' % (
+        'shape', 'protocol', 'requested', 'camera', 'published',
+        'dropped', 'p99 total [us]'))
+    for protocol in PROTOCOLS:
+        for frameRate in FRAME_RATES:
+            achieved, published, dropped, p99 = measure(
+                context, shape, protocol, frameRate)
+            print('%-10s %-8s %10d %10.0f %12.0f %8d %14.0f' % (
+                '%dx%d' % shape, protocol, frameRate, achieved, published,
+                dropped, p99 * 1e6 if p99 is not None else float('nan')))
+    context.term()
+
+
+if __name__ == "__main__":
+    main(tuple(int(n) for n in sys.argv[1:3]) or (240, 240))
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+'''
+Compare the dark subtraction of FrameCorrector with the former
+CameraController path (frame - dark, then a new CameraFrame),
+both with a uint16 dark and with a float64 dark.
+
+Usage: python benchmarks/dark_subtraction_benchmark.py
+'''
+import timeit
+import numpy as np
+from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.frame_corrector import FrameCorrector
+
+FRAME_SHAPES = [(240, 240), (512, 512), (1024, 1360), (2048, 2048)]
+
+
+def formerPath(frame, darkFrame):
+    return CameraFrame.fromNumpyArray(
+        frame.toNumpyArray() - darkFrame.toNumpyArray(),
+        frame.counter())
+
+
+class FloatDarkFrame(CameraFrame):
+
+    def __init__(self, array):
+        self._array = array.astype(np.float64)
+        self._counter = 0
+
+
+def bestTimeInSec(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(repeat=5, number=100):
+    print('%-12s %-8s %14s %14s %8s' % (
+        'shape', 'dark', 'former [us]', 'corrector [us]', 'speedup'))
+    for shape in FRAME_SHAPES:
+        rng = np.random.default_rng(0)
+        frame = CameraFrame(rng.integers(0, 4096, shape, dtype=np.uint16))
+        dark = rng.integers(0, 100, shape, dtype=np.uint16)
+        for darkFrame in [CameraFrame(dark), FloatDarkFrame(dark)]:
+            corrector = FrameCorrector(BufferPool())
+            corrector.setDarkFrame(darkFrame.toNumpyArray())
+            former = bestTimeInSec(lambda: formerPath(frame, darkFrame),
+                                   repeat, number)
+            current = bestTimeInSec(
+                lambda: corrector.correct(frame.toNumpyArray()),
+                repeat, number)
+            print('%-12s %-8s %14.1f %14.1f %8.2f' % (
+                '%dx%d' % shape, darkFrame.toNumpyArray().dtype,
+                former * 1e6, current * 1e6, former / current))
+
+
+if __name__ == "__main__":
+    main()
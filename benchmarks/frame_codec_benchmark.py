@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+'''
+Compression ratio and encoding time per frame of the FrameCodec
+options, on sequences of frames of the simulated cameras at binning 1
+and 4, with the default read noise and with a low one (mostly static
+images). Codecs whose package (lz4, zstandard) is not installed are
+skipped.
+
+Usage: python benchmarks/frame_codec_benchmark.py
+'''
+import importlib.util
+import itertools
+import time
+from pysilico_server.devices.simulated_auxiliary_camera import \
+    SimulatedAuxiliaryCamera
+from pysilico_server.devices.simulated_camera import \
+    SimulatedPyramidWfsCamera
+from pysilico_server.utils.frame_codec import FrameCodec
+
+CAMERAS = [SimulatedAuxiliaryCamera, SimulatedPyramidWfsCamera]
+BINNINGS = [1, 4]
+NOISES = [10., 1.]
+CODECS = ['zlib', 'zlib+shuffle', 'zlib+shuffle+delta',
+          'lz4+shuffle', 'lz4+shuffle+delta',
+          'zstd+shuffle', 'zstd+shuffle+delta']
+PACKAGES = {'lz4': 'lz4', 'zstd': 'zstandard'}
+N_FRAMES = 20
+
+
+def simulatedFrames(cameraClass, binning, noise, nFrames):
+    camera = cameraClass()
+    try:
+        camera.setBinning(binning)
+        camera.setNoiseInCount(noise)
+        return [camera._computeFrameFromWavefront() for _ in range(nFrames)]
+    finally:
+        camera.deinitialize()
+
+
+def isAvailable(codecName):
+    package = PACKAGES.get(codecName.split('+')[0])
+    return package is None or importlib.util.find_spec(package) is not None
+
+
+def main():
+    print('%-28s %-10s %6s %-20s %8s %14s' % (
+        'camera', 'shape', 'noise', 'codec', 'ratio', 'encode [ms]'))
+    for cameraClass, binning, noise in itertools.product(
+            CAMERAS, BINNINGS, NOISES):
+        frames = simulatedFrames(cameraClass, binning, noise, N_FRAMES)
+        shape = '%dx%d' % frames[0].shape
+        for name in CODECS:
+            if not isAvailable(name):
+                print('%-28s %-10s %6.0f %-20s %8s' % (
+                    cameraClass.__name__, shape, noise, name, 'n/a'))
+                continue
+            codec = FrameCodec.fromName(name)
+            t0 = time.perf_counter()
+            for counter, frame in enumerate(frames):
+                codec.encode(frame, counter)
+            elapsed = (time.perf_counter() - t0) / len(frames)
+            print('%-28s %-10s %6.0f %-20s %8.2f %14.2f' % (
+                cameraClass.__name__, shape, noise, name,
+                codec.getStatistics()['compressionRatio'], elapsed * 1e3))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+'''
+Compare the PICKLE and RAW frame encodings of FrameProtocol: encoding
+only, and encoding plus a send/receive over an inproc ZMQ socket pair.
+RAW is measured both copying the buffer into ZMQ and handing it over
+with copy=False.
+
+Usage: python benchmarks/frame_protocol_benchmark.py
+'''
+import timeit
+import numpy as np
+import zmq
+from pysilico_server.utils.frame_protocol import FrameProtocol
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+FRAME_SHAPES = [(240, 240), (1024, 1360), (2048, 2048)]
+ENCODINGS = [('pickle', FrameProtocol.PICKLE, True),
+             ('raw', FrameProtocol.RAW, True),
+             ('raw-nocopy', FrameProtocol.RAW, False)]
+
+
+def bestTimeInSec(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def roundTrip(sender, receiver, frame, protocol, copy):
+    FrameProtocol.send(sender, frame, protocol, copy=copy)
+    return FrameProtocol.decode(receiver.recv_multipart(copy=False))
+
+
+def main(repeat=5, number=50):
+    context = zmq.Context()
+    sender = context.socket(zmq.PAIR)
+    receiver = context.socket(zmq.PAIR)
+    sender.bind('inproc://benchmark')
+    receiver.connect('inproc://benchmark')
+    print('%-12s %-12s %12s %16s' % (
+        'shape', 'encoding', 'encode [us]', 'round trip [us]'))
+    for shape in FRAME_SHAPES:
+        rng = np.random.default_rng(0)
+        frame = cameraFrameFromArray(
+            rng.integers(0, 4096, shape, dtype=np.uint16), 1)
+        for name, protocol, copy in ENCODINGS:
+            encode = bestTimeInSec(
+                lambda: FrameProtocol.encode(frame, protocol),
+                repeat, number)
+            trip = bestTimeInSec(
+                lambda: roundTrip(sender, receiver, frame, protocol, copy),
+                repeat, number)
+            print('%-12s %-12s %12.1f %16.1f' % (
+                '%dx%d' % shape, name, encode * 1e6, trip * 1e6))
+    sender.close()
+    receiver.close()
+    context.term()
+
+
+if __name__ == "__main__":
+    main()
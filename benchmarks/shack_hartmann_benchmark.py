@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+'''
+Compare ShackHartmannCentroider with a Python loop centroiding one
+subaperture at a time, on 40x40 and 80x80 grids of 8 pixels
+subapertures.
+
+Usage: python benchmarks/shack_hartmann_benchmark.py
+'''
+import timeit
+import numpy as np
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.shack_hartmann import \
+    ShackHartmannCentroider
+
+GRIDS = [40, 80]
+SUBAP_SIZE = 8
+
+
+def loopCentroids(frame, nSubaps, subapSize):
+    y, x = np.mgrid[0:subapSize, 0:subapSize] - (subapSize - 1) / 2.
+    res = np.zeros((3, nSubaps * nSubaps))
+    for i in range(nSubaps):
+        for j in range(nSubaps):
+            sub = frame[i * subapSize: (i + 1) * subapSize,
+                        j * subapSize: (j + 1) * subapSize].astype(float)
+            flux = sub.sum()
+            k = i * nSubaps + j
+            if flux > 0:
+                res[0, k] = (sub * x).sum() / flux
+                res[1, k] = (sub * y).sum() / flux
+            res[2, k] = flux
+    return res
+
+
+def bestTimeInSec(func, repeat, number):
+    return min(timeit.repeat(func, repeat=repeat, number=number)) / number
+
+
+def main(repeat=5, number=10):
+    print('%-8s %-10s %12s %16s %8s' % (
+        'grid', 'frame', 'loop [us]', 'centroider [us]', 'speedup'))
+    for nSubaps in GRIDS:
+        side = nSubaps * SUBAP_SIZE
+        rng = np.random.default_rng(0)
+        frame = rng.integers(0, 4096, (side, side), dtype=np.uint16)
+        centroider = ShackHartmannCentroider(
+            BufferPool(), (0, 0), SUBAP_SIZE, nSubaps)
+        np.testing.assert_allclose(
+            loopCentroids(frame, nSubaps, SUBAP_SIZE),
+            centroider.compute(frame), rtol=1e-3, atol=1e-3)
+        loop = bestTimeInSec(
+            lambda: loopCentroids(frame, nSubaps, SUBAP_SIZE),
+            repeat, number)
+        current = bestTimeInSec(lambda: centroider.compute(frame),
+                                repeat, number)
+        print('%-8s %-10s %12.1f %16.1f %8.1f' % (
+            '%dx%d' % (nSubaps, nSubaps), '%dx%d' % (side, side),
+            loop * 1e6, current * 1e6, loop / current))
+
+
+if __name__ == "__main__":
+    main()
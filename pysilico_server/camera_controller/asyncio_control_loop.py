@@ -0,0 +1,91 @@
+import asyncio
+import zmq
+import zmq.asyncio
+from plico.utils.control_loop import ControlLoop
+
+
+class AsyncioControlLoop(ControlLoop):
+    '''
+    Event driven alternative to IntolerantControlLoop.
+
+    Instead of stepping the controller at a fixed period, it runs
+    asyncio tasks that
+
+    - serve RPC requests as soon as they arrive on the reply socket,
+      and publish the status right after them
+    - publish the status every statusPeriodSec, counting each
+      publication as a step of the controller, like a step of
+      IntolerantControlLoop
+    - ping the camera every pingPeriodSec
+
+    Frames are still published by the frame dispatcher thread of the
+    controller, so that their processing never delays RPC requests.
+
+    Like IntolerantControlLoop, an exception raised by the controller
+    stops the loop and is raised by start().
+    '''
+
+    POLLING = 'polling'
+    ASYNCIO = 'asyncio'
+    MODES = (POLLING, ASYNCIO)
+
+    DEFAULT_STATUS_PERIOD_SEC = 0.02
+    DEFAULT_PING_PERIOD_SEC = 1.
+    TERMINATION_CHECK_SEC = 0.1
+
+    def __init__(self, controller, replySocket, logger,
+                 statusPeriodSec=DEFAULT_STATUS_PERIOD_SEC,
+                 pingPeriodSec=DEFAULT_PING_PERIOD_SEC):
+        self._controller = controller
+        self._replySocket = replySocket
+        self._logger = logger
+        self._statusPeriodSec = statusPeriodSec
+        self._pingPeriodSec = pingPeriodSec
+
+    @classmethod
+    def checkMode(cls, mode):
+        if mode not in cls.MODES:
+            raise ValueError('Unsupported control loop %s. Use one of %s' %
+                             (mode, str(cls.MODES)))
+
+    def start(self):
+        asyncio.run(self._run())
+
+    async def _run(self):
+        tasks = [asyncio.create_task(coroutine) for coroutine in (
+            self._serveRequests(), self._publishStatus(), self._pingCamera())]
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _isAlive(self):
+        return not self._controller.isTerminated()
+
+    async def _serveRequests(self):
+        socket = zmq.asyncio.Socket.from_socket(self._replySocket)
+        timeoutMs = int(self.TERMINATION_CHECK_SEC * 1000)
+        while self._isAlive():
+            if await socket.poll(timeoutMs, zmq.POLLIN):
+                self._controller.serveRequests()
+                self._controller.publishStatus()
+
+    async def _sleepWhileAlive(self, periodSec):
+        remaining = periodSec
+        while remaining > 0 and self._isAlive():
+            step = min(remaining, self.TERMINATION_CHECK_SEC)
+            await asyncio.sleep(step)
+            remaining -= step
+
+    async def _publishStatus(self):
+        while self._isAlive():
+            self._controller.publishStatus()
+            self._controller.countStep()
+            await self._sleepWhileAlive(self._statusPeriodSec)
+
+    async def _pingCamera(self):
+        while self._isAlive():
+            await self._sleepWhileAlive(self._pingPeriodSec)
+            if self._isAlive():
+                self._controller.pingCamera()
@@ -0,0 +1,39 @@
+import threading
+import numpy as np
+from plico.utils.decorator import synchronized
+
+
+class BufferPool(object):
+    '''
+    Preallocated arrays reused across frames by the publish path.
+
+    Buffers are identified by name. Asking for a name with a different
+    shape or dtype than the one in the pool reallocates the buffer, so
+    the pool follows binning and pixel format changes automatically.
+    '''
+
+    def __init__(self):
+        self._buffers = {}
+        self._allocations = 0
+        self._mutex = threading.RLock()
+
+    @synchronized("_mutex")
+    def get(self, name, shape, dtype):
+        shape = tuple(shape)
+        dtype = np.dtype(dtype)
+        buf = self._buffers.get(name)
+        if buf is None or buf.shape != shape or buf.dtype != dtype:
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+            self._allocations += 1
+        return buf
+
+    @synchronized("_mutex")
+    def clear(self):
+        self._buffers = {}
+
+    @synchronized("_mutex")
+    def getStatistics(self):
+        return {'buffers': len(self._buffers),
+                'allocations': self._allocations,
+                'bytes': sum(b.nbytes for b in self._buffers.values())}
@@ -0,0 +1,116 @@
+import os
+import re
+import threading
+import numpy as np
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+from pysilico_server.utils.array_file import memoryMapArray
+
+
+class CalibrationStore(object):
+    '''
+    Dark frames of a camera persisted in a folder.
+
+    Darks are keyed by camera name, binning and exposure time. Each one
+    is a FITS or NPY file named
+
+        <camera name>_bin<binning>_exp<exposure time in ms>ms.<fits|npy>
+
+    All darks in the folder are memory mapped when the store is loaded,
+    so that switching between them does not read the whole file
+    (scaled FITS data, e.g. uint16, are read in memory instead).
+    New darks are saved as NPY files.
+
+    defaultDarkPath is a dark in the pysilico calibration layout,
+    calib/dark_frame/<tag>.fits, used for the modes without a dark of
+    their own.
+    '''
+
+    FILENAME_PATTERN = re.compile(
+        r'^(?P<camera>.+)_bin(?P<binning>\d+)_exp(?P<exposure>[0-9.eE+-]+)ms'
+        r'\.(?P<ext>fits|npy)$')
+
+    def __init__(self, folder, cameraName, defaultDarkPath=None):
+        self._folder = folder
+        self._cameraTag = self._sanitize(cameraName)
+        self._defaultDarkPath = defaultDarkPath
+        self._logger = Logger.of('CalibrationStore')
+        self._darks = {}
+        self._defaultDark = None
+        self._mutex = threading.RLock()
+
+    @staticmethod
+    def _sanitize(name):
+        return re.sub(r'[^A-Za-z0-9.-]+', '-', str(name)).strip('-')
+
+    @staticmethod
+    def _exposureTag(exposureTimeInMilliSec):
+        return '%.6g' % exposureTimeInMilliSec
+
+    def folder(self):
+        return self._folder
+
+    def fileName(self, binning, exposureTimeInMilliSec, ext='npy'):
+        return '%s_bin%d_exp%sms.%s' % (
+            self._cameraTag, int(binning),
+            self._exposureTag(exposureTimeInMilliSec), ext)
+
+    def _key(self, binning, exposureTimeInMilliSec):
+        return (int(binning), self._exposureTag(exposureTimeInMilliSec))
+
+    @synchronized("_mutex")
+    def load(self):
+        self._darks = {}
+        self._defaultDark = None
+        if self._defaultDarkPath is not None:
+            try:
+                self._defaultDark = self._memoryMap(self._defaultDarkPath)
+                self._logger.notice('Loaded default dark %s shape %s' % (
+                    self._defaultDarkPath, str(self._defaultDark.shape)))
+            except Exception as e:
+                self._logger.warn('Cannot load default dark %s: %s' % (
+                    self._defaultDarkPath, str(e)))
+        if not os.path.isdir(self._folder):
+            self._logger.notice('Calibration folder %s does not exist' %
+                                self._folder)
+            return
+        for fileName in sorted(os.listdir(self._folder)):
+            match = self.FILENAME_PATTERN.match(fileName)
+            if match is None or match.group('camera') != self._cameraTag:
+                continue
+            path = os.path.join(self._folder, fileName)
+            try:
+                dark = self._memoryMap(path)
+            except Exception as e:
+                self._logger.warn('Cannot load dark %s: %s' % (path, str(e)))
+                continue
+            key = self._key(match.group('binning'),
+                            float(match.group('exposure')))
+            self._darks[key] = dark
+            self._logger.notice('Loaded dark %s shape %s' % (
+                fileName, str(dark.shape)))
+
+    @staticmethod
+    def _memoryMap(path):
+        return np.asarray(memoryMapArray(path))
+
+    @synchronized("_mutex")
+    def get(self, binning, exposureTimeInMilliSec):
+        return self._darks.get(self._key(binning, exposureTimeInMilliSec),
+                               self._defaultDark)
+
+    @synchronized("_mutex")
+    def save(self, binning, exposureTimeInMilliSec, dark):
+        if not os.path.isdir(self._folder):
+            os.makedirs(self._folder)
+        path = os.path.join(self._folder,
+                            self.fileName(binning, exposureTimeInMilliSec))
+        np.save(path, np.asarray(dark))
+        stored = self._memoryMap(path)
+        self._darks[self._key(binning, exposureTimeInMilliSec)] = stored
+        self._logger.notice('Saved dark %s' % path)
+        return stored
+
+    @synchronized("_mutex")
+    def keys(self):
+        return sorted(self._darks.keys())
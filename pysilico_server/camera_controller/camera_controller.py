@@ -1,6 +1,7 @@
 import threading
 import time
 import numpy as np
+import zmq
 from plico.utils.hackerable import Hackerable
 from plico.utils.snapshotable import Snapshotable
 from plico.utils.stepable import Stepable
@@ -10,7 +11,28 @@ from plico.utils.decorator import override, logEnterAndExit, synchronized
 from plico.utils.timekeeper import TimeKeeper
 from pysilico.types.camera_frame import CameraFrame
 from pysilico.types.camera_status import CameraStatus
-from rebin import rebin
+from pysilico_server.camera_controller.frame_dispatcher import \
+    FrameDispatcher
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.frame_corrector import FrameCorrector
+from pysilico_server.camera_controller.frame_accumulator import \
+    FrameAccumulator
+from pysilico_server.camera_controller.roi_publisher import RoiPublisher
+from pysilico_server.camera_controller.pyramid_slopes import \
+    PyramidSlopeComputer
+from pysilico_server.camera_controller.shack_hartmann import \
+    ShackHartmannCentroider
+from pysilico_server.camera_controller.display_streams import \
+    DisplayStream, DisplayStreams
+from pysilico_server.camera_controller.status_publisher import \
+    StatusPublisher
+from pysilico_server.camera_controller.output_streams import OutputStreams
+from pysilico_server.camera_controller.latest_frame import LatestFrameSlot
+from pysilico_server.camera_controller.latency_histogram import \
+    FrameLatencies
+from pysilico_server.utils.frame_utils import cameraFrameFromArray, \
+    stampFrame, frameTimestamps
+from pysilico_server.utils.frame_protocol import FrameProtocol
 
 
 class CameraController(Stepable,
@@ -27,7 +49,20 @@ class CameraController(Stepable,
                  statusSocket,
                  displaySocket,
                  rpcHandler,
-                 timeMod=time):
+                 timeMod=time,
+                 dispatchQueueSize=FrameDispatcher.DEFAULT_QUEUE_SIZE,
+                 dispatchPolicy=FrameDispatcher.DROP_OLDEST,
+                 calibrationStore=None,
+                 roiSocket=None,
+                 slopesSocket=None,
+                 centroidsSocket=None,
+                 displayStreamsSocket=None,
+                 frameProtocol=FrameProtocol.PICKLE,
+                 sharedFrameRing=None,
+                 ringNotifySocket=None,
+                 statusHeartbeatSec=StatusPublisher.DEFAULT_HEARTBEAT_SEC,
+                 parameterPollSec=StatusPublisher.DEFAULT_PARAMETER_POLL_SEC,
+                 outputStreams=()):
         self._camera = camera
         self._replySocket = replySocket
         self._publisherSocket = publisherSocket
@@ -43,32 +78,85 @@ class CameraController(Stepable,
         self._isTerminated = False
         self._stepCounter = 0
         self._frameCounter = 0
-        self._lastDisplayTimestamp = 0
-        self._displayIntervalInSec = 0.05
         self._timekeep = TimeKeeper()
         self._cameraStatus = None
         self._mutexStatus = threading.RLock()
-        self._camera.registerCallback(self._publishFrame)
+        self._statusPublisher = StatusPublisher(
+            lambda status: self._rpcHandler.publishPickable(
+                self._statusSocket, status),
+            self._camera.getParameters, timeMod,
+            statusHeartbeatSec, parameterPollSec)
+        self._bufferPool = BufferPool()
+        self._frameCorrector = FrameCorrector(self._bufferPool)
+        self._frameCorrector.setSensorDtype(self._camera.dtype())
+        self._sharedFrameRing = sharedFrameRing
+        self._ringNotifySocket = ringNotifySocket
+        self._ringSkipWarned = False
+        FrameProtocol.checkProtocol(frameProtocol)
+        self._frameProtocol = frameProtocol
+        self._roiPublisher = RoiPublisher(roiSocket, self._bufferPool,
+                                          self._sendFrame)
+        self._slopesSocket = slopesSocket
+        self._slopeComputer = None
+        self._centroidsSocket = centroidsSocket
+        self._centroider = None
+        self._displayStreamsSocket = displayStreamsSocket
+        self._displayStreams = DisplayStreams(self._sendDisplayFrame,
+                                              self._bufferPool, timeMod)
+        self._displayStreams.start()
+        self._outputStreams = OutputStreams(
+            lambda socket, frame, ownsBuffer: self._sendFrame(
+                socket, frame, ownsBuffer=ownsBuffer),
+            outputStreams, timeMod)
+        self._outputStreams.start()
+        self._latestFrame = LatestFrameSlot()
+        self._latencies = FrameLatencies()
+        self._frameDispatcher = FrameDispatcher(self._publishFrame,
+                                                dispatchQueueSize,
+                                                dispatchPolicy)
+        self._frameDispatcher.start()
+        self._camera.registerCallback(self._onFrame)
         self._darkFrame = None
+        self._flatFrame = None
+        self._badPixelMask = None
         self._mutexDarkFrame = threading.RLock()
+        self._calibrationStore = calibrationStore
+        self._installStoredDarkFrame()
+        self._accumulators = []
+        self._accumulations = {}
+        self._accumulationCounter = 0
+        self._mutexAccumulators = threading.RLock()
         self._last_time = int(time.time())
 
     @override
     def step(self):
-        self._rpcHandler.handleRequest(self, self._replySocket, multi=True)
-        self._publishStatus()
+        self.serveRequests()
+        self.publishStatus()
+        self.countStep()
+        now = int(time.time())
+        if self._last_time != now:
+            self._last_time = now
+            self.pingCamera()
+
+    def countStep(self):
+        '''Bookkeeping of a control loop step: step counter and rate'''
         if self._timekeep.inc():
             self._logger.notice(
                 'Stepping at %5.2f Hz. FrameCounter %d' % (
                     self._timekeep.rate, self._camera.getFrameCounter()))
         self._stepCounter += 1
-        # Ping the camera every now and then to verify that
-        # it is still reachable. In case, it will throw an exception
-        # that will trigger the reconnection loop.
-        now = int(time.time())
-        if self._last_time != now:
-            self._last_time = now
-            _ = self._camera.exposureTime()
+
+    def serveRequests(self):
+        '''Serve the requests pending on the reply socket'''
+        self._rpcHandler.handleRequest(self, self._replySocket, multi=True)
+
+    def pingCamera(self):
+        '''
+        Ping the camera every now and then to verify that it is still
+        reachable. In case, it will throw an exception that will
+        trigger the reconnection loop.
+        '''
+        _ = self._camera.exposureTime()
 
     def getStepCounter(self):
         return self._stepCounter
@@ -81,8 +169,27 @@ class CameraController(Stepable,
         except Exception as e:
             self._logger.warn("Could not stop camera acquisition: %s" %
                               str(e))
+        self.stopFramePipeline()
         self._isTerminated = True
 
+    def stopFramePipeline(self):
+        self._frameDispatcher.stop()
+        self._displayStreams.stop()
+        self._outputStreams.stop()
+        if self._sharedFrameRing is not None:
+            self._sharedFrameRing.close()
+            self._sharedFrameRing = None
+
+    def getFrameDispatcherStatistics(self):
+        return self._frameDispatcher.getStatistics()
+
+    @logEnterAndExit('Entering setFrameDispatchPolicy',
+                     'Executed setFrameDispatchPolicy')
+    def setFrameDispatchPolicy(self, dropPolicy, maxQueueSize=None):
+        self._frameDispatcher.setDropPolicy(dropPolicy)
+        if maxQueueSize is not None:
+            self._frameDispatcher.setMaxQueueSize(maxQueueSize)
+
     @override
     def isTerminated(self):
         return self._isTerminated
@@ -97,6 +204,7 @@ class CameraController(Stepable,
                      'Executed setExposureTime')
     def setExposureTime(self, exposureTimeInMilliSeconds):
         self._camera.setExposureTime(exposureTimeInMilliSeconds)
+        self._installStoredDarkFrame()
         with self._mutexStatus:
             self._cameraStatus = None
 
@@ -107,6 +215,9 @@ class CameraController(Stepable,
                      'Executed setBinning')
     def setBinning(self, binning):
         self._camera.setBinning(binning)
+        self._bufferPool.clear()
+        self._frameCorrector.setSensorDtype(self._camera.dtype())
+        self._installStoredDarkFrame()
         with self._mutexStatus:
             self._cameraStatus = None
 
@@ -120,54 +231,486 @@ class CameraController(Stepable,
     @logEnterAndExit('Entering setDarkFrame',
                      'Executed setDarkFrame')
     def setDarkFrame(self, darkFrame):
+        with self._mutexDarkFrame:
+            if self._calibrationStore is not None and darkFrame is not None:
+                binning, exposureTime = self._calibrationMode()
+                self._calibrationStore.save(binning, exposureTime,
+                                            self._asArray(darkFrame))
+            self._installDarkFrame(darkFrame)
+
+    def _installDarkFrame(self, darkFrame):
         with self._mutexDarkFrame:
             self._darkFrame = darkFrame
+            self._frameCorrector.setDarkFrame(self._asArray(darkFrame))
 
-    def _getCorrectedFrame(self, frame):
-        if self._darkFrame is not None:
-            with self._mutexDarkFrame:
-                return CameraFrame.fromNumpyArray(
-                    frame.toNumpyArray() - self._darkFrame.toNumpyArray(),
-                    frame.counter())
+    def _calibrationMode(self):
+        return self._camera.getBinning(), self._camera.exposureTime()
+
+    def _installStoredDarkFrame(self):
+        if self._calibrationStore is None:
+            return
+        binning, exposureTime = self._calibrationMode()
+        dark = self._calibrationStore.get(binning, exposureTime)
+        if dark is None:
+            self._logger.notice(
+                'No stored dark frame for binning %d, exposure time %g ms' %
+                (binning, exposureTime))
+            self._installDarkFrame(None)
         else:
+            self._logger.notice(
+                'Using stored dark frame for binning %d, exposure time %g ms'
+                % (binning, exposureTime))
+            self._installDarkFrame(cameraFrameFromArray(dark))
+
+    @staticmethod
+    def _asArray(frameOrArray):
+        if frameOrArray is None:
+            return None
+        if isinstance(frameOrArray, CameraFrame):
+            return frameOrArray.toNumpyArray()
+        return np.asarray(frameOrArray)
+
+    def getFlatFrame(self):
+        with self._mutexDarkFrame:
+            return self._flatFrame
+
+    @logEnterAndExit('Entering setFlatFrame',
+                     'Executed setFlatFrame')
+    def setFlatFrame(self, flatFrame):
+        with self._mutexDarkFrame:
+            self._frameCorrector.setFlatFrame(self._asArray(flatFrame))
+            self._flatFrame = flatFrame
+
+    def getBadPixelMask(self):
+        with self._mutexDarkFrame:
+            return self._badPixelMask
+
+    @logEnterAndExit('Entering setBadPixelMask',
+                     'Executed setBadPixelMask')
+    def setBadPixelMask(self, badPixelMask):
+        with self._mutexDarkFrame:
+            self._frameCorrector.setBadPixelMask(self._asArray(badPixelMask))
+            self._badPixelMask = badPixelMask
+
+    def getFrameCorrectionTiming(self):
+        return self._frameCorrector.getTiming()
+
+    @logEnterAndExit('Entering setOutputDtype',
+                     'Executed setOutputDtype')
+    def setOutputDtype(self, dtype):
+        self._frameCorrector.setOutputDtype(dtype)
+
+    def getOutputDtype(self):
+        '''dtype of the published frames, by default the sensor dtype'''
+        return self._frameCorrector.outputDtype(self._camera.dtype())
+
+    def _getCorrectedFrame(self, frame):
+        raw = frame.toNumpyArray()
+        corrected = self._frameCorrector.correct(raw)
+        if corrected is raw:
             return frame
+        return cameraFrameFromArray(corrected, frame.counter(),
+                                    frameTimestamps(frame))
+
+    def getBufferPoolStatistics(self):
+        return self._bufferPool.getStatistics()
+
+    @logEnterAndExit('Entering setRectangularRoi',
+                     'Executed setRectangularRoi')
+    def setRectangularRoi(self, name, y, x, height, width):
+        '''
+        Publish the rectangle [y:y+height, x:x+width] of each frame
+        on the ROI socket with topic name
+        '''
+        self._roiPublisher.setRectangle(name, y, x, height, width)
+
+    @logEnterAndExit('Entering setMaskRoi',
+                     'Executed setMaskRoi')
+    def setMaskRoi(self, name, mask):
+        '''
+        Publish the pixels selected by the boolean mask of each frame
+        on the ROI socket with topic name, as a 1D vector
+        '''
+        self._roiPublisher.setMask(name, mask)
+
+    @logEnterAndExit('Entering removeRoi',
+                     'Executed removeRoi')
+    def removeRoi(self, name):
+        self._roiPublisher.remove(name)
+
+    def getRois(self):
+        return self._roiPublisher.getRois()
+
+    @logEnterAndExit('Entering setDisplayStream',
+                     'Executed setDisplayStream')
+    def setDisplayStream(self, name=DisplayStreams.DEFAULT,
+                         targetSize=DisplayStream.DEFAULT_TARGET_SIZE,
+                         maxRateHz=DisplayStream.DEFAULT_MAX_RATE_HZ,
+                         mode=DisplayStream.SAMPLE):
+        '''
+        Create or modify a display stream. The default stream is
+        published on the display socket, the other ones on the display
+        streams socket with their name as topic.
+        mode is one of 'sample', 'rebin-sum', 'rebin-mean', 'max-pool'.
+        '''
+        if name != DisplayStreams.DEFAULT and \
+                self._displayStreamsSocket is None:
+            raise ValueError(
+                'Display streams are not configured on this server')
+        self._displayStreams.setStream(name, targetSize, maxRateHz, mode)
+
+    @logEnterAndExit('Entering removeDisplayStream',
+                     'Executed removeDisplayStream')
+    def removeDisplayStream(self, name):
+        self._displayStreams.removeStream(name)
+
+    def getDisplayStreams(self):
+        return self._displayStreams.getStreams()
+
+    def getDisplayStatistics(self):
+        return self._displayStreams.getStatistics()
+
+    @logEnterAndExit('Entering setOutputStreamRate',
+                     'Executed setOutputStreamRate')
+    def setOutputStreamRate(self, name, decimation=1, maxRateHz=None):
+        '''
+        Publish one frame every decimation frames on the output stream
+        name, and at most maxRateHz frames per second (None: no limit)
+        '''
+        self._outputStreams.setRate(name, decimation, maxRateHz)
+
+    def getOutputStreams(self):
+        return self._outputStreams.getStreams()
+
+    @logEnterAndExit('Entering enablePyramidSlopes',
+                     'Executed enablePyramidSlopes')
+    def enablePyramidSlopes(self, pupilsCenter, pupilRadius,
+                            normalization=PyramidSlopeComputer.LOCAL):
+        '''
+        Compute the pyramid WFS slopes of each frame and publish them
+        on the slopes socket as a CameraFrame holding the float32
+        vector [sx..., sy...]. Geometry is in pixels of the published
+        frame, see PyramidSlopeComputer.
+        '''
+        if self._slopesSocket is None:
+            raise ValueError(
+                'Slopes publishing is not configured on this server')
+        self._slopeComputer = PyramidSlopeComputer(
+            self._bufferPool, pupilsCenter, pupilRadius, normalization)
+
+    @logEnterAndExit('Entering disablePyramidSlopes',
+                     'Executed disablePyramidSlopes')
+    def disablePyramidSlopes(self):
+        self._slopeComputer = None
+
+    def getPyramidSlopesGeometry(self):
+        slopeComputer = self._slopeComputer
+        if slopeComputer is None:
+            return None
+        return slopeComputer.getGeometry()
+
+    @logEnterAndExit('Entering enableShackHartmann',
+                     'Executed enableShackHartmann')
+    def enableShackHartmann(self, origin, subapSize, nSubaps,
+                            threshold=0., windowRadius=None):
+        '''
+        Compute the Shack-Hartmann centroids of each frame and publish
+        them on the centroids socket as a CameraFrame holding a float32
+        (3, nSubaps) array of x, y, flux. Geometry is in pixels of the
+        published frame, see ShackHartmannCentroider.
+        '''
+        if self._centroidsSocket is None:
+            raise ValueError(
+                'Centroids publishing is not configured on this server')
+        self._centroider = ShackHartmannCentroider(
+            self._bufferPool, origin, subapSize, nSubaps,
+            threshold, windowRadius)
+
+    @logEnterAndExit('Entering disableShackHartmann',
+                     'Executed disableShackHartmann')
+    def disableShackHartmann(self):
+        self._centroider = None
+
+    def getShackHartmannGeometry(self):
+        centroider = self._centroider
+        if centroider is None:
+            return None
+        return centroider.getGeometry()
+
+    def _publishCentroids(self, frame):
+        centroider = self._centroider
+        if centroider is None:
+            return
+        centroids = centroider.compute(frame.toNumpyArray())
+        if centroids is not None:
+            self._sendFrame(
+                self._centroidsSocket,
+                cameraFrameFromArray(centroids, frame.counter()))
+
+    def _publishSlopes(self, frame):
+        slopeComputer = self._slopeComputer
+        if slopeComputer is None:
+            return
+        slopes = slopeComputer.compute(frame.toNumpyArray())
+        if slopes is not None:
+            self._sendFrame(
+                self._slopesSocket,
+                cameraFrameFromArray(slopes, frame.counter()))
 
     def getSnapshot(self, prefix):
         assert False, 'Should not be used, client uses getStatus instead'
 
-    def _publishFrame(self, frame):
-        correctedFrame = self._getCorrectedFrame(frame)
-        self._rpcHandler.sendCameraFrame(self._publisherSocket, correctedFrame)
-        self._logger.debug('frame %d published' % correctedFrame.counter())
-        self._publishForDisplay(correctedFrame)
-
-    def _downsizeForDisplay(self, frame):
-        DISPLAY_FRAME_SIZE = 256.
-        minSize = np.min(frame.toNumpyArray().shape)
-        downsizeBy = int(np.ceil(
-            minSize / DISPLAY_FRAME_SIZE))
-        if downsizeBy > 1:
-            array = self._downsizeBySampling(frame.toNumpyArray(),
-                                             downsizeBy)
-        else:
-            array = frame.toNumpyArray()
-        return CameraFrame.fromNumpyArray(np.float32(array),
-                                          frame.counter())
+    # Requests are served by the control loop thread: a request that
+    # waits delays status publishing and all the other requests, and
+    # must end well before the 10 s timeout of the clients
+    MAX_REQUEST_WAIT_SEC = 0.02
+    MAX_ACCUMULATIONS = 8
+    ACCUMULATION_EXPIRY_SEC = 600.
 
-    def _downsizeByRebin(self, frame, factor):
-        return rebin(frame, factor) * factor**2
+    def _newAccumulator(self, nFrames, mode):
+        return FrameAccumulator(
+            nFrames, mode,
+            frameShape=(self._camera.rows(), self._camera.cols()),
+            timeMod=self._timeMod)
 
-    def _downsizeBySampling(self, frame, factor):
-        return frame[::factor, ::factor]
+    def _accumulate(self, nFrames, mode, corrected, timeoutSec):
+        frameRate = self._camera.getFrameRate()
+        # one more period for the phase of the first frame
+        expectedSec = (nFrames + 1) / frameRate if frameRate > 0 \
+            else float('inf')
+        if expectedSec > self.MAX_REQUEST_WAIT_SEC:
+            raise ValueError(
+                '%d frames at %g Hz take more than %g s: use'
+                ' startAccumulation or startDarkFrameAcquisition and poll'
+                ' getAccumulationResult' % (
+                    nFrames, frameRate, self.MAX_REQUEST_WAIT_SEC))
+        if timeoutSec is None or timeoutSec > self.MAX_REQUEST_WAIT_SEC:
+            timeoutSec = self.MAX_REQUEST_WAIT_SEC
+        accumulator = self._newAccumulator(nFrames, mode)
+        with self._mutexAccumulators:
+            self._accumulators.append((accumulator, corrected))
+        try:
+            if not accumulator.wait(timeoutSec):
+                raise TimeoutError(
+                    'Accumulated %d of %d frames in %g s' % (
+                        accumulator.count(), nFrames, timeoutSec))
+        finally:
+            with self._mutexAccumulators:
+                if (accumulator, corrected) in self._accumulators:
+                    self._accumulators.remove((accumulator, corrected))
+        return accumulator.result()
 
-    def _publishForDisplay(self, frame):
+    def _expireAccumulations(self):
         now = self._timeMod.time()
-        if now - self._lastDisplayTimestamp < self._displayIntervalInSec:
+        for accumulationId, entry in list(self._accumulations.items()):
+            completionTime = entry[0].completionTime()
+            if completionTime is not None and \
+                    now - completionTime > self.ACCUMULATION_EXPIRY_SEC:
+                self._logger.notice('Discarding accumulation %d, never'
+                                    ' collected' % accumulationId)
+                del self._accumulations[accumulationId]
+
+    def _startAccumulation(self, nFrames, mode, corrected, isDarkFrame):
+        accumulator = self._newAccumulator(nFrames, mode)
+        with self._mutexAccumulators:
+            self._expireAccumulations()
+            if len(self._accumulations) >= self.MAX_ACCUMULATIONS:
+                raise ValueError(
+                    'Too many accumulations (%d): collect them with'
+                    ' getAccumulationResult or cancel them' %
+                    len(self._accumulations))
+            self._accumulationCounter += 1
+            accumulationId = self._accumulationCounter
+            self._accumulations[accumulationId] = (
+                accumulator, corrected, isDarkFrame)
+            self._accumulators.append((accumulator, corrected))
+        return accumulationId
+
+    @logEnterAndExit('Entering startAccumulation',
+                     'Executed startAccumulation')
+    def startAccumulation(self, nFrames, mode=FrameAccumulator.MEAN):
+        '''
+        Start combining the next nFrames corrected frames, like
+        accumulate, without waiting for them. Return the id to poll
+        getAccumulationResult with.
+        '''
+        return self._startAccumulation(nFrames, mode, True, False)
+
+    @logEnterAndExit('Entering startDarkFrameAcquisition',
+                     'Executed startDarkFrameAcquisition')
+    def startDarkFrameAcquisition(self, nFrames, mode=FrameAccumulator.MEAN):
+        '''
+        Start combining the next nFrames raw frames, like
+        acquireDarkFrame. The dark frame is installed when
+        getAccumulationResult returns it.
+        '''
+        return self._startAccumulation(nFrames, mode, False, True)
+
+    def getAccumulationResult(self, accumulationId, timeoutSec=0.):
+        '''
+        Return the float64 image of a started accumulation, or None if
+        it is not completed after timeoutSec, capped at
+        MAX_REQUEST_WAIT_SEC. Raise the error that stopped the
+        accumulation, if any. A completed result is returned once, and
+        is discarded if not collected within ACCUMULATION_EXPIRY_SEC.
+        '''
+        with self._mutexAccumulators:
+            self._expireAccumulations()
+            if accumulationId not in self._accumulations:
+                raise ValueError('Unknown accumulation %s' % accumulationId)
+            accumulator, corrected, isDarkFrame = \
+                self._accumulations[accumulationId]
+        if not accumulator.wait(min(timeoutSec, self.MAX_REQUEST_WAIT_SEC)):
+            return None
+        self.cancelAccumulation(accumulationId)
+        result = accumulator.result()
+        if isDarkFrame:
+            self.setDarkFrame(CameraFrame(np.rint(result)))
+        return result
+
+    @logEnterAndExit('Entering cancelAccumulation',
+                     'Executed cancelAccumulation')
+    def cancelAccumulation(self, accumulationId):
+        with self._mutexAccumulators:
+            accumulator, corrected, _ = self._accumulations.pop(
+                accumulationId)
+            if (accumulator, corrected) in self._accumulators:
+                self._accumulators.remove((accumulator, corrected))
+
+    @logEnterAndExit('Entering accumulate',
+                     'Executed accumulate')
+    def accumulate(self, nFrames, mode=FrameAccumulator.MEAN,
+                   timeoutSec=None):
+        '''
+        Combine the next nFrames corrected frames into a float64 image.
+        mode is one of 'mean', 'sum', 'median', 'sigma-clip'.
+        The call waits for the frames, so it is refused if they take
+        more than MAX_REQUEST_WAIT_SEC, i.e. at kHz rates only:
+        clients use startAccumulation and getAccumulationResult.
+        '''
+        return self._accumulate(nFrames, mode, True, timeoutSec)
+
+    def getLatestFrame(self, minCounter=None, timeoutSec=0.):
+        '''
+        Return the latest corrected frame. If minCounter is given and
+        the latest frame is not newer, wait up to timeoutSec for one,
+        capped at MAX_REQUEST_WAIT_SEC since waiting delays the other
+        requests: with cameras slower than 1 / MAX_REQUEST_WAIT_SEC
+        (50 Hz) the wait usually times out, and clients poll again.
+        '''
+        return self._latestFrame.get(
+            minCounter, min(timeoutSec, self.MAX_REQUEST_WAIT_SEC))
+
+    def getLatencyHistograms(self):
+        '''
+        Histograms of the latencies of the published frames, from the
+        host receive and publish timestamps. See FrameLatencies.
+        '''
+        return self._latencies.getStatistics()
+
+    @logEnterAndExit('Entering resetLatencyHistograms',
+                     'Executed resetLatencyHistograms')
+    def resetLatencyHistograms(self):
+        self._latencies.reset()
+
+    @logEnterAndExit('Entering acquireDarkFrame',
+                     'Executed acquireDarkFrame')
+    def acquireDarkFrame(self, nFrames, mode=FrameAccumulator.MEAN,
+                         timeoutSec=None):
+        '''
+        Combine the next nFrames raw frames and install the result as
+        dark frame. Like accumulate, it is refused if the frames take
+        more than MAX_REQUEST_WAIT_SEC: clients use
+        startDarkFrameAcquisition.
+        '''
+        dark = self._accumulate(nFrames, mode, False, timeoutSec)
+        self.setDarkFrame(CameraFrame(np.rint(dark)))
+
+    def _feedAccumulators(self, frame, correctedFrame):
+        with self._mutexAccumulators:
+            for accumulator, corrected in list(self._accumulators):
+                try:
+                    if corrected:
+                        accumulator.add(correctedFrame.toNumpyArray())
+                    else:
+                        accumulator.add(frame.toNumpyArray())
+                except Exception as e:
+                    self._logger.error('Accumulation failed: %s' % str(e))
+                    accumulator.fail(e)
+                if accumulator.isCompleted():
+                    self._accumulators.remove((accumulator, corrected))
+
+    def getSharedFrameRingInfo(self):
+        '''
+        Name and size of the shared memory ring for same-host readers,
+        or None if it is not enabled. See SharedFrameRing.
+        '''
+        ring = self._sharedFrameRing
+        if ring is None:
+            return None
+        return {'name': ring.name(),
+                'nSlots': ring.nSlots(),
+                'slotBytes': ring.slotBytes()}
+
+    def _publishToSharedRing(self, frame):
+        ring = self._sharedFrameRing
+        if ring is None:
             return
-        downsizedFrame = self._downsizeForDisplay(frame)
-        self._rpcHandler.sendCameraFrame(self._displaySocket,
-                                         downsizedFrame)
-        self._lastDisplayTimestamp = now
+        notification = ring.write(frame.toNumpyArray(), frame.counter(),
+                                  self._timeMod.time())
+        if notification is None:
+            if not self._ringSkipWarned:
+                self._logger.warn('Frame of shape %s does not fit the shared'
+                                  ' memory ring' % str(
+                                      frame.toNumpyArray().shape))
+                self._ringSkipWarned = True
+            return
+        if self._ringNotifySocket is not None:
+            self._ringNotifySocket.send(notification, zmq.NOBLOCK)
+
+    def _onFrame(self, frame):
+        if 'receive' not in frameTimestamps(frame):
+            stampFrame(frame, receive=time.monotonic())
+        self._frameDispatcher.push(frame)
+
+    def _publishFrame(self, frame):
+        startSec = time.monotonic()
+        correctedFrame = self._getCorrectedFrame(frame)
+        self._feedAccumulators(frame, correctedFrame)
+        self._publishSlopes(correctedFrame)
+        self._publishCentroids(correctedFrame)
+        self._publishToSharedRing(correctedFrame)
+        stampFrame(correctedFrame, publish=time.monotonic())
+        self._sendFrame(self._publisherSocket, correctedFrame,
+                        ownsBuffer=correctedFrame is frame)
+        self._outputStreams.publish(correctedFrame,
+                                    ownsBuffer=correctedFrame is frame)
+        self._latestFrame.update(correctedFrame,
+                                 ownsBuffer=correctedFrame is frame)
+        self._latencies.record(frameTimestamps(correctedFrame), startSec)
+        self._roiPublisher.publish(correctedFrame)
+        self._displayStreams.offer(correctedFrame)
+
+    def _sendDisplayFrame(self, streamName, frame):
+        if streamName == DisplayStreams.DEFAULT:
+            self._sendFrame(self._displaySocket, frame)
+        else:
+            self._sendFrame(self._displayStreamsSocket, frame, streamName)
+
+    def _sendFrame(self, socket, frame, topic=None, ownsBuffer=False):
+        '''
+        Send frame with the configured FrameProtocol. ownsBuffer tells
+        that the frame array is not reused, so that it can be handed
+        to ZMQ without copying it.
+        '''
+        if self._frameProtocol == FrameProtocol.PICKLE and topic is None:
+            self._rpcHandler.sendCameraFrame(socket, frame)
+        else:
+            FrameProtocol.send(socket, frame, self._frameProtocol, topic,
+                               copy=not ownsBuffer)
+
+    def getFrameProtocol(self):
+        return self._frameProtocol
 
     @synchronized("_mutexStatus")
     def _getCameraStatus(self):
@@ -184,9 +727,44 @@ class CameraController(Stepable,
                 self._camera.getParameters())
         return self._cameraStatus
 
-    def _publishStatus(self):
-        self._rpcHandler.publishPickable(self._statusSocket,
-                                         self._getCameraStatus())
+    def publishStatus(self):
+        with self._mutexStatus:
+            status = self._getCameraStatus()
+            refreshed = self._statusPublisher.refreshParameters(status)
+            if refreshed is not status:
+                self._cameraStatus = refreshed
+        self._statusPublisher.publish(refreshed)
+
+    @logEnterAndExit('Entering setStatusPublishing',
+                     'Executed setStatusPublishing')
+    def setStatusPublishing(self, heartbeatSec=StatusPublisher.UNCHANGED,
+                            parameterPollSec=StatusPublisher.UNCHANGED):
+        '''
+        Publish the status when it changes and every heartbeatSec
+        (0: at every step). Poll the camera parameters every
+        parameterPollSec (None: only when the status is rebuilt).
+        Arguments not given keep their current value.
+        '''
+        if heartbeatSec is not StatusPublisher.UNCHANGED:
+            self._statusPublisher.setHeartbeat(heartbeatSec)
+        if parameterPollSec is not StatusPublisher.UNCHANGED:
+            self._statusPublisher.setParameterPollInterval(parameterPollSec)
+
+    def getStatusPublisherStatistics(self):
+        return self._statusPublisher.getStatistics()
+
+    def getParameterCacheStatistics(self):
+        return self._camera.getParameterCacheStatistics()
+
+    @logEnterAndExit('Entering setParameterCacheTtl',
+                     'Executed setParameterCacheTtl')
+    def setParameterCacheTtl(self, key, ttlSec):
+        '''
+        Cache the camera query key for ttlSec (None: until the next
+        write, 0: do not cache). Keys are listed by
+        getParameterCacheStatistics.
+        '''
+        self._camera.setParameterCacheTtl(key, ttlSec)
 
     @logEnterAndExit('Entering setFrameRate',
                      'Executed setFrameRate')
@@ -202,10 +780,53 @@ class CameraController(Stepable,
         with self._mutexStatus:
             self._cameraStatus = None
 
+    BATCH_OPERATIONS = ('setExposureTime',
+                        'setFrameRate',
+                        'setBinning',
+                        'setParameter',
+                        'setOutputDtype',
+                        'setDarkFrame',
+                        'setFlatFrame',
+                        'setBadPixelMask',
+                        'setFrameDispatchPolicy',
+                        'setOutputStreamRate',
+                        'setStatusPublishing',
+                        'setParameterCacheTtl')
+
+    @logEnterAndExit('Entering applyBatch',
+                     'Executed applyBatch')
+    def applyBatch(self, operations):
+        '''
+        Apply a list of (setterName, args) operations in a single
+        request and return the list of their results.
+
+        All the operations are checked before applying the first one.
+        They are applied in order, holding the status lock, so that
+        the status is rebuilt only once after the last one and no
+        intermediate status is published. If an operation fails the
+        following ones are not applied and a RuntimeError tells which
+        one failed; the previous ones cannot be undone.
+        '''
+        checked = []
+        for i, operation in enumerate(operations):
+            name, args = operation
+            if name not in self.BATCH_OPERATIONS:
+                raise ValueError('Batch operation %d: %s is not one of %s' % (
+                    i, name, str(self.BATCH_OPERATIONS)))
+            checked.append((name, tuple(args)))
+        results = []
+        with self._mutexStatus:
+            for i, (name, args) in enumerate(checked):
+                try:
+                    results.append(getattr(self, name)(*args))
+                except Exception as e:
+                    raise RuntimeError('Batch operation %d %s%s failed: %s' % (
+                        i, name, str(args), str(e))) from e
+        return results
+
     def __getattr__(self, attrname):
         '''Forward any unknown calls to the camera device'''
         if hasattr(self._camera, attrname):
             return getattr(self._camera, attrname)
         else:
             raise AttributeError
-
@@ -0,0 +1,182 @@
+import threading
+import time
+import numpy as np
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+from pysilico_server.camera_controller.frame_dispatcher import \
+    FrameDispatcher
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+class DisplayStream(object):
+    '''
+    Parameters of a reduced frame stream for GUIs.
+
+    Frames are reduced by an integer factor so that their smaller side
+    is at most targetSize pixels, and published at most maxRateHz times
+    per second. Reduction modes:
+
+    - SAMPLE: one pixel every factor, in the sensor dtype
+    - REBIN_SUM, REBIN_MEAN: sum or mean of factor x factor blocks,
+      in float32
+    - MAX_POOL: maximum of factor x factor blocks, in the sensor dtype
+
+    Block reductions drop the last rows and columns that do not fill
+    a whole block.
+    '''
+
+    SAMPLE = 'sample'
+    REBIN_SUM = 'rebin-sum'
+    REBIN_MEAN = 'rebin-mean'
+    MAX_POOL = 'max-pool'
+    MODES = (SAMPLE, REBIN_SUM, REBIN_MEAN, MAX_POOL)
+
+    DEFAULT_TARGET_SIZE = 256
+    DEFAULT_MAX_RATE_HZ = 20.
+
+    def __init__(self, name, targetSize=DEFAULT_TARGET_SIZE,
+                 maxRateHz=DEFAULT_MAX_RATE_HZ, mode=SAMPLE):
+        targetSize = int(targetSize)
+        if targetSize < 1:
+            raise ValueError('targetSize must be at least 1, got %d' %
+                             targetSize)
+        if maxRateHz <= 0:
+            raise ValueError('maxRateHz must be positive')
+        if mode not in self.MODES:
+            raise ValueError('Unsupported mode %s. Use one of %s' % (
+                mode, str(self.MODES)))
+        self._name = name
+        self._targetSize = targetSize
+        self._maxRateHz = float(maxRateHz)
+        self._mode = mode
+        self._lastTimestamp = None
+
+    def name(self):
+        return self._name
+
+    def getParameters(self):
+        return {'targetSize': self._targetSize,
+                'maxRateHz': self._maxRateHz,
+                'mode': self._mode}
+
+    def isDue(self, now):
+        return self._lastTimestamp is None or \
+            now - self._lastTimestamp >= 1. / self._maxRateHz
+
+    def markPublished(self, now):
+        self._lastTimestamp = now
+
+    def factor(self, shape):
+        return int(np.ceil(min(shape) / float(self._targetSize)))
+
+    def reduce(self, array, bufferPool):
+        f = self.factor(array.shape)
+        if f <= 1:
+            return array
+        key = 'display:' + self._name
+        if self._mode == self.SAMPLE:
+            sampled = array[::f, ::f]
+            out = bufferPool.get(key, sampled.shape, array.dtype)
+            np.copyto(out, sampled)
+            return out
+        h, w = array.shape[0] // f, array.shape[1] // f
+        blocks = array[:h * f, :w * f].reshape(h, f, w, f)
+        if self._mode == self.MAX_POOL:
+            out = bufferPool.get(key, (h, w), array.dtype)
+            np.max(blocks, axis=(1, 3), out=out)
+        elif self._mode == self.REBIN_SUM:
+            out = bufferPool.get(key, (h, w), np.float32)
+            np.sum(blocks, axis=(1, 3), dtype=np.float32, out=out)
+        else:
+            out = bufferPool.get(key, (h, w), np.float32)
+            np.mean(blocks, axis=(1, 3), dtype=np.float32, out=out)
+        return out
+
+
+class DisplayStreams(object):
+    '''
+    Rate limited, reduced copies of the frames for GUIs.
+
+    offer() is called by the publisher thread for every frame. When at
+    least one stream is due the frame is copied and handed to a display
+    thread that reduces it for each due stream and calls
+    sendFunc(streamName, frame). The display thread has a queue of one
+    frame and drops the older one, so a slow reduction never delays
+    the publisher thread.
+
+    A stream counts as published only once its frame has been sent.
+    Until then it is pending: it does not cause new copies, but it is
+    carried over to the next queued frame, so that it is not lost when
+    its frame is dropped.
+
+    The DEFAULT stream always exists; other streams are added by name.
+    '''
+
+    DEFAULT = 'default'
+
+    def __init__(self, sendFunc, bufferPool, timeMod=time):
+        self._sendFunc = sendFunc
+        self._bufferPool = bufferPool
+        self._timeMod = timeMod
+        self._logger = Logger.of('DisplayStreams')
+        self._streams = {self.DEFAULT: DisplayStream(self.DEFAULT)}
+        self._pending = set()
+        self._mutex = threading.RLock()
+        self._dispatcher = FrameDispatcher(
+            self._publish, 1, FrameDispatcher.DROP_OLDEST,
+            name='DisplayDispatcher')
+
+    def start(self):
+        self._dispatcher.start()
+
+    def stop(self):
+        self._dispatcher.stop()
+
+    @synchronized("_mutex")
+    def setStream(self, name, targetSize=DisplayStream.DEFAULT_TARGET_SIZE,
+                  maxRateHz=DisplayStream.DEFAULT_MAX_RATE_HZ,
+                  mode=DisplayStream.SAMPLE):
+        if not isinstance(name, str) or len(name) == 0:
+            raise ValueError('Display stream name must be a non empty string')
+        self._pending.discard(self._streams.get(name))
+        self._streams[name] = DisplayStream(name, targetSize, maxRateHz, mode)
+
+    @synchronized("_mutex")
+    def removeStream(self, name):
+        if name == self.DEFAULT:
+            raise ValueError('The default display stream cannot be removed')
+        self._pending.discard(self._streams.pop(name))
+
+    @synchronized("_mutex")
+    def getStreams(self):
+        return {name: stream.getParameters()
+                for name, stream in self._streams.items()}
+
+    def getStatistics(self):
+        return self._dispatcher.getStatistics()
+
+    def offer(self, frame):
+        now = self._timeMod.time()
+        with self._mutex:
+            due = [s for s in self._streams.values()
+                   if s not in self._pending and s.isDue(now)]
+            if len(due) == 0:
+                return
+            due += [s for s in self._streams.values() if s in self._pending]
+            self._pending.update(due)
+        copied = cameraFrameFromArray(np.array(frame.toNumpyArray()),
+                                      frame.counter())
+        self._dispatcher.push((copied, due, now))
+
+    def _publish(self, item):
+        frame, streams, offerTime = item
+        array = frame.toNumpyArray()
+        for stream in streams:
+            try:
+                self._sendFunc(stream.name(), cameraFrameFromArray(
+                    stream.reduce(array, self._bufferPool), frame.counter()))
+                with self._mutex:
+                    stream.markPublished(offerTime)
+            finally:
+                with self._mutex:
+                    self._pending.discard(stream)
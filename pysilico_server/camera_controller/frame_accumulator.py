@@ -0,0 +1,147 @@
+import threading
+import time
+import numpy as np
+from plico.utils.decorator import synchronized
+
+
+class FrameAccumulator(object):
+    '''
+    Combine the next nFrames frames into a single image.
+
+    MEAN and SUM use a running float64 accumulator. MEDIAN and
+    SIGMA_CLIP need all the frames: they are stored in a float32 cube
+    allocated at the first frame, of at most MAX_CUBE_BYTES: with
+    frameShape the limit is checked at construction, otherwise at the
+    first frame.
+    SIGMA_CLIP iteratively discards, pixel by pixel, the values farther
+    than sigma standard deviations from the median and averages the rest.
+
+    add() is called by the publisher thread, wait() and result() by the
+    thread that requested the accumulation. An error while adding a
+    frame, or one set with fail(), completes the accumulation and is
+    raised by result().
+    '''
+
+    MEAN = 'mean'
+    SUM = 'sum'
+    MEDIAN = 'median'
+    SIGMA_CLIP = 'sigma-clip'
+    MODES = (MEAN, SUM, MEDIAN, SIGMA_CLIP)
+    MAX_CUBE_BYTES = 1 << 30
+
+    def __init__(self, nFrames, mode=MEAN, sigma=3.0, maxIterations=5,
+                 frameShape=None, timeMod=time):
+        nFrames = int(nFrames)
+        if nFrames < 1:
+            raise ValueError('nFrames must be at least 1, got %d' % nFrames)
+        if mode not in self.MODES:
+            raise ValueError('Unsupported mode %s. Use one of %s' % (
+                mode, str(self.MODES)))
+        self._nFrames = nFrames
+        self._mode = mode
+        if frameShape is not None:
+            self._checkCubeSize(frameShape)
+        self._timeMod = timeMod
+        self._completionTime = None
+        self._sigma = sigma
+        self._maxIterations = maxIterations
+        self._count = 0
+        self._buffer = None
+        self._error = None
+        self._mutex = threading.RLock()
+        self._completed = threading.Event()
+
+    def _storesFrames(self):
+        return self._mode in (self.MEDIAN, self.SIGMA_CLIP)
+
+    def _checkCubeSize(self, frameShape):
+        if not self._storesFrames():
+            return
+        nBytes = self._nFrames * int(np.prod(frameShape)) * \
+            np.dtype(np.float32).itemsize
+        if nBytes > self.MAX_CUBE_BYTES:
+            raise ValueError(
+                '%s of %d frames %s needs %d MB, more than the %d MB'
+                ' allowed' % (self._mode, self._nFrames, str(tuple(
+                    frameShape)), nBytes >> 20, self.MAX_CUBE_BYTES >> 20))
+
+    def _complete(self):
+        self._completionTime = self._timeMod.time()
+        self._completed.set()
+
+    @synchronized("_mutex")
+    def add(self, array):
+        if self._completed.is_set():
+            return
+        try:
+            self._add(array)
+        except Exception as e:
+            self.fail(e)
+
+    def _add(self, array):
+        if self._buffer is None:
+            if self._storesFrames():
+                self._checkCubeSize(array.shape)
+                self._buffer = np.empty((self._nFrames,) + array.shape,
+                                        dtype=np.float32)
+            else:
+                self._buffer = np.zeros(array.shape, dtype=np.float64)
+        expectedShape = self._buffer.shape[-array.ndim:]
+        if array.shape != expectedShape:
+            raise ValueError(
+                'Frame shape changed from %s to %s during accumulation' % (
+                    expectedShape, array.shape))
+        if self._storesFrames():
+            self._buffer[self._count] = array
+        else:
+            np.add(self._buffer, array, out=self._buffer)
+        self._count += 1
+        if self._count == self._nFrames:
+            self._complete()
+
+    @synchronized("_mutex")
+    def fail(self, error):
+        if self._completed.is_set():
+            return
+        self._error = error
+        self._buffer = None
+        self._complete()
+
+    def isCompleted(self):
+        return self._completed.is_set()
+
+    def completionTime(self):
+        '''timeMod.time() when the accumulation completed, or None'''
+        return self._completionTime
+
+    def wait(self, timeoutSec=None):
+        return self._completed.wait(timeoutSec)
+
+    def count(self):
+        return self._count
+
+    @synchronized("_mutex")
+    def result(self):
+        if self._error is not None:
+            raise self._error
+        if not self._completed.is_set():
+            raise RuntimeError('Accumulated %d frames of %d' % (
+                self._count, self._nFrames))
+        if self._mode == self.SUM:
+            return self._buffer
+        if self._mode == self.MEAN:
+            return self._buffer / self._nFrames
+        if self._mode == self.MEDIAN:
+            return np.median(self._buffer, axis=0).astype(np.float64)
+        return self._sigmaClippedMean()
+
+    def _sigmaClippedMean(self):
+        cube = self._buffer
+        for _ in range(self._maxIterations):
+            median = np.nanmedian(cube, axis=0)
+            std = np.nanstd(cube, axis=0)
+            outliers = np.abs(cube - median) > self._sigma * std
+            if not np.any(outliers):
+                break
+            cube[outliers] = np.nan
+        return np.nanmean(cube, axis=0).astype(np.float64)
@@ -0,0 +1,267 @@
+import threading
+import time
+import numpy as np
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+
+
+class FrameCorrector(object):
+    '''
+    Calibration stage applied to every frame before publishing.
+
+    Calibration data (dark, flat, bad pixel mask) are converted once,
+    when they are set, into planes and index tables so that the per-frame
+    work is a few vectorized in-place operations into buffers of the pool.
+
+    With only a dark the frame is corrected in the output dtype with a
+    saturating subtraction. When a flat or a bad pixel mask is set a
+    fused float32 kernel is used instead:
+
+        out = (frame - dark) * gain
+        out[bad] = mean of the good 8-neighbours of each bad pixel
+
+    where gain = mean(flat) / flat.
+
+    The output dtype defaults to the sensor dtype, set with
+    setSensorDtype. With integer output values are clipped to the dtype
+    range instead of wrapping around. int32 and float32 outputs preserve
+    negative values.
+
+    The dark plane, in the dtype of the subtraction, is rebuilt by the
+    setters, so that the first frame after a change does not pay for it.
+    '''
+
+    OUTPUT_DTYPES = (np.dtype(np.int32), np.dtype(np.float32))
+    WORK_DTYPE = np.dtype(np.float32)
+
+    def __init__(self, bufferPool, clock=time.perf_counter):
+        self._bufferPool = bufferPool
+        self._clock = clock
+        self._logger = Logger.of('FrameCorrector')
+        self._mutex = threading.RLock()
+        self._darkArray = None
+        self._gainPlane = None
+        self._badPixelMask = None
+        self._badPixelIndexes = None
+        self._badPixelNeighbours = None
+        self._badPixelWeights = None
+        self._outputDtype = None
+        self._sensorDtype = None
+        self._darkPlane = None
+        self._mismatchedShapes = set()
+        self._resetTiming()
+
+    def _resetTiming(self):
+        self._correctedFrames = 0
+        self._totalTimeSec = 0.
+        self._lastTimeSec = 0.
+        self._maxTimeSec = 0.
+
+    @synchronized("_mutex")
+    def setDarkFrame(self, darkArray):
+        self._darkArray = None if darkArray is None else np.asarray(darkArray)
+        self._mismatchedShapes = set()
+        self._updateDarkPlane()
+
+    @synchronized("_mutex")
+    def hasDarkFrame(self):
+        return self._darkArray is not None
+
+    @synchronized("_mutex")
+    def setFlatFrame(self, flatArray):
+        if flatArray is None:
+            self._gainPlane = None
+            self._updateDarkPlane()
+            return
+        flat = np.asarray(flatArray, dtype=np.float64)
+        valid = flat > 0
+        if not np.any(valid):
+            raise ValueError('Flat frame has no positive pixels')
+        gain = np.zeros(flat.shape, dtype=self.WORK_DTYPE)
+        gain[valid] = flat[valid].mean() / flat[valid]
+        self._gainPlane = gain
+        self._mismatchedShapes = set()
+        self._updateDarkPlane()
+
+    @synchronized("_mutex")
+    def setBadPixelMask(self, mask):
+        if mask is None:
+            self._badPixelMask = None
+            self._badPixelIndexes = None
+            self._badPixelNeighbours = None
+            self._badPixelWeights = None
+            self._updateDarkPlane()
+            return
+        mask = np.asarray(mask).astype(bool)
+        self._badPixelMask = mask
+        (self._badPixelIndexes,
+         self._badPixelNeighbours,
+         self._badPixelWeights) = self._neighbourTable(mask)
+        self._mismatchedShapes = set()
+        self._updateDarkPlane()
+
+    @staticmethod
+    def _neighbourTable(mask):
+        '''
+        For each bad pixel return its flat index, the flat indexes of its
+        8 neighbours and the weights averaging the good ones.
+        '''
+        rows, cols = mask.shape
+        badY, badX = np.nonzero(mask)
+        offsets = [(dy, dx) for dy in (-1, 0, 1) for dx in (-1, 0, 1)
+                   if (dy, dx) != (0, 0)]
+        ny = badY[:, np.newaxis] + np.array([o[0] for o in offsets])
+        nx = badX[:, np.newaxis] + np.array([o[1] for o in offsets])
+        inside = (ny >= 0) & (ny < rows) & (nx >= 0) & (nx < cols)
+        ny = np.clip(ny, 0, rows - 1)
+        nx = np.clip(nx, 0, cols - 1)
+        good = inside & ~mask[ny, nx]
+        nGood = good.sum(axis=1, keepdims=True)
+        weights = np.where(good, 1. / np.maximum(nGood, 1), 0.)
+        return (np.ravel_multi_index((badY, badX), mask.shape),
+                np.ravel_multi_index((ny, nx), mask.shape),
+                weights.astype(FrameCorrector.WORK_DTYPE))
+
+    @synchronized("_mutex")
+    def setOutputDtype(self, dtype):
+        if dtype is not None:
+            dtype = np.dtype(dtype)
+            if dtype not in self.OUTPUT_DTYPES:
+                raise ValueError(
+                    'Unsupported output dtype %s. Use None (sensor dtype)'
+                    ' or one of %s' % (dtype, [str(d) for d in
+                                               self.OUTPUT_DTYPES]))
+        self._outputDtype = dtype
+        self._updateDarkPlane()
+
+    @synchronized("_mutex")
+    def outputDtype(self, sensorDtype):
+        if self._outputDtype is None:
+            return sensorDtype
+        return self._outputDtype
+
+    @synchronized("_mutex")
+    def setSensorDtype(self, dtype):
+        self._sensorDtype = None if dtype is None else np.dtype(dtype)
+        self._updateDarkPlane()
+
+    def _matches(self, plane, what, shape):
+        if plane is None:
+            return False
+        if plane.shape != shape:
+            if (what, shape) not in self._mismatchedShapes:
+                self._logger.warn(
+                    '%s shape %s does not match frame shape %s.'
+                    ' It is not applied' % (what, plane.shape, shape))
+                self._mismatchedShapes.add((what, shape))
+            return False
+        return True
+
+    def _computeDarkPlane(self, dtype):
+        dark = self._darkArray
+        if np.issubdtype(dtype, np.integer):
+            info = np.iinfo(dtype)
+            dark = np.clip(np.rint(dark), info.min, info.max)
+        return np.ascontiguousarray(dark, dtype=dtype)
+
+    def _updateDarkPlane(self):
+        if self._gainPlane is not None or self._badPixelMask is not None:
+            dtype = self.WORK_DTYPE
+        else:
+            dtype = self.outputDtype(self._sensorDtype)
+        if self._darkArray is None or dtype is None:
+            self._darkPlane = None
+        else:
+            self._darkPlane = self._computeDarkPlane(dtype)
+
+    def _darkPlaneFor(self, shape, dtype):
+        if not self._matches(self._darkArray, 'Dark frame', shape):
+            return None
+        if self._darkPlane is None or self._darkPlane.dtype != dtype:
+            # frames not in the sensor dtype, or a flat or a mask
+            # skipped because of their shape
+            self._darkPlane = self._computeDarkPlane(dtype)
+        return self._darkPlane
+
+    @synchronized("_mutex")
+    def correct(self, raw):
+        '''
+        Return the corrected frame. It is either raw itself, when there
+        is nothing to do, or a buffer of the pool that will be overwritten
+        by the next frame.
+        '''
+        t0 = self._clock()
+        dtype = np.dtype(self.outputDtype(raw.dtype))
+        useGain = self._matches(self._gainPlane, 'Flat frame', raw.shape)
+        useBadPixels = self._matches(self._badPixelMask, 'Bad pixel mask',
+                                     raw.shape)
+        if useGain or useBadPixels:
+            res = self._fusedCorrection(raw, dtype, useGain, useBadPixels)
+        else:
+            res = self._darkCorrection(raw, dtype)
+        if res is not raw:
+            self._updateTiming(self._clock() - t0)
+        return res
+
+    def _darkCorrection(self, raw, dtype):
+        dark = self._darkPlaneFor(raw.shape, dtype)
+        if dark is None and dtype == raw.dtype:
+            return raw
+        out = self._bufferPool.get('corrected', raw.shape, dtype)
+        if dark is None:
+            np.copyto(out, raw, casting='unsafe')
+        elif np.issubdtype(dtype, np.unsignedinteger):
+            np.maximum(raw, dark, out=out, casting='unsafe')
+            np.subtract(out, dark, out=out)
+        else:
+            np.subtract(raw, dark, out=out, casting='unsafe')
+        return out
+
+    def _fusedCorrection(self, raw, dtype, useGain, useBadPixels):
+        if dtype == self.WORK_DTYPE:
+            work = self._bufferPool.get('corrected', raw.shape, dtype)
+        else:
+            work = self._bufferPool.get('calibrationWork', raw.shape,
+                                        self.WORK_DTYPE)
+        dark = self._darkPlaneFor(raw.shape, self.WORK_DTYPE)
+        if dark is None:
+            np.copyto(work, raw, casting='unsafe')
+        else:
+            np.subtract(raw, dark, out=work, casting='unsafe')
+        if useGain:
+            np.multiply(work, self._gainPlane, out=work)
+        if useBadPixels:
+            flat = work.reshape(-1)
+            flat[self._badPixelIndexes] = np.einsum(
+                'ij,ij->i', flat[self._badPixelNeighbours],
+                self._badPixelWeights)
+        if dtype == self.WORK_DTYPE:
+            return work
+        out = self._bufferPool.get('corrected', raw.shape, dtype)
+        info = np.iinfo(dtype)
+        upper = np.nextafter(self.WORK_DTYPE.type(info.max),
+                             self.WORK_DTYPE.type(0))
+        np.clip(work, info.min, upper, out=work)
+        np.rint(work, out=work)
+        np.copyto(out, work, casting='unsafe')
+        return out
+
+    def _updateTiming(self, elapsedSec):
+        self._correctedFrames += 1
+        self._totalTimeSec += elapsedSec
+        self._lastTimeSec = elapsedSec
+        self._maxTimeSec = max(self._maxTimeSec, elapsedSec)
+
+    @synchronized("_mutex")
+    def getTiming(self):
+        '''Per-frame cost of the correction, in microseconds'''
+        n = self._correctedFrames
+        return {'correctedFrames': n,
+                'lastUs': self._lastTimeSec * 1e6,
+                'meanUs': self._totalTimeSec / n * 1e6 if n else 0.,
+                'maxUs': self._maxTimeSec * 1e6,
+                }
+
+    @synchronized("_mutex")
+    def resetTiming(self):
+        self._resetTiming()
@@ -0,0 +1,183 @@
+import collections
+import threading
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+
+
+class FrameDispatcher(object):
+    '''
+    Decouple frame publishing from the camera driver thread.
+
+    Frames pushed by the driver callback are stored in a bounded ring
+    and handed to publishFunc by a dedicated publisher thread, so that
+    the driver callback returns as soon as the frame is queued.
+    When the ring is full the drop policy decides what happens:
+
+    - DROP_OLDEST: the oldest queued frame is discarded
+    - DROP_NEWEST: the incoming frame is discarded
+    - BLOCK: the driver thread waits until there is room in the ring
+
+    Frames are queued by reference: devices build a new CameraFrame
+    for every acquired image, so the queued frames own their data.
+    '''
+
+    DROP_OLDEST = 'drop-oldest'
+    DROP_NEWEST = 'drop-newest'
+    BLOCK = 'block'
+    POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+    DEFAULT_QUEUE_SIZE = 8
+
+    def __init__(self,
+                 publishFunc,
+                 maxQueueSize=DEFAULT_QUEUE_SIZE,
+                 dropPolicy=DROP_OLDEST,
+                 name='FrameDispatcher'):
+        self._publishFunc = publishFunc
+        self._name = name
+        self._logger = Logger.of(name)
+        self._queue = collections.deque()
+        self._mutex = threading.RLock()
+        self._condition = threading.Condition(self._mutex)
+        self._maxQueueSize = None
+        self._dropPolicy = None
+        self.setMaxQueueSize(maxQueueSize)
+        self.setDropPolicy(dropPolicy)
+        self._isRunning = False
+        self._thread = None
+        self._resetCounters()
+
+    def _resetCounters(self):
+        self._pushedFrames = 0
+        self._publishedFrames = 0
+        self._droppedOldest = 0
+        self._droppedNewest = 0
+        self._blockedPushes = 0
+        self._publishErrors = 0
+        self._maxQueueLength = 0
+
+    @synchronized("_mutex")
+    def setDropPolicy(self, dropPolicy):
+        if dropPolicy not in self.POLICIES:
+            raise ValueError('Unsupported drop policy %s. Use one of %s' %
+                             (dropPolicy, str(self.POLICIES)))
+        self._dropPolicy = dropPolicy
+        self._condition.notify_all()
+
+    @synchronized("_mutex")
+    def getDropPolicy(self):
+        return self._dropPolicy
+
+    @synchronized("_mutex")
+    def setMaxQueueSize(self, maxQueueSize):
+        maxQueueSize = int(maxQueueSize)
+        if maxQueueSize < 1:
+            raise ValueError('Queue size must be at least 1, got %d' %
+                             maxQueueSize)
+        self._maxQueueSize = maxQueueSize
+        while len(self._queue) > self._maxQueueSize:
+            self._queue.popleft()
+            self._droppedOldest += 1
+        self._condition.notify_all()
+
+    @synchronized("_mutex")
+    def getMaxQueueSize(self):
+        return self._maxQueueSize
+
+    def start(self):
+        with self._mutex:
+            if self._isRunning:
+                return
+            self._isRunning = True
+        self._thread = threading.Thread(target=self._run,
+                                        name=self._name,
+                                        daemon=True)
+        self._thread.start()
+        self._logger.notice('Started. Queue size %d, drop policy %s' % (
+            self._maxQueueSize, self._dropPolicy))
+
+    def stop(self, timeoutSec=2.0):
+        with self._mutex:
+            if not self._isRunning:
+                return
+            self._isRunning = False
+            self._condition.notify_all()
+        if self._thread is not threading.current_thread():
+            self._thread.join(timeoutSec)
+        self._thread = None
+        self._logger.notice('Stopped')
+
+    def isRunning(self):
+        return self._isRunning
+
+    def push(self, frame):
+        '''Called from the driver thread: queue the frame and return'''
+        with self._mutex:
+            self._pushedFrames += 1
+            if len(self._queue) >= self._maxQueueSize:
+                if self._dropPolicy == self.DROP_NEWEST:
+                    self._droppedNewest += 1
+                    return
+                elif self._dropPolicy == self.DROP_OLDEST:
+                    self._queue.popleft()
+                    self._droppedOldest += 1
+                else:
+                    self._blockedPushes += 1
+                    while (self._isRunning and
+                           self._dropPolicy == self.BLOCK and
+                           len(self._queue) >= self._maxQueueSize):
+                        self._condition.wait()
+                    if len(self._queue) >= self._maxQueueSize:
+                        self._queue.popleft()
+                        self._droppedOldest += 1
+            self._queue.append(frame)
+            self._maxQueueLength = max(self._maxQueueLength,
+                                       len(self._queue))
+            self._condition.notify_all()
+
+    def _nextFrame(self):
+        with self._mutex:
+            while self._isRunning and len(self._queue) == 0:
+                self._condition.wait()
+            if not self._isRunning:
+                return None
+            frame = self._queue.popleft()
+            self._condition.notify_all()
+            return frame
+
+    def _run(self):
+        while True:
+            frame = self._nextFrame()
+            if frame is None:
+                break
+            try:
+                self._publishFunc(frame)
+                with self._mutex:
+                    self._publishedFrames += 1
+            except Exception as e:
+                with self._mutex:
+                    self._publishErrors += 1
+                self._logger.error('Failed to publish frame: %s' % str(e))
+
+    @synchronized("_mutex")
+    def queueLength(self):
+        return len(self._queue)
+
+    @synchronized("_mutex")
+    def getStatistics(self):
+        return {'dropPolicy': self._dropPolicy,
+                'maxQueueSize': self._maxQueueSize,
+                'queueLength': len(self._queue),
+                'maxQueueLength': self._maxQueueLength,
+                'pushedFrames': self._pushedFrames,
+                'publishedFrames': self._publishedFrames,
+                'droppedOldest': self._droppedOldest,
+                'droppedNewest': self._droppedNewest,
+                'droppedFrames': self._droppedOldest + self._droppedNewest,
+                'blockedPushes': self._blockedPushes,
+                'publishErrors': self._publishErrors,
+                }
+
+    @synchronized("_mutex")
+    def resetStatistics(self):
+        self._resetCounters()
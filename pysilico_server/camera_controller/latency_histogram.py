@@ -0,0 +1,108 @@
+import bisect
+import threading
+import numpy as np
+from plico.utils.decorator import synchronized
+
+
+class LatencyHistogram(object):
+    '''
+    Histogram of latencies on logarithmic bins, BINS_PER_DECADE per
+    decade from MIN_SEC to MAX_SEC. Shorter and longer latencies are
+    counted in two more bins, below and above the range.
+
+    Percentiles are estimated as the upper edge of the bin where they
+    fall, i.e. with an error of about 25% at 10 bins per decade.
+    '''
+
+    MIN_SEC = 1e-6
+    MAX_SEC = 10.
+    BINS_PER_DECADE = 10
+    PERCENTILES = (50, 90, 99)
+
+    def __init__(self):
+        nBins = int(round(np.log10(self.MAX_SEC / self.MIN_SEC) *
+                          self.BINS_PER_DECADE))
+        self._edges = list(np.logspace(np.log10(self.MIN_SEC),
+                                       np.log10(self.MAX_SEC), nBins + 1))
+        self._mutex = threading.Lock()
+        self.reset()
+
+    @synchronized("_mutex")
+    def reset(self):
+        self._counts = [0] * (len(self._edges) + 1)
+        self._count = 0
+        self._sum = 0.
+        self._min = None
+        self._max = None
+
+    @synchronized("_mutex")
+    def record(self, valueSec):
+        self._counts[bisect.bisect_right(self._edges, valueSec)] += 1
+        self._count += 1
+        self._sum += valueSec
+        if self._min is None or valueSec < self._min:
+            self._min = valueSec
+        if self._max is None or valueSec > self._max:
+            self._max = valueSec
+
+    def _percentile(self, percentile):
+        threshold = self._count * percentile / 100.
+        cumulated = 0
+        for i, count in enumerate(self._counts):
+            cumulated += count
+            if cumulated >= threshold:
+                return self._edges[min(i, len(self._edges) - 1)]
+
+    @synchronized("_mutex")
+    def getStatistics(self):
+        res = {'count': self._count,
+               'meanSec': self._sum / self._count if self._count else None,
+               'minSec': self._min,
+               'maxSec': self._max,
+               'edgesSec': list(self._edges),
+               'counts': list(self._counts)}
+        for percentile in self.PERCENTILES:
+            res['p%dSec' % percentile] = \
+                self._percentile(percentile) if self._count else None
+        return res
+
+
+class FrameLatencies(object):
+    '''
+    Latency histograms of the frame pipeline, from the host timestamps
+    of the frames:
+
+    - QUEUE: from receive to the start of the processing in the
+      publisher thread
+    - PROCESSING: from the start of the processing to publish
+    - TOTAL: from receive to publish
+
+    Device timestamps are in the clock of the camera and are not used.
+    '''
+
+    QUEUE = 'queue'
+    PROCESSING = 'processing'
+    TOTAL = 'total'
+
+    def __init__(self):
+        self._histograms = {name: LatencyHistogram()
+                            for name in (self.QUEUE, self.PROCESSING,
+                                         self.TOTAL)}
+
+    def record(self, timestamps, startSec):
+        receive = timestamps.get('receive')
+        publish = timestamps.get('publish')
+        if publish is None:
+            return
+        self._histograms[self.PROCESSING].record(publish - startSec)
+        if receive is not None:
+            self._histograms[self.QUEUE].record(startSec - receive)
+            self._histograms[self.TOTAL].record(publish - receive)
+
+    def getStatistics(self):
+        return {name: histogram.getStatistics()
+                for name, histogram in self._histograms.items()}
+
+    def reset(self):
+        for histogram in self._histograms.values():
+            histogram.reset()
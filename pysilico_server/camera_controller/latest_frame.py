@@ -0,0 +1,103 @@
+import threading
+import time
+import numpy as np
+from pysilico_server.utils.frame_utils import cameraFrameFromArray, \
+    frameTimestamps
+
+
+class LatestFrameSlot(object):
+    '''
+    The most recent published frame, for clients that poll it instead
+    of subscribing to the frame stream.
+
+    The publisher thread calls update() for every frame and publishes
+    it by replacing a single reference, that is atomic: readers take
+    no lock and never delay the publisher thread. Frames that own
+    their buffer are stored by reference. The others live in buffers
+    reused by the pipeline, so they are copied in the back one of two
+    buffers. Each buffer has a generation number, incremented before
+    and after writing it, and a reader retries if the buffer it was
+    copying has been rewritten meanwhile, up to MAX_COPY_ATTEMPTS
+    times: a reader that keeps being overtaken by the publisher gets a
+    TimeoutError instead of spinning.
+
+    Only readers waiting for a newer frame use the condition variable.
+    '''
+
+    MAX_COPY_ATTEMPTS = 8
+
+    def __init__(self, timeMod=time):
+        self._timeMod = timeMod
+        self._buffers = [None, None]
+        self._generations = [0, 0]
+        self._back = 0
+        self._latest = None
+        self._waiters = 0
+        self._condition = threading.Condition()
+
+    def update(self, frame, ownsBuffer=False):
+        if ownsBuffer:
+            latest = (frame, None, None)
+        else:
+            i = self._back
+            array = frame.toNumpyArray()
+            buf = self._buffers[i]
+            if buf is None or buf.shape != array.shape or \
+                    buf.dtype != array.dtype:
+                buf = np.empty_like(array)
+                self._buffers[i] = buf
+            self._generations[i] += 1
+            np.copyto(buf, array)
+            self._generations[i] += 1
+            self._back = 1 - i
+            latest = (cameraFrameFromArray(buf, frame.counter(),
+                                           frameTimestamps(frame)), i,
+                      self._generations[i])
+        self._latest = latest
+        if self._waiters:
+            with self._condition:
+                self._condition.notify_all()
+
+    def latestCounter(self):
+        latest = self._latest
+        return None if latest is None else latest[0].counter()
+
+    def _isNewEnough(self, minCounter):
+        counter = self.latestCounter()
+        return counter is not None and \
+            (minCounter is None or counter > minCounter)
+
+    def _snapshot(self):
+        for _ in range(self.MAX_COPY_ATTEMPTS):
+            frame, i, generation = self._latest
+            if i is None:
+                return frame
+            copied = cameraFrameFromArray(np.array(frame.toNumpyArray()),
+                                          frame.counter(),
+                                          frameTimestamps(frame))
+            if self._generations[i] == generation:
+                return copied
+        raise TimeoutError('Latest frame overwritten during %d copies' %
+                           self.MAX_COPY_ATTEMPTS)
+
+    def get(self, minCounter=None, timeoutSec=0.):
+        '''
+        Return the latest frame if its counter is greater than
+        minCounter (any frame if None), otherwise wait up to timeoutSec
+        for one and raise TimeoutError.
+        '''
+        if not self._isNewEnough(minCounter):
+            deadline = self._timeMod.time() + timeoutSec
+            with self._condition:
+                self._waiters += 1
+                try:
+                    while not self._isNewEnough(minCounter):
+                        remaining = deadline - self._timeMod.time()
+                        if remaining <= 0:
+                            raise TimeoutError(
+                                'No frame newer than %s in %g s' % (
+                                    minCounter, timeoutSec))
+                        self._condition.wait(remaining)
+                finally:
+                    self._waiters -= 1
+        return self._snapshot()
@@ -0,0 +1,151 @@
+import threading
+import time
+import numpy as np
+from plico.utils.decorator import synchronized
+from pysilico_server.camera_controller.frame_dispatcher import \
+    FrameDispatcher
+from pysilico_server.utils.frame_protocol import FrameProtocol
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+class OutputStream(object):
+    '''
+    A named frame stream with its own PUB socket.
+
+    Each stream publishes one frame every decimation frames and, if
+    maxRateHz is given, at most maxRateHz frames per second. The
+    socket high water mark is chosen when the socket is created: a
+    latest-only stream uses hwm=1, so that a slow subscriber holds at
+    most one frame in the ZMQ queue.
+
+    A stream with a FrameCodec sends compressed frames (version 2 of
+    FrameProtocol) whatever the protocol of the controller is.
+    '''
+
+    def __init__(self, name, socket, decimation=1, maxRateHz=None,
+                 codec=None):
+        if not isinstance(name, str) or len(name) == 0:
+            raise ValueError('Output stream name must be a non empty string')
+        self._name = name
+        self._socket = socket
+        self._frames = 0
+        self._sent = 0
+        self._lastTimestamp = None
+        self._codec = codec
+        self.setRate(decimation, maxRateHz)
+
+    def name(self):
+        return self._name
+
+    def socket(self):
+        return self._socket
+
+    def codec(self):
+        return self._codec
+
+    def setRate(self, decimation=1, maxRateHz=None):
+        decimation = int(decimation)
+        if decimation < 1:
+            raise ValueError('decimation must be at least 1, got %d' %
+                             decimation)
+        if maxRateHz is not None and maxRateHz <= 0:
+            raise ValueError('maxRateHz must be positive or None')
+        self._decimation = decimation
+        self._maxRateHz = maxRateHz
+
+    def isDue(self, now):
+        '''Count a frame and tell if it has to be published'''
+        self._frames += 1
+        if (self._frames - 1) % self._decimation:
+            return False
+        if self._maxRateHz is not None and self._lastTimestamp is not None \
+                and now - self._lastTimestamp < 1. / self._maxRateHz:
+            return False
+        self._lastTimestamp = now
+        self._sent += 1
+        return True
+
+    def getParameters(self):
+        res = {'decimation': self._decimation,
+               'maxRateHz': self._maxRateHz,
+               'frames': self._frames,
+               'sent': self._sent}
+        if self._codec is not None:
+            res['compression'] = self._codec.getStatistics()
+        return res
+
+
+class OutputStreams(object):
+    '''
+    Publish the frames on the named output streams.
+
+    sendFunc(socket, frame, ownsBuffer) sends a frame with the frame
+    protocol of the controller. Streams are created at startup with
+    their sockets; only their rates can be changed afterwards.
+
+    Compressed streams are encoded by a worker thread each, with a
+    queue of COMPRESSION_QUEUE_SIZE frames that drops the oldest one,
+    so that compression never delays the publisher thread.
+    '''
+
+    COMPRESSION_QUEUE_SIZE = 2
+
+    def __init__(self, sendFunc, streams=(), timeMod=time):
+        self._sendFunc = sendFunc
+        self._timeMod = timeMod
+        self._mutex = threading.RLock()
+        self._streams = {}
+        self._compressors = {}
+        for stream in streams:
+            if stream.name() in self._streams:
+                raise ValueError('Duplicated output stream %s' %
+                                 stream.name())
+            self._streams[stream.name()] = stream
+            if stream.codec() is not None:
+                stream.codec().reset()
+                self._compressors[stream.name()] = FrameDispatcher(
+                    lambda frame, s=stream: self._sendCompressed(s, frame),
+                    self.COMPRESSION_QUEUE_SIZE, FrameDispatcher.DROP_OLDEST,
+                    name='Compressor-%s' % stream.name())
+
+    def start(self):
+        for compressor in self._compressors.values():
+            compressor.start()
+
+    def stop(self):
+        for compressor in self._compressors.values():
+            compressor.stop()
+
+    def hasStreams(self):
+        return len(self._streams) > 0
+
+    @synchronized("_mutex")
+    def setRate(self, name, decimation=1, maxRateHz=None):
+        self._streams[name].setRate(decimation, maxRateHz)
+
+    @synchronized("_mutex")
+    def getStreams(self):
+        res = {name: stream.getParameters()
+               for name, stream in self._streams.items()}
+        for name, compressor in self._compressors.items():
+            res[name]['compressorQueue'] = compressor.getStatistics()
+        return res
+
+    def publish(self, frame, ownsBuffer=False):
+        if not self._streams:
+            return
+        now = self._timeMod.time()
+        with self._mutex:
+            due = [s for s in self._streams.values() if s.isDue(now)]
+        owned = frame if ownsBuffer else None
+        for stream in due:
+            if stream.codec() is None:
+                self._sendFunc(stream.socket(), frame, ownsBuffer)
+                continue
+            if owned is None:
+                owned = cameraFrameFromArray(np.array(frame.toNumpyArray()),
+                                             frame.counter())
+            self._compressors[stream.name()].push(owned)
+
+    def _sendCompressed(self, stream, frame):
+        FrameProtocol.sendCompressed(stream.socket(), frame, stream.codec())
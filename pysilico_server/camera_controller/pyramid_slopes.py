@@ -0,0 +1,120 @@
+import threading
+import numpy as np
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+
+
+class PyramidSlopeComputer(object):
+    '''
+    Slopes of a pyramid wavefront sensor computed from its four pupils.
+
+    Pupils are circles of the same radius centered in pupilsCenter,
+    a (4, 2) array of (y, x) coordinates, ordered as in
+    SimulatedPyramidWfsCamera. All quantities are in pixels of the
+    published (binned) frame. For each valid pixel
+
+        sx = (I1 + I3 - I0 - I2) / norm
+        sy = (I0 + I1 - I2 - I3) / norm
+
+    where norm is I0 + I1 + I2 + I3 of the same pixel (LOCAL) or its
+    average over the pupil (GLOBAL). Pixels with no flux have null slope.
+
+    The (4, nPixels) table of flat indexes of the pupil pixels is built
+    once per frame shape, so that each frame costs one gather and a few
+    in-place operations. compute() returns the float32 vector
+    [sx..., sy...] in a buffer of the pool.
+    '''
+
+    LOCAL = 'local'
+    GLOBAL = 'global'
+    NORMALIZATIONS = (LOCAL, GLOBAL)
+
+    def __init__(self, bufferPool, pupilsCenter, pupilRadius,
+                 normalization=LOCAL):
+        pupilsCenter = np.asarray(pupilsCenter, dtype=float)
+        if pupilsCenter.shape != (4, 2):
+            raise ValueError('pupilsCenter must have shape (4, 2), got %s' %
+                             str(pupilsCenter.shape))
+        if pupilRadius <= 0:
+            raise ValueError('pupilRadius must be positive')
+        if normalization not in self.NORMALIZATIONS:
+            raise ValueError('Unsupported normalization %s. Use one of %s' %
+                             (normalization, str(self.NORMALIZATIONS)))
+        self._bufferPool = bufferPool
+        self._pupilsCenter = pupilsCenter
+        self._pupilRadius = float(pupilRadius)
+        self._normalization = normalization
+        self._logger = Logger.of('PyramidSlopeComputer')
+        self._indexTable = None
+        self._tableShape = None
+        self._skippedShapes = set()
+        self._mutex = threading.RLock()
+
+    def getGeometry(self):
+        return {'pupilsCenter': self._pupilsCenter.copy(),
+                'pupilRadius': self._pupilRadius,
+                'normalization': self._normalization,
+                'nSubapertures': self._pupilOffsets()[0].size}
+
+    def _pupilOffsets(self):
+        r = self._pupilRadius
+        n = int(np.ceil(r))
+        y, x = np.mgrid[-n:n, -n:n] + 0.5
+        dy, dx = np.nonzero(y ** 2 + x ** 2 <= r ** 2)
+        return dy - n, dx - n
+
+    def _buildIndexTable(self, shape):
+        dy, dx = self._pupilOffsets()
+        corners = np.round(self._pupilsCenter).astype(int)
+        ys = corners[:, 0:1] + dy[np.newaxis, :]
+        xs = corners[:, 1:2] + dx[np.newaxis, :]
+        if ys.min() < 0 or xs.min() < 0 or \
+                ys.max() >= shape[0] or xs.max() >= shape[1]:
+            return None
+        return np.ravel_multi_index((ys, xs), shape)
+
+    def _indexTableFor(self, shape):
+        if shape != self._tableShape:
+            self._indexTable = self._buildIndexTable(shape)
+            self._tableShape = shape
+        if self._indexTable is None and shape not in self._skippedShapes:
+            self._logger.warn('Pupils do not fit frame shape %s.'
+                              ' Slopes are not computed' % str(shape))
+            self._skippedShapes.add(shape)
+        return self._indexTable
+
+    @synchronized("_mutex")
+    def compute(self, array):
+        '''
+        Return the slope vector of the frame, or None if the pupils
+        do not fit in it.
+        '''
+        indexTable = self._indexTableFor(array.shape)
+        if indexTable is None:
+            return None
+        nPix = indexTable.shape[1]
+        pixels = self._bufferPool.get('slopesPixels', indexTable.shape,
+                                      array.dtype)
+        np.take(array.reshape(-1), indexTable, out=pixels)
+        i = self._bufferPool.get('slopesIntensity', indexTable.shape,
+                                 np.float32)
+        np.copyto(i, pixels, casting='unsafe')
+        slopes = self._bufferPool.get('slopes', (2 * nPix,), np.float32)
+        sx = slopes[:nPix]
+        sy = slopes[nPix:]
+        norm = self._bufferPool.get('slopesNorm', (nPix,), np.float32)
+        # sx = I1 + I3 - I0 - I2, sy = I0 + I1 - I2 - I3
+        np.add(i[1], i[3], out=sx)
+        np.add(i[0], i[2], out=norm)
+        np.subtract(sx, norm, out=sx)
+        np.add(i[0], i[1], out=sy)
+        np.add(i[2], i[3], out=norm)
+        np.subtract(sy, norm, out=sy)
+        i.sum(axis=0, out=norm)
+        if self._normalization == self.GLOBAL:
+            norm.fill(norm.mean())
+        dark = norm <= 0
+        norm[dark] = 1
+        np.divide(slopes.reshape(2, nPix), norm, out=slopes.reshape(2, nPix))
+        slopes.reshape(2, nPix)[:, dark] = 0
+        return slopes
@@ -0,0 +1,131 @@
+import threading
+import numpy as np
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+from pysilico_server.utils.frame_protocol import FrameProtocol
+
+
+class RoiPublisher(object):
+    '''
+    Publish named regions of interest of every frame.
+
+    All ROIs share one PUB socket; each one is sent as a two parts
+    message [name, pickled CameraFrame] so that clients subscribe only
+    to the ROIs they need using the name as ZMQ topic.
+
+    A rectangular ROI is published as a 2D view of the frame, without
+    copying it. A mask ROI is published as the 1D vector of the pixels
+    selected by the mask, in row-major order, gathered into a buffer
+    of the pool.
+
+    ROIs are expressed in pixels of the published (binned) frame.
+    ROIs that do not fit the frame are skipped with a warning.
+
+    sendFunc(socket, frame, topic) publishes the ROI frames; by default
+    they are sent pickled.
+    '''
+
+    RECTANGLE = 'rectangle'
+    MASK = 'mask'
+
+    def __init__(self, socket, bufferPool, sendFunc=None):
+        self._socket = socket
+        self._bufferPool = bufferPool
+        self._sendFunc = sendFunc or self._sendPickled
+        self._logger = Logger.of('RoiPublisher')
+        self._rois = {}
+        self._skipped = set()
+        self._mutex = threading.RLock()
+
+    @staticmethod
+    def _sendPickled(socket, frame, topic):
+        FrameProtocol.send(socket, frame, FrameProtocol.PICKLE, topic)
+
+    @staticmethod
+    def _checkName(name):
+        if not isinstance(name, str) or len(name) == 0:
+            raise ValueError('ROI name must be a non empty string')
+
+    def _checkSocket(self):
+        if self._socket is None:
+            raise ValueError('ROI publishing is not configured on this server')
+
+    @synchronized("_mutex")
+    def setRectangle(self, name, y, x, height, width):
+        self._checkName(name)
+        self._checkSocket()
+        y, x, height, width = int(y), int(x), int(height), int(width)
+        if y < 0 or x < 0 or height < 1 or width < 1:
+            raise ValueError('Invalid rectangle %s' % str(
+                (y, x, height, width)))
+        self._rois[name] = {'type': self.RECTANGLE,
+                            'slices': (slice(y, y + height),
+                                       slice(x, x + width)),
+                            'extent': (y + height, x + width),
+                            'rectangle': (y, x, height, width)}
+        self._skipped.discard(name)
+
+    @synchronized("_mutex")
+    def setMask(self, name, mask):
+        self._checkName(name)
+        self._checkSocket()
+        mask = np.asarray(mask).astype(bool)
+        if mask.ndim != 2 or not np.any(mask):
+            raise ValueError('ROI mask must be a 2D array with at least'
+                             ' one pixel set')
+        self._rois[name] = {'type': self.MASK,
+                            'indexes': np.flatnonzero(mask),
+                            'shape': mask.shape}
+        self._skipped.discard(name)
+
+    @synchronized("_mutex")
+    def remove(self, name):
+        del self._rois[name]
+        self._skipped.discard(name)
+
+    @synchronized("_mutex")
+    def getRois(self):
+        '''Return {name: description} of the registered ROIs'''
+        res = {}
+        for name, roi in self._rois.items():
+            if roi['type'] == self.RECTANGLE:
+                res[name] = {'type': self.RECTANGLE,
+                             'rectangle': roi['rectangle']}
+            else:
+                res[name] = {'type': self.MASK,
+                             'shape': roi['shape'],
+                             'pixels': len(roi['indexes'])}
+        return res
+
+    @synchronized("_mutex")
+    def hasRois(self):
+        return len(self._rois) > 0
+
+    def _fits(self, name, roi, shape):
+        if roi['type'] == self.RECTANGLE:
+            ok = roi['extent'][0] <= shape[0] and roi['extent'][1] <= shape[1]
+        else:
+            ok = roi['shape'] == shape
+        if not ok and name not in self._skipped:
+            self._logger.warn('ROI %s does not fit frame shape %s.'
+                              ' It is not published' % (name, shape))
+            self._skipped.add(name)
+        return ok
+
+    def _extract(self, name, roi, array):
+        if roi['type'] == self.RECTANGLE:
+            return array[roi['slices']]
+        indexes = roi['indexes']
+        out = self._bufferPool.get('roi:' + name, indexes.shape, array.dtype)
+        np.take(array.reshape(-1), indexes, out=out)
+        return out
+
+    @synchronized("_mutex")
+    def publish(self, frame):
+        array = frame.toNumpyArray()
+        for name, roi in self._rois.items():
+            if not self._fits(name, roi, array.shape):
+                continue
+            self._sendFunc(self._socket, cameraFrameFromArray(
+                self._extract(name, roi, array), frame.counter()), name)
@@ -12,9 +12,21 @@ from plico.utils.control_loop import IntolerantControlLoop
 from plico.utils.decorator import override
 from pysilico_server.camera_controller.camera_controller import \
     CameraController
+from pysilico_server.camera_controller.frame_dispatcher import \
+    FrameDispatcher
+from pysilico_server.camera_controller.calibration_store import \
+    CalibrationStore
+from pysilico_server.camera_controller.status_publisher import \
+    StatusPublisher
+from pysilico_server.camera_controller.asyncio_control_loop import \
+    AsyncioControlLoop
+from pysilico_server.camera_controller.output_streams import OutputStream
 from plico.rpc.zmq_ports import ZmqPorts
+from pysilico_server.utils.constants import Constants
+from pysilico_server.utils.frame_protocol import FrameProtocol
+from pysilico_server.utils.frame_codec import FrameCodec
+from pysilico_server.utils.shared_frame_ring import SharedFrameRing
 import functools
-import traceback
 
 
 # Windows old versions
@@ -72,6 +84,10 @@ class Runner(BaseRunner):
             self._createSimulatedPyramidWfsCamera(cameraDeviceSection)
         elif cameraModel == 'simulatedAuxiliaryCamera':
             self._createSimulatedAuxiliaryCamera(cameraDeviceSection)
+        elif cameraModel == 'syntheticStress':
+            self._createSyntheticStressCamera(cameraDeviceSection)
+        elif cameraModel == 'replay':
+            self._createReplayCamera(cameraDeviceSection)
         elif cameraModel == 'avt':
             self._use_vimba_wrapper = True
             self._createAvtCamera(cameraDeviceSection)
@@ -88,11 +104,85 @@ class Runner(BaseRunner):
         cameraName = self.configuration.deviceName(cameraDeviceSection)
         self._camera = SimulatedPyramidWfsCamera(cameraName)
         self._setBinning(cameraDeviceSection)
+        self._setSimulationOptions(cameraDeviceSection)
 
     def _createSimulatedAuxiliaryCamera(self, cameraDeviceSection):
         cameraName = self.configuration.deviceName(cameraDeviceSection)
         self._camera = SimulatedAuxiliaryCamera(cameraName)
         self._setBinning(cameraDeviceSection)
+        self._setSimulationOptions(cameraDeviceSection)
+
+    def _createSyntheticStressCamera(self, cameraDeviceSection):
+        '''
+        Load generator emitting a ring of random frames, e.g.
+
+            [deviceStress]
+            name= Stress Camera
+            model= syntheticStress
+            rows= 240
+            cols= 240
+            dtype= uint16
+            frame_rate= 10000
+            ring_frames= 16
+        '''
+        from pysilico_server.devices.synthetic_stress_camera import \
+            SyntheticStressCamera
+        Camera = SyntheticStressCamera
+
+        def _value(entry, default, **kwds):
+            try:
+                return self.configuration.getValue(
+                    cameraDeviceSection, entry, **kwds)
+            except KeyError:
+                return default
+
+        cameraName = self.configuration.deviceName(cameraDeviceSection)
+        self._camera = Camera(
+            cameraName,
+            shape=(_value('rows', Camera.DEFAULT_SHAPE[0], getint=True),
+                   _value('cols', Camera.DEFAULT_SHAPE[1], getint=True)),
+            dtype=_value('dtype', 'uint16'),
+            nFrames=_value('ring_frames', Camera.DEFAULT_N_FRAMES,
+                           getint=True),
+            frameRate=_value('frame_rate', Camera.DEFAULT_FRAME_RATE,
+                             getfloat=True),
+            seed=_value('seed', None, getint=True))
+
+    def _createReplayCamera(self, cameraDeviceSection):
+        '''
+        Replay recorded frames, e.g.
+
+            [deviceReplay]
+            name= Replayed WFS Camera
+            model= replay
+            file= /data/wfs_cube.npy
+            timestamps_file= /data/wfs_timestamps.npy
+            loop= true
+
+        frame_rate plays at a fixed rate instead of the recorded
+        timestamps; speed scales the recorded pace. binning and
+        exposure_time_ms describe the recording.
+        '''
+        from pysilico_server.devices.replay_camera import ReplayCamera
+
+        def _value(entry, default, **kwds):
+            try:
+                return self.configuration.getValue(
+                    cameraDeviceSection, entry, **kwds)
+            except KeyError:
+                return default
+
+        cameraName = self.configuration.deviceName(cameraDeviceSection)
+        self._camera = ReplayCamera(
+            cameraName,
+            self.configuration.getValue(cameraDeviceSection, 'file'),
+            timestampsPath=_value('timestamps_file', None),
+            frameRate=_value('frame_rate', None, getfloat=True),
+            loop=_value('loop', True, getboolean=True),
+            speed=_value('speed', 1., getfloat=True),
+            binning=_value('binning', 1, getint=True),
+            exposureTimeInMilliSec=_value('exposure_time_ms', 0.,
+                                          getfloat=True))
 
     @WithVimbaIfNeeded()
     def _createAvtCamera(self, cameraDeviceSection):
@@ -142,6 +232,200 @@ class Runner(BaseRunner):
             self._logger.warn(
                 "binning not set (not specified in configuration?)")
 
+    def _setSimulationOptions(self, cameraDeviceSection):
+        try:
+            self._camera.setSeed(self.configuration.getValue(
+                cameraDeviceSection, 'seed', getint=True))
+        except KeyError:
+            pass
+        try:
+            self._camera.setNoiseBankSize(self.configuration.getValue(
+                cameraDeviceSection, 'noise_bank_frames', getint=True))
+        except KeyError:
+            pass
+
+    def _createCalibrationStore(self):
+        cameraDeviceSection = self.configuration.getValue(
+            self.getConfigurationSection(), 'camera')
+        try:
+            darkFrameTag = self.configuration.getValue(
+                cameraDeviceSection, 'dark_frame')
+        except KeyError:
+            return None
+        # darks per mode live in dark_frame/<tag>/, next to the dark
+        # dark_frame/<tag>.fits saved by pysilico, used as default
+        folder = os.path.join(self.configuration.calibrationRootDir(),
+                              'dark_frame', darkFrameTag)
+        defaultDarkPath = folder + '.fits'
+        if not os.path.isfile(defaultDarkPath):
+            defaultDarkPath = None
+        store = CalibrationStore(folder, self._camera.name(),
+                                 defaultDarkPath)
+        store.load()
+        return store
+
+    def _hasShackHartmannConfiguration(self):
+        cameraDeviceSection = self.configuration.getValue(
+            self.getConfigurationSection(), 'camera')
+        try:
+            self.configuration.getValue(cameraDeviceSection, 'sh_subap_size')
+        except KeyError:
+            return False
+        return True
+
+    def _configureShackHartmann(self):
+        cameraDeviceSection = self.configuration.getValue(
+            self.getConfigurationSection(), 'camera')
+
+        def _value(entry, default, **kwds):
+            try:
+                return self.configuration.getValue(
+                    cameraDeviceSection, entry, **kwds)
+            except KeyError:
+                return default
+
+        subapSize = _value('sh_subap_size', None, getint=True)
+        if subapSize is None:
+            return
+        self._controller.enableShackHartmann(
+            origin=(_value('sh_origin_y', 0, getint=True),
+                    _value('sh_origin_x', 0, getint=True)),
+            subapSize=subapSize,
+            nSubaps=(self.configuration.getValue(
+                         cameraDeviceSection, 'sh_n_subaps_y', getint=True),
+                     self.configuration.getValue(
+                         cameraDeviceSection, 'sh_n_subaps_x', getint=True)),
+            threshold=_value('sh_threshold', 0., getfloat=True),
+            windowRadius=_value('sh_window_radius', None, getfloat=True))
+
+    def _sharedMemorySlots(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'shared_memory_slots',
+                getint=True)
+        except KeyError:
+            return None
+
+    def _createSharedFrameRing(self):
+        nSlots = self._sharedMemorySlots()
+        if nSlots is None:
+            return None
+        # Room for a full sensor frame with 4 bytes pixels, so that
+        # the ring survives binning and output dtype changes
+        binning = self._camera.getBinning()
+        slotBytes = self._camera.rows() * self._camera.cols() * \
+            binning ** 2 * 4
+        return SharedFrameRing.create('pysilico_%d' % self._basePort(),
+                                      nSlots, slotBytes)
+
+    def _dispatchQueueSize(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'dispatch_queue_size',
+                getint=True)
+        except KeyError:
+            return FrameDispatcher.DEFAULT_QUEUE_SIZE
+
+    def _dispatchPolicy(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'dispatch_policy')
+        except KeyError:
+            return FrameDispatcher.DROP_OLDEST
+
+    def _serverFloat(self, entry, default):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), entry, getfloat=True)
+        except KeyError:
+            return default
+
+    def _serverBoolean(self, entry, default=False):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), entry, getboolean=True)
+        except KeyError:
+            return default
+
+    def _outputStreamValue(self, name, entry, default, **kwds):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(),
+                'output_stream_%s_%s' % (name, entry), **kwds)
+        except KeyError:
+            return default
+
+    def _createOutputStreams(self):
+        '''
+        Named output streams are listed in the server section, e.g.
+
+            output_streams= logger, rtc
+            output_stream_logger_decimation= 10
+            output_stream_logger_max_rate_hz= 2
+            output_stream_rtc_hwm= 10
+            output_stream_remote_codec= zstd+shuffle+delta
+
+        Each stream has its own PUB socket on output_stream_<name>_port.
+        Only the first stream may omit it: it defaults to the last port
+        of the server, base port + PORT_OUTPUT_STREAMS_OFFSET, since
+        servers are configured 10 ports apart. The high water mark
+        defaults to 1 frame for rate limited streams and to 100 frames
+        (like the main publisher socket) otherwise. Streams with a codec
+        send compressed frames, see FrameCodec; codec_level and
+        keyframe_interval tune it.
+        '''
+        try:
+            names = self.configuration.getValue(
+                self.getConfigurationSection(), 'output_streams')
+        except KeyError:
+            return []
+        streams = []
+        names = [n.strip() for n in names.split(',') if n.strip()]
+        for i, name in enumerate(names):
+            maxRateHz = self._outputStreamValue(name, 'max_rate_hz', None,
+                                                getfloat=True)
+            port = self._outputStreamValue(name, 'port', None, getint=True)
+            if port is None:
+                if i > 0:
+                    raise ValueError(
+                        'Output stream %s needs output_stream_%s_port: only'
+                        ' the first stream has a default port' % (
+                            name, name))
+                port = self._basePort() + Constants.PORT_OUTPUT_STREAMS_OFFSET
+            hwm = self._outputStreamValue(
+                name, 'hwm', 100 if maxRateHz is None else 1, getint=True)
+            socket = self.rpc().publisherSocket(port, hwm=hwm)
+            codec = self._outputStreamValue(name, 'codec', None)
+            if codec is not None:
+                codec = FrameCodec.fromName(
+                    codec,
+                    self._outputStreamValue(name, 'codec_level', None,
+                                            getint=True),
+                    self._outputStreamValue(
+                        name, 'keyframe_interval',
+                        FrameCodec.DEFAULT_KEYFRAME_INTERVAL, getint=True))
+            streams.append(OutputStream(
+                name, socket,
+                self._outputStreamValue(name, 'decimation', 1, getint=True),
+                maxRateHz, codec))
+        return streams
+
+    def _controlLoopMode(self):
+        try:
+            mode = self.configuration.getValue(
+                self.getConfigurationSection(), 'control_loop')
+        except KeyError:
+            return AsyncioControlLoop.POLLING
+        AsyncioControlLoop.checkMode(mode)
+        return mode
+
+    def _frameProtocol(self):
+        try:
+            return self.configuration.getValue(
+                self.getConfigurationSection(), 'frame_protocol')
+        except KeyError:
+            return FrameProtocol.PICKLE
+
     def _replyPort(self):
         return self.configuration.replyPort(self.getConfigurationSection())
 
@@ -164,6 +448,36 @@ class Runner(BaseRunner):
             self._zmqPorts.SERVER_STATUS_PORT, hwm=1)
         self._displaySocket = self.rpc().publisherSocket(
             self._zmqPorts.SERVER_DISPLAY_PORT, hwm=1)
+        self._roiSocket = self._optionalPublisherSocket(
+            self._serverBoolean('roi_stream'),
+            Constants.PORT_ROI_OFFSET, hwm=100)
+        self._slopesSocket = self._optionalPublisherSocket(
+            self._serverBoolean('slopes_stream'),
+            Constants.PORT_SLOPES_OFFSET, hwm=1)
+        self._centroidsSocket = self._optionalPublisherSocket(
+            self._serverBoolean('centroids_stream') or
+            self._hasShackHartmannConfiguration(),
+            Constants.PORT_CENTROIDS_OFFSET, hwm=1)
+        self._displayStreamsSocket = self._optionalPublisherSocket(
+            self._serverBoolean('display_streams'),
+            Constants.PORT_DISPLAY_STREAMS_OFFSET, hwm=1)
+        self._ringNotifySocket = self._optionalPublisherSocket(
+            self._sharedMemorySlots() is not None,
+            Constants.PORT_RING_NOTIFY_OFFSET, hwm=100)
+        self._outputStreams = self._createOutputStreams()
+
+    def _basePort(self):
+        return self.configuration.basePort(self.getConfigurationSection())
+
+    def _optionalPublisherSocket(self, enabled, portOffset, hwm):
+        '''
+        Sockets of optional features are bound only when the feature is
+        configured, so that a server does not take ports it does not use
+        '''
+        if not enabled:
+            return None
+        return self.rpc().publisherSocket(self._basePort() + portOffset,
+                                          hwm=hwm)
 
     @WithVimbaIfNeeded()
     def _createDevice(self):
@@ -179,18 +493,45 @@ class Runner(BaseRunner):
             self._publishSocket,
             self._statusSocket,
             self._displaySocket,
-            self.rpc())
+            self.rpc(),
+            dispatchQueueSize=self._dispatchQueueSize(),
+            dispatchPolicy=self._dispatchPolicy(),
+            calibrationStore=self._createCalibrationStore(),
+            roiSocket=self._roiSocket,
+            slopesSocket=self._slopesSocket,
+            centroidsSocket=self._centroidsSocket,
+            displayStreamsSocket=self._displayStreamsSocket,
+            frameProtocol=self._frameProtocol(),
+            sharedFrameRing=self._createSharedFrameRing(),
+            ringNotifySocket=self._ringNotifySocket,
+            statusHeartbeatSec=self._serverFloat(
+                'status_heartbeat_sec',
+                StatusPublisher.DEFAULT_HEARTBEAT_SEC),
+            parameterPollSec=self._serverFloat(
+                'parameter_poll_sec',
+                StatusPublisher.DEFAULT_PARAMETER_POLL_SEC),
+            outputStreams=self._outputStreams)
+        self._configureShackHartmann()
         self._configureDiscoveryServer('pysilico', self._camera.__class__.__name__)
 
     @WithVimbaIfNeeded()
     def _runLoop(self):
         self._logRunning()
         self._camera.startAcquisition()
-        IntolerantControlLoop(
-            self._controller,
-            Logger.of("Camera Controller control loop"),
-            time,
-            0.02).start()
+        if self._controlLoopMode() == AsyncioControlLoop.ASYNCIO:
+            AsyncioControlLoop(
+                self._controller,
+                self._replySocket,
+                Logger.of("Camera Controller control loop"),
+                statusPeriodSec=self._serverFloat(
+                    'status_period_sec',
+                    AsyncioControlLoop.DEFAULT_STATUS_PERIOD_SEC)).start()
+        else:
+            IntolerantControlLoop(
+                self._controller,
+                Logger.of("Camera Controller control loop"),
+                time,
+                0.02).start()
         self._logger.notice("Terminated")
 
     @override
@@ -204,6 +545,8 @@ class Runner(BaseRunner):
                 # Camera unreachable or other errors
                 # Wait a little bit and try to reconnect
                 self._logger.warn(e)
+                if hasattr(self, '_controller'):
+                    self._controller.stopFramePipeline()
                 if hasattr(self, '_vimbacamera'):
                     delattr(self, '_vimbacamera')
                 time.sleep(1)
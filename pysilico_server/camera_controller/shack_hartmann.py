@@ -0,0 +1,122 @@
+import threading
+import numpy as np
+from plico.utils.logger import Logger
+from plico.utils.decorator import synchronized
+
+
+class ShackHartmannCentroider(object):
+    '''
+    Centroids of a regular grid of Shack-Hartmann subapertures.
+
+    The grid starts at origin (y, x), has nSubaps (rows, cols) square
+    subapertures of subapSize pixels, all in pixels of the published
+    (binned) frame. With windowRadius only the pixels closer than
+    windowRadius to the subaperture center are used. threshold is
+    subtracted from each pixel and negative values are set to zero.
+
+    The (nSubaps, nPixels) table of flat indexes of the subaperture
+    pixels and the (nPixels, 3) weights [1, x, y] are built once per
+    frame shape: each frame costs one gather and one matrix multiply
+    giving flux and first moments of all the subapertures.
+
+    compute() returns a float32 (3, nSubaps) array in a buffer of the
+    pool with rows x, y centroid (pixels from the subaperture center)
+    and flux. Subapertures with no flux have null centroid.
+    '''
+
+    def __init__(self, bufferPool, origin, subapSize, nSubaps,
+                 threshold=0., windowRadius=None):
+        origin = tuple(int(v) for v in origin)
+        nSubaps = tuple(int(v) for v in np.broadcast_to(nSubaps, (2,)))
+        subapSize = int(subapSize)
+        if len(origin) != 2 or min(origin) < 0:
+            raise ValueError('Invalid grid origin %s' % str(origin))
+        if subapSize < 1 or min(nSubaps) < 1:
+            raise ValueError('Invalid grid %s of %d pixels subapertures' %
+                             (str(nSubaps), subapSize))
+        if windowRadius is not None and windowRadius <= 0:
+            raise ValueError('windowRadius must be positive')
+        self._bufferPool = bufferPool
+        self._origin = origin
+        self._subapSize = subapSize
+        self._nSubaps = nSubaps
+        self._threshold = float(threshold)
+        self._windowRadius = windowRadius
+        self._logger = Logger.of('ShackHartmannCentroider')
+        self._offsets, self._weights = self._subapertureTable()
+        self._indexTable = None
+        self._tableShape = None
+        self._skippedShapes = set()
+        self._mutex = threading.RLock()
+
+    def getGeometry(self):
+        return {'origin': self._origin,
+                'subapSize': self._subapSize,
+                'nSubaps': self._nSubaps,
+                'threshold': self._threshold,
+                'windowRadius': self._windowRadius,
+                'pixelsPerSubap': len(self._offsets[0])}
+
+    def _subapertureTable(self):
+        s = self._subapSize
+        dy, dx = np.mgrid[0:s, 0:s]
+        y = dy - (s - 1) / 2.
+        x = dx - (s - 1) / 2.
+        inside = np.ones((s, s), dtype=bool)
+        if self._windowRadius is not None:
+            inside = x ** 2 + y ** 2 <= self._windowRadius ** 2
+        weights = np.stack([np.ones(inside.sum()), x[inside], y[inside]],
+                           axis=1).astype(np.float32)
+        return (dy[inside], dx[inside]), weights
+
+    def _buildIndexTable(self, shape):
+        ny, nx = self._nSubaps
+        s = self._subapSize
+        y0, x0 = self._origin
+        if y0 + ny * s > shape[0] or x0 + nx * s > shape[1]:
+            return None
+        cornerY, cornerX = np.mgrid[0:ny, 0:nx]
+        cornerY = (y0 + cornerY * s).reshape(-1, 1)
+        cornerX = (x0 + cornerX * s).reshape(-1, 1)
+        dy, dx = self._offsets
+        return np.ravel_multi_index((cornerY + dy, cornerX + dx), shape)
+
+    def _indexTableFor(self, shape):
+        if shape != self._tableShape:
+            self._indexTable = self._buildIndexTable(shape)
+            self._tableShape = shape
+        if self._indexTable is None and shape not in self._skippedShapes:
+            self._logger.warn('Subaperture grid does not fit frame shape %s.'
+                              ' Centroids are not computed' % str(shape))
+            self._skippedShapes.add(shape)
+        return self._indexTable
+
+    @synchronized("_mutex")
+    def compute(self, array):
+        '''
+        Return x, y centroids and flux of the subapertures, or None
+        if the grid does not fit in the frame.
+        '''
+        indexTable = self._indexTableFor(array.shape)
+        if indexTable is None:
+            return None
+        nSub = indexTable.shape[0]
+        pixels = self._bufferPool.get('shPixels', indexTable.shape,
+                                      array.dtype)
+        np.take(array.reshape(-1), indexTable, out=pixels)
+        work = self._bufferPool.get('shWork', indexTable.shape, np.float32)
+        np.copyto(work, pixels, casting='unsafe')
+        if self._threshold != 0:
+            np.subtract(work, self._threshold, out=work)
+            np.maximum(work, 0, out=work)
+        moments = self._bufferPool.get('shMoments', (nSub, 3), np.float32)
+        np.matmul(work, self._weights, out=moments)
+        res = self._bufferPool.get('centroids', (3, nSub), np.float32)
+        flux = res[2]
+        flux[:] = moments[:, 0]
+        dark = flux <= 0
+        flux[dark] = 1
+        np.divide(moments[:, 1], flux, out=res[0])
+        np.divide(moments[:, 2], flux, out=res[1])
+        res[:, dark] = 0
+        return res
@@ -0,0 +1,89 @@
+import copy
+import time
+
+
+class StatusPublisher(object):
+    '''
+    Decide when the camera status is published.
+
+    A status is published as soon as it changes, i.e. when the
+    controller builds a new CameraStatus object, and then repeated
+    every heartbeatSec. With heartbeatSec=0 it is repeated at every
+    call, that is what clients reading the status socket with a short
+    timeout expect.
+
+    Camera parameters (getParameters) can be slow to read, e.g.
+    temperatures read through a serial link: they are polled every
+    parameterPollSec and cached in the status. A new status is
+    published only if they changed. parameterPollSec=None disables
+    polling: parameters are read only when the status is rebuilt.
+    '''
+
+    DEFAULT_HEARTBEAT_SEC = 0.
+    DEFAULT_PARAMETER_POLL_SEC = None
+    # None is a valid parameterPollSec: this marks an argument not given
+    UNCHANGED = object()
+
+    def __init__(self, publishFunc, readParametersFunc, timeMod=time,
+                 heartbeatSec=DEFAULT_HEARTBEAT_SEC,
+                 parameterPollSec=DEFAULT_PARAMETER_POLL_SEC):
+        self._publishFunc = publishFunc
+        self._readParametersFunc = readParametersFunc
+        self._timeMod = timeMod
+        self.setHeartbeat(heartbeatSec)
+        self.setParameterPollInterval(parameterPollSec)
+        self._lastStatus = None
+        self._lastPublishTime = None
+        self._lastPollTime = None
+        self._changes = 0
+        self._heartbeats = 0
+        self._parameterPolls = 0
+
+    def setHeartbeat(self, heartbeatSec):
+        if heartbeatSec < 0:
+            raise ValueError('heartbeatSec must not be negative')
+        self._heartbeatSec = heartbeatSec
+
+    def setParameterPollInterval(self, parameterPollSec):
+        if parameterPollSec is not None and parameterPollSec <= 0:
+            raise ValueError('parameterPollSec must be positive or None')
+        self._parameterPollSec = parameterPollSec
+
+    def refreshParameters(self, status):
+        '''
+        Return status, or a copy of it with the new parameters if it is
+        time to poll them and they changed.
+        '''
+        if self._parameterPollSec is None:
+            return status
+        now = self._timeMod.time()
+        if self._lastPollTime is not None and \
+                now - self._lastPollTime < self._parameterPollSec:
+            return status
+        self._lastPollTime = now
+        self._parameterPolls += 1
+        parameters = self._readParametersFunc()
+        if parameters == status.parameters:
+            return status
+        newStatus = copy.copy(status)
+        newStatus.parameters = parameters
+        return newStatus
+
+    def publish(self, status):
+        now = self._timeMod.time()
+        if status is not self._lastStatus:
+            self._changes += 1
+        elif now - self._lastPublishTime >= self._heartbeatSec:
+            self._heartbeats += 1
+        else:
+            return
+        self._publishFunc(status)
+        self._lastStatus = status
+        self._lastPublishTime = now
+
+    def getStatistics(self):
+        return {'heartbeatSec': self._heartbeatSec,
+                'parameterPollSec': self._parameterPollSec,
+                'changes': self._changes,
+                'heartbeats': self._heartbeats,
+                'parameterPolls': self._parameterPolls}
@@ -89,3 +89,11 @@ class AbstractCamera(with_metaclass(abc.ABCMeta, object)):
 
 
 
+
+    def getParameterCacheStatistics(self):
+        '''Hit/miss statistics of the cached queries, see ParameterCache'''
+        return {}
+
+    def setParameterCacheTtl(self, key, ttlSec):
+        raise CameraException('Camera %s does not cache its queries' %
+                              self.name())
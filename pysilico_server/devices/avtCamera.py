@@ -3,11 +3,13 @@
 import numpy as np
 import textwrap
 import threading
+import time
 from plico.utils.decorator import logEnterAndExit, \
     synchronized, override
 from pysilico_server.devices.abstract_camera import AbstractCamera
 from plico.utils.logger import Logger
 from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.utils.frame_utils import stampFrame
 from vimba import Vimba
 import functools
 from vimba.frame import PixelFormat, FrameStatus
@@ -61,6 +63,7 @@ class AvtCamera(AbstractCamera):
         self._callbackList = []
         self._mutex = threading.RLock()
         self._lastValidFrame = CameraFrame(np.zeros((4, 4)), counter=0)
+        self._timeStampTickFrequency = None
         self._initialize()
 
     @withVimba()
@@ -128,7 +131,11 @@ class AvtCamera(AbstractCamera):
         self._setHeight()
         self._setWidth()
         # Not all cameras have this
-        #self._timeStampTickFrequency = self._camera.GevTimestampTickFrequency.get()
+        try:
+            self._timeStampTickFrequency = \
+                self._camera.GevTimestampTickFrequency.get()
+        except (AttributeError, VimbaFeatureError):
+            self._timeStampTickFrequency = None
         self._logger.notice(
             'Binning set to %d. Frame shape (w,h): (%d, %d) '
             'Left bottom pixel (%d, %d)'
@@ -358,9 +365,7 @@ class AvtCamera(AbstractCamera):
 
     def _frame_callback(self, camera, frame):
         try:
-            # self._logger.debug("Got frame %d at time %.3f" % (
-            #    self._counter, frame.get_timestamp() /
-            #    self._timeStampTickFrequency))
+            receive = time.monotonic()
             if frame.get_status() == FrameStatus.Complete:
                 h, w = frame.get_height(), frame.get_width() 
                 frame_data = frame.get_buffer()
@@ -370,6 +375,11 @@ class AvtCamera(AbstractCamera):
                                  dtype=self._dtype,
                                  shape=(h, w))
                 self._lastValidFrame = CameraFrame(img, counter=self._counter)
+                stampFrame(self._lastValidFrame, receive=receive)
+                if self._timeStampTickFrequency:
+                    stampFrame(self._lastValidFrame,
+                               device=frame.get_timestamp() /
+                               self._timeStampTickFrequency)
                 self._notifyListenersAboutNewFrame()
                 self._counter += 1
             else:
@@ -1,11 +1,14 @@
-import numpy as np
+import threading
 import time
+import numpy as np
 from plico.utils.decorator import override, returns
 from pysilico_server.devices.abstract_camera import AbstractCamera
 from plico.utils.logger import Logger
 from plico.utils.concurrent_loop import ConcurrentLoop
 from plico.utils.convergeable import Convergeable
 from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.devices.frame_pacer import FramePacer
+from pysilico_server.utils.frame_utils import stampFrame
 
 
 class SimulatedFrameProducer(Convergeable):
@@ -32,12 +35,31 @@ class SimulatedFrameProducer(Convergeable):
 
 
 class BaseSimulatedCamera(AbstractCamera):
+    '''
+    Base class of the simulated cameras.
+
+    The read noise is drawn in float32 from a np.random.Generator,
+    seeded with seed (random if None), so that a seeded simulation is
+    reproducible. With setNoiseBankSize(nFrames) the noise of each
+    frame is instead a window at a random offset of a bank of nFrames
+    frames of noise drawn once: frames are not independent anymore,
+    but no noise is generated while acquiring.
+
+    Frames are computed at the deadlines of a FramePacer, so that the
+    frame rate matches setFrameRate() whatever the time spent computing
+    them, up to the rate the computation allows: the frames that could
+    not be produced in time are counted in getPacingStatistics().
+    Computing after the deadline keeps the content and the receive
+    timestamp of a frame current; the pacer does not spin, so a
+    simulation at kHz rates does not keep a core busy.
+    While acquiring, readFrame() returns the latest produced frame.
+    '''
     SENSOR_H = 1024
     SENSOR_W = 1360
     DTYPE = np.uint16
     MAX_VALUE = 4096
 
-    def __init__(self, name='Simulated Camera'):
+    def __init__(self, name='Simulated Camera', seed=None):
         self._name = name
         self._logger = Logger.of('SimulatedCamera')
         self._counter = 0
@@ -48,9 +70,17 @@ class BaseSimulatedCamera(AbstractCamera):
         self._totalFluxPerMilliSecond = 2e6
         self._noiseInCount = 10.
         self._testCustomParameter = 42
+        self._rng = np.random.default_rng(seed)
+        self._noiseBankSize = 0
+        self._noiseBank = None
+        self._noiseBuffer = None
 
         self._lastValidFrame = None
         self._callbackList = []
+        self._isAcquiring = False
+        self._stopPacing = threading.Event()
+        self._pacer = FramePacer(self._frameRate, stopEvent=self._stopPacing,
+                                 spinSec=0)
         self._buildFrameProducerLoop()
 
         self._logger.notice('Simulated camera initialized')
@@ -73,26 +103,33 @@ class BaseSimulatedCamera(AbstractCamera):
             callback(self._lastValidFrame)
 
     def produceFrame(self):
-        self._logger.debug('Enter produceFrame')
+        if not self._pacer.waitNext():
+            return
         frame = self._computeFrameFromWavefront()
         self._counter += 1
-        self._lastValidFrame = CameraFrame(frame, self._counter)
+        self._lastValidFrame = stampFrame(CameraFrame(frame, self._counter),
+                                          receive=time.monotonic())
         self._notifyListenersAboutNewFrame()
-        self._logger.debug('Exit produceFrame. Counter: %d' % self._counter)
 
     @override
     def deinitialize(self):
         if self._raiseExceptionOnDeinitialize:
             raise Exception('Asked to fail on deinitialize')
         else:
+            self._stopPacing.set()
             self._frameProducerLoop.deinitialize()
 
     @override
     def startAcquisition(self):
+        self._stopPacing.clear()
+        self._pacer.restart()
+        self._isAcquiring = True
         self._frameProducerLoop.close()
 
     @override
     def stopAcquisition(self):
+        self._isAcquiring = False
+        self._stopPacing.set()
         self._frameProducerLoop.open()
 
     def acquisitionIsStopped(self):
@@ -124,20 +161,63 @@ class BaseSimulatedCamera(AbstractCamera):
     @override
     @returns(np.ndarray)
     def readFrame(self, timeoutMilliSec=2000):
+        frame = self._lastValidFrame
+        if self._isAcquiring and frame is not None:
+            return frame.toNumpyArray()
         return self._computeFrameFromWavefront()
 
+    def getPacingStatistics(self):
+        '''Requested and achieved frame rate, see FramePacer'''
+        return self._pacer.getStatistics()
+
     def setNoiseInCount(self, noise):
         self._noiseInCount = noise
 
     def setTotalFluxPerMilliSecond(self, totalFluxPerMilliSec):
         self._totalFluxPerMilliSecond = totalFluxPerMilliSec
 
+    def setSeed(self, seed):
+        self._rng = np.random.default_rng(seed)
+        self._noiseBank = None
+
+    def setNoiseBankSize(self, nFrames):
+        '''Draw the noise from a bank of nFrames frames. 0 disables it'''
+        nFrames = int(nFrames)
+        if nFrames < 0:
+            raise ValueError('Noise bank size must be >= 0')
+        self._noiseBankSize = nFrames
+        self._noiseBank = None
+
+    def getNoiseBankSize(self):
+        return self._noiseBankSize
+
+    def _addNoise(self, pixels, mean, sigma):
+        '''Add gaussian noise to the float32 array pixels, in place'''
+        if sigma <= 0:
+            return
+        size = pixels.size
+        if self._noiseBuffer is None or self._noiseBuffer.size != size:
+            self._noiseBuffer = np.empty(size, dtype=np.float32)
+        noise = self._noiseBuffer
+        if self._noiseBankSize == 0:
+            self._rng.standard_normal(dtype=np.float32, out=noise)
+            noise *= sigma
+        else:
+            if self._noiseBank is None or \
+                    self._noiseBank.size != size * self._noiseBankSize:
+                self._noiseBank = self._rng.standard_normal(
+                    size * self._noiseBankSize, dtype=np.float32)
+            offset = self._rng.integers(0, self._noiseBank.size - size + 1)
+            np.multiply(self._noiseBank[offset:offset + size], sigma,
+                        out=noise)
+        noise += mean
+        pixels += noise.reshape(pixels.shape)
+
     def _computeFrameFromWavefront(self):
         pixels = np.zeros((self.rows(), self.cols()),
                           dtype=np.float)
 
         self._counter += 1
-        time.sleep(1. / self.getFrameRate())
         return pixels.astype(self.DTYPE)
 
     @override
@@ -163,6 +243,7 @@ class BaseSimulatedCamera(AbstractCamera):
 
     @override
     def setFrameRate(self, frameRate):
+        self._pacer.setFrameRate(frameRate)
         self._frameRate = frameRate
 
     @override
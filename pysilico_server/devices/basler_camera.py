@@ -1,9 +1,11 @@
 import threading
+import time
 import traceback
 import numpy as np
 from pypylon import pylon, genicam
 from pysilico_server.devices.abstract_camera import AbstractCamera, CameraException
 from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.utils.frame_utils import stampFrame
 from plico.utils.decorator import override, synchronized
 from plico.utils.logger import Logger
 
@@ -22,7 +24,12 @@ class ImageHandler(pylon.ImageEventHandler):
             elif not grabResult.IsValid():
                 return self._basler_camera._logger.warn("Frame grab is not valid")
             else:
+                receive = time.monotonic()
                 self._basler_camera._lastValidFrame = CameraFrame(grabResult.Array, counter=self._basler_camera._counter)
+                stampFrame(self._basler_camera._lastValidFrame,
+                           device=grabResult.TimeStamp /
+                           self._basler_camera._timeStampTickFrequency,
+                           receive=receive)
                 self._basler_camera._notifyListenersAboutNewFrame()
                 self._basler_camera._counter += 1
         except Exception as e:
@@ -68,9 +75,18 @@ class BaslerCamera(AbstractCamera):
                                                pylon.Cleanup_Delete)
         self._camera.Open()
         self._logCameraInfo()
+        self._timeStampTickFrequency = self._readTimeStampTickFrequency()
         self._logger.notice('Basler camera initialized')
         self._dtype = np.uint(16)
 
+    def _readTimeStampTickFrequency(self):
+        # GigE cameras declare the frequency of the timestamp counter,
+        # USB ones count nanoseconds
+        try:
+            return float(self._camera.GevTimestampTickFrequency.Value)
+        except genicam.GenericException:
+            return 1e9
+
     def _logCameraInfo(self):
         self._logger.notice('Camera: %s at %s - ID: %s' % (
                             self.deviceModelName(),
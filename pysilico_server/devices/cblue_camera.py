@@ -4,7 +4,10 @@ import threading
 import FliSdk_V2
 import CblueOne_enum as CblueOne
 from pysilico_server.devices.abstract_camera import AbstractCamera
+from pysilico_server.devices.parameter_cache import ParameterCache, \
+    cachedQuery, invalidatesCache
 from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.utils.frame_utils import stampFrame
 from plico.utils.logger import Logger
 from plico.utils.decorator import synchronized, override
 
@@ -30,8 +33,21 @@ class RepeatTimer(threading.Timer):
 
 class CblueOneCamera(AbstractCamera):
 
+    # Exposure time and frame rate expire before the 1 second liveness
+    # ping of the controller, so that the ping always reaches the camera.
+    CACHE_TTL_SEC = {'modelName': None,
+                     'exposureTime': 0.5,
+                     'frameRate': 0.5,
+                     'temperature': 2.,
+                     'coolingEnable': 10.,
+                     'coolingSetpoint': 10.,
+                     'pixelFormat': 10.,
+                     'conversionEfficiency': 10.,
+                     'gain': 10.}
+
     def __init__(self, name):
         self._logger = Logger.of('CblueOneCamera')
+        self._parameterCache = ParameterCache(self.CACHE_TTL_SEC)
         self._context = FliSdk_V2.Init()
         self._find_camera()
         self._set_camera(name)
@@ -80,7 +96,9 @@ class CblueOneCamera(AbstractCamera):
 
     def callback_timer(self):
         frame = self.readFrame()
+        receive = time.monotonic()
         cameraFrame = CameraFrame(frame, counter=self.getFrameCounter())
+        stampFrame(cameraFrame, receive=receive)
         for callback in self._callbackList:
             callback(cameraFrame)
         self._logger.notice(f'New camera frame: {id(cameraFrame)}')
@@ -90,6 +108,7 @@ class CblueOneCamera(AbstractCamera):
         return self._name
     
     @synchronized("_mutex")
+    @cachedQuery('modelName')
     def device_model_name(self):
         return FliSdk_V2.FliCblueSfnc.GetDeviceModelName(self._context)[1]
 
@@ -123,11 +142,13 @@ class CblueOneCamera(AbstractCamera):
         return FliSdk_V2.FliCblueSfnc.GetWidth(self._context)[1]
     
     @synchronized("_mutex")
+    @invalidatesCache('exposureTime', 'frameRate')
     @stop_start
     def set_rows(self, rows_in_px):
         ok = FliSdk_V2.FliCblueSfnc.SetHeight(self._context, rows_in_px)
 
     @synchronized("_mutex")
+    @invalidatesCache('exposureTime', 'frameRate')
     @stop_start
     def set_cols(self, cols_in_px):
         ok = FliSdk_V2.FliCblueSfnc.SetWidth(self._context, cols_in_px)
@@ -144,6 +165,7 @@ class CblueOneCamera(AbstractCamera):
     def dtype(self):
         pass
 
+    @invalidatesCache('coolingEnable', 'coolingSetpoint')
     @stop_start
     def set_device_cooling_setpoint(self, temperature_in_celsius):
         if not FliSdk_V2.FliCblueOne.GetDeviceCoolingEnable(self._context):
@@ -152,18 +174,22 @@ class CblueOneCamera(AbstractCamera):
         self._logger.notice(f'Set device cooling setpoint to: {self.get_device_cooling_setpoint()} degrees Celsius')
 
     @synchronized("_mutex")
+    @cachedQuery('coolingEnable')
     def get_device_cooling_enable(self):
         return FliSdk_V2.FliCblueOne.GetDeviceCoolingEnable(self._context)[1]
 
+    @cachedQuery('coolingSetpoint')
     def get_device_cooling_setpoint(self):
         return FliSdk_V2.FliCblueOne.GetDeviceCoolingSetpoint(self._context)[1]
     
     @synchronized("_mutex")
+    @cachedQuery('temperature')
     def get_device_temperature(self):
         return FliSdk_V2.FliCblueSfnc.GetDeviceTemperature(self._context)[1]
 
     @synchronized("_mutex")
     @override
+    @invalidatesCache('exposureTime', 'frameRate')
     @stop_start
     def setExposureTime(self, exposureTimeInMilliSeconds):
         exp_time_max_ms = FliSdk_V2.FliCblueSfnc.GetExposureTimeMax(self._context)[1] * 1e-3
@@ -176,22 +202,26 @@ class CblueOneCamera(AbstractCamera):
 
     @synchronized("_mutex")
     @override
+    @cachedQuery('exposureTime')
     def exposureTime(self):
         result = FliSdk_V2.FliCblueSfnc.GetExposureTime(self._context)
         return result[1] * 1e-3
 
     @synchronized("_mutex")
+    @invalidatesCache()
     @stop_start
     def set_pixel_format(self, pixel_format):
         ok = FliSdk_V2.FliGenicamCamera.SetStringFeature(self._context, "PixelFormat", pixel_format)
         self._logger.notice(f'Pixel format set to {pixel_format}')
 
     @synchronized("_mutex")
+    @cachedQuery('pixelFormat')
     def get_pixel_format(self):
         return FliSdk_V2.FliGenicamCamera.GetStringFeature(self._context, "PixelFormat")[1]
 
     @synchronized("_mutex")
     @override
+    @invalidatesCache()
     def setBinning(self, binning):
         if self.device_model_name() == 'C-BLUE ONE 1.7 MP':
             raise ValueError('C-Blue One 1.7 MP does not support set binning.')
@@ -206,15 +236,18 @@ class CblueOneCamera(AbstractCamera):
         else:
             raise NotImplementedError(f'Get binning not implemented for camera {self.device_model_name()}')
 
+    @invalidatesCache('conversionEfficiency')
     @stop_start
     def set_conversion_efficiency(self, low_high_gain):
         ok = FliSdk_V2.FliCblueOne.SetConversionEfficiency(self._context, low_high_gain)
         self._logger.notice(f'Set conversion efficiency to: {low_high_gain} (0 = low, 1 = high)')
 
     @synchronized("_mutex")
+    @cachedQuery('conversionEfficiency')
     def get_conversion_efficiency(self):
         return FliSdk_V2.FliCblueOne.GetConversionEfficiency(self._context)[1]
     
+    @invalidatesCache('gain')
     @stop_start
     def set_gain(self, gain_in_dB):
         ok = FliSdk_V2.FliCblueSfnc.SetGainSelector(self._context, CblueOne.GainSelector.AnalogAll)
@@ -222,6 +255,7 @@ class CblueOneCamera(AbstractCamera):
         self._logger.notice(f'Set analog gain to: {gain_in_dB} dB')
 
     @synchronized("_mutex")
+    @cachedQuery('gain')
     def get_gain(self):
         return FliSdk_V2.FliCblueSfnc.GetGain(self._context)[1]
 
@@ -245,6 +279,7 @@ class CblueOneCamera(AbstractCamera):
 
     @synchronized("_mutex")
     @override
+    @cachedQuery('frameRate')
     def getFrameRate(self):
         return FliSdk_V2.FliCblueSfnc.GetAcquisitionFrameRate(self._context)[1]
     
@@ -260,6 +295,7 @@ class CblueOneCamera(AbstractCamera):
 
     @synchronized("_mutex")
     @override
+    @invalidatesCache('exposureTime', 'frameRate')
     @stop_start
     def setFrameRate(self, frameRateInHz):
         framerate_max_hz = FliSdk_V2.FliCblueSfnc.GetAcquisitionFrameRateMax(self._context)[1]
@@ -282,4 +318,12 @@ class CblueOneCamera(AbstractCamera):
 
     @override
     def getParameters(self):
-        return {}
\ No newline at end of file
+        return {}
+
+    @override
+    def getParameterCacheStatistics(self):
+        return self._parameterCache.getStatistics()
+
+    @override
+    def setParameterCacheTtl(self, key, ttlSec):
+        self._parameterCache.setTtl(key, ttlSec)
@@ -0,0 +1,112 @@
+import threading
+import time
+from plico.utils.decorator import synchronized
+
+
+class FramePacer(object):
+    '''
+    Deadline based pacing of a frame production loop.
+
+    Frame n is due at the absolute time t0 + n / frameRate, so that the
+    time spent producing a frame does not lower the rate, as sleeping
+    1 / frameRate after each frame does. Waits sleep on stopEvent,
+    except for the last spinSec, spent polling the clock, since a
+    sleep can overshoot by tens of microseconds, that matters at kHz
+    rates. Polling keeps a core busy: spinSec=0 disables it, for loops
+    that do not need that precision.
+
+    A loop that falls more than maxLagSec behind its schedule does not
+    burst to catch up: the schedule restarts from now and the frames
+    that could not be produced are counted as missed.
+    '''
+
+    SPIN_SEC = 0.0005
+    DEFAULT_MAX_LAG_SEC = 0.1
+    RATE_WINDOW_SEC = 1.
+
+    def __init__(self, frameRate, maxLagSec=DEFAULT_MAX_LAG_SEC,
+                 stopEvent=None, spinSec=SPIN_SEC):
+        self._mutex = threading.RLock()
+        self._maxLagSec = maxLagSec
+        self._spinSec = spinSec
+        self._stopEvent = stopEvent or threading.Event()
+        self._frames = 0
+        self._missedFrames = 0
+        self.setFrameRate(frameRate)
+
+    @synchronized("_mutex")
+    def setFrameRate(self, frameRate):
+        if frameRate <= 0:
+            raise ValueError('Frame rate must be positive')
+        self._frameRate = float(frameRate)
+        self.restart()
+
+    @synchronized("_mutex")
+    def getFrameRate(self):
+        return self._frameRate
+
+    @synchronized("_mutex")
+    def restart(self):
+        now = time.perf_counter()
+        self._t0 = now
+        self._n = 0
+        self._windowStart = now
+        self._windowFrames = 0
+        self._achievedFrameRate = None
+
+    @synchronized("_mutex")
+    def _nextDeadline(self):
+        deadline = self._t0 + self._n / self._frameRate
+        lag = time.perf_counter() - deadline
+        if lag > self._maxLagSec:
+            missed = int(lag * self._frameRate)
+            self._missedFrames += missed
+            self._n += missed
+            deadline = self._t0 + self._n / self._frameRate
+        self._n += 1
+        return deadline
+
+    def waitNext(self):
+        '''
+        Wait until the next frame is due. Return False if stopEvent
+        has been set meanwhile.
+        '''
+        deadline = self._nextDeadline()
+        delay = deadline - time.perf_counter() - self._spinSec
+        if delay > 0:
+            if self._stopEvent.wait(delay):
+                return False
+        elif self._stopEvent.is_set():
+            return False
+        while time.perf_counter() < deadline:
+            # sleep(0) releases the GIL, so that spinning does not
+            # starve the threads consuming the frames
+            time.sleep(0)
+        self._countFrame()
+        return True
+
+    @synchronized("_mutex")
+    def _countFrame(self):
+        self._frames += 1
+        self._windowFrames += 1
+        now = time.perf_counter()
+        if now - self._windowStart >= self.RATE_WINDOW_SEC:
+            self._achievedFrameRate = \
+                self._windowFrames / (now - self._windowStart)
+            self._windowStart = now
+            self._windowFrames = 0
+
+    @synchronized("_mutex")
+    def getStatistics(self):
+        '''
+        Requested and achieved frame rate, the latter measured on the
+        last RATE_WINDOW_SEC (or since the start, in the first one).
+        '''
+        achieved = self._achievedFrameRate
+        if achieved is None:
+            elapsed = time.perf_counter() - self._windowStart
+            achieved = self._windowFrames / elapsed if elapsed > 0 else 0.
+        return {'requestedFrameRate': self._frameRate,
+                'achievedFrameRate': achieved,
+                'frames': self._frames,
+                'missedFrames': self._missedFrames}
@@ -9,8 +9,11 @@ import FliSdk_V2
 from plico.utils.decorator import logEnterAndExit, \
             synchronized, override
 from pysilico_server.devices.abstract_camera import AbstractCamera
+from pysilico_server.devices.parameter_cache import ParameterCache, \
+            cachedQuery, invalidatesCache
 from plico.utils.logger import Logger
 from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.utils.frame_utils import stampFrame
 
 # Example of bash script to set environment variables
 # and also the current directory before starting
@@ -259,15 +262,17 @@ class Ocam2KLowLevel():
             result = FliSdk_V2.SaveBuffer(self.context, filename, 0, nFrames)
             if self.verbose: self.logFunc('SaveBuffer:', result)
 
-    def getTemperature(self):
+    def getAllTemperatures(self):
+        '''Return (chip temperature, temperature set point)'''
         result, *allTemp = FliSdk_V2.FliOcam2K.GetAllTemp(self.context)
         if self.verbose: self.logFunc('GetAllTemp:', result)
-        return allTemp[0]
+        return allTemp[0], allTemp[7]
+
+    def getTemperature(self):
+        return self.getAllTemperatures()[0]
 
     def getTemperatureSetPoint(self):
-        result, *allTemp = FliSdk_V2.FliOcam2K.GetAllTemp(self.context)
-        if self.verbose: self.logFunc('GetAllTemp:', result)
-        return allTemp[7]
+        return self.getAllTemperatures()[1]
 
     def setTemperatureSetPoint(self, setpoint):
         cmd = 'temp %d' % int(setpoint)
@@ -286,8 +291,15 @@ class RepeatTimer(threading.Timer):
 
 class Ocam2KCamera(AbstractCamera):
 
+    # The fps TTL is shorter than the 1 second liveness ping of the
+    # controller, so that the ping always reaches the camera.
+    CACHE_TTL_SEC = {'fps': 0.5,
+                     'temperatures': 2.,
+                     'EMGain': 10.}
+
     def __init__(self, name):
         self._logger = Logger.of('Ocam2KCamera')
+        self._parameterCache = ParameterCache(self.CACHE_TTL_SEC)
         self._camera = Ocam2KLowLevel(binning=1, logFunc=self._logger.notice)
         self._name = name
         self._binning = 1
@@ -310,7 +322,9 @@ class Ocam2KCamera(AbstractCamera):
 
     def timer(self):
         frame = self.readFrame()
+        receive = time.monotonic()
         cameraFrame = CameraFrame(frame, counter=self.getFrameCounter())
+        stampFrame(cameraFrame, receive=receive)
         for callback in self._callbackList:
             callback(cameraFrame)
 
@@ -332,6 +346,7 @@ class Ocam2KCamera(AbstractCamera):
 
     @override
     @synchronized("_mutex")
+    @invalidatesCache()
     def setBinning(self, binning):
         self._camera.setBinning(binning)
         self._binning = binning
@@ -358,23 +373,37 @@ class Ocam2KCamera(AbstractCamera):
 
     @override
     @synchronized("_mutex")
+    @invalidatesCache('fps')
     def setExposureTime(self, exposureTimeInMilliSeconds):
         self._camera.setFps(1000/exposureTimeInMilliSeconds)
 
     @override
     @synchronized("_mutex")
     def exposureTime(self):
-        return self._camera.getFps()
+        return self._getFps()
 
     @override
     @synchronized("_mutex")
+    @invalidatesCache('fps')
     def setFrameRate(self, frameRate):
         self._camera.setFps(frameRate)
 
     @synchronized("_mutex")
     def getFrameRate(self):
+        return self._getFps()
+
+    @cachedQuery('fps')
+    def _getFps(self):
         return self._camera.getFps()
 
+    @cachedQuery('temperatures')
+    def _getAllTemperatures(self):
+        return self._camera.getAllTemperatures()
+
+    @cachedQuery('EMGain')
+    def _getEMGain(self):
+        return self._camera.getEMGain()
+
     @override
     def registerCallback(self, callback):
         self._callbackList.append(callback)
@@ -384,6 +413,7 @@ class Ocam2KCamera(AbstractCamera):
         pass
 
     @override
+    @invalidatesCache()
     def setParameter(self, name, value):
         if name == 'EMGain':
             self._camera.setEMGain(value)
@@ -398,13 +428,18 @@ class Ocam2KCamera(AbstractCamera):
 
     @override
     def getParameters(self):
-        return {'EMGain': self._camera.getEMGain(),
-                'temperatureSetPoint': self._camera.getTemperatureSetPoint(),
-                'chipTemperature': self._camera.getTemperature(),
+        chipTemperature, temperatureSetPoint = self._getAllTemperatures()
+        return {'EMGain': self._getEMGain(),
+                'temperatureSetPoint': temperatureSetPoint,
+                'chipTemperature': chipTemperature,
                 'TTLSync': self._camera.getSyncro(),
                 'protection': False,
                 }
 
+    @override
+    def getParameterCacheStatistics(self):
+        return self._parameterCache.getStatistics()
 
-
-
+    @override
+    def setParameterCacheTtl(self, key, ttlSec):
+        self._parameterCache.setTtl(key, ttlSec)
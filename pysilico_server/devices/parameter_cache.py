@@ -0,0 +1,115 @@
+import functools
+import threading
+import time
+
+
+class ParameterCache(object):
+    '''
+    Time-to-live cache of slow camera queries.
+
+    Each query has a key and a TTL: get(key, fetchFunc) returns the
+    cached value while it is younger than the TTL of key, otherwise it
+    calls fetchFunc and caches the result. A TTL of None never expires,
+    0 disables caching of that key. Queries that share a key share the
+    hardware round trip, e.g. a single command returning all the
+    temperatures of the camera.
+
+    invalidate() drops cached values, typically after a write to the
+    camera. A value fetched while its key is invalidated is returned
+    but not cached, since it may predate the write.
+    '''
+
+    def __init__(self, ttlSec=None, defaultTtlSec=1., timeMod=time):
+        self._ttlSec = dict(ttlSec or {})
+        self._defaultTtlSec = defaultTtlSec
+        self._timeMod = timeMod
+        self._values = {}
+        self._generations = {}
+        self._generationAll = 0
+        self._hits = {}
+        self._misses = {}
+        self._mutex = threading.Lock()
+
+    def setTtl(self, key, ttlSec):
+        if ttlSec is not None and ttlSec < 0:
+            raise ValueError('ttlSec must not be negative')
+        with self._mutex:
+            self._ttlSec[key] = ttlSec
+            self._values.pop(key, None)
+
+    def getTtl(self, key):
+        return self._ttlSec.get(key, self._defaultTtlSec)
+
+    def get(self, key, fetchFunc):
+        ttlSec = self.getTtl(key)
+        with self._mutex:
+            cached = self._values.get(key)
+            if cached is not None:
+                value, timestamp = cached
+                if ttlSec is None or self._timeMod.time() - timestamp < ttlSec:
+                    self._hits[key] = self._hits.get(key, 0) + 1
+                    return value
+            self._misses[key] = self._misses.get(key, 0) + 1
+            generation = self._generation(key)
+        value = fetchFunc()
+        with self._mutex:
+            if ttlSec != 0 and generation == self._generation(key):
+                self._values[key] = (value, self._timeMod.time())
+        return value
+
+    def _generation(self, key):
+        return self._generationAll, self._generations.get(key, 0)
+
+    def invalidate(self, *keys):
+        '''Drop the given keys, or all of them if none is given'''
+        with self._mutex:
+            if len(keys) == 0:
+                self._values.clear()
+                self._generationAll += 1
+            for key in keys:
+                self._values.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
+
+    def getStatistics(self):
+        with self._mutex:
+            keys = sorted(set(self._hits) | set(self._misses))
+            return {key: {'ttlSec': self.getTtl(key),
+                          'hits': self._hits.get(key, 0),
+                          'misses': self._misses.get(key, 0)}
+                    for key in keys}
+
+
+def cachedQuery(key, cacheName='_parameterCache'):
+    '''Cache the result of a getter in the ParameterCache of the object'''
+
+    def decorate(f):
+
+        @functools.wraps(f)
+        def wrapper(self, *args, **kwds):
+            return getattr(self, cacheName).get(
+                key, lambda: f(self, *args, **kwds))
+
+        return wrapper
+
+    return decorate
+
+
+def invalidatesCache(*keys, cacheName='_parameterCache'):
+    '''
+    Invalidate the given keys (all, if none is given) of the
+    ParameterCache of the object when the decorated setter returns,
+    also if it raises since the camera may be partially updated.
+    '''
+
+    def decorate(f):
+
+        @functools.wraps(f)
+        def wrapper(self, *args, **kwds):
+            try:
+                return f(self, *args, **kwds)
+            finally:
+                getattr(self, cacheName).invalidate(*keys)
+
+        return wrapper
+
+    return decorate
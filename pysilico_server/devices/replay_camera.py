@@ -0,0 +1,258 @@
+import os
+import threading
+import time
+import numpy as np
+from plico.utils.decorator import override, synchronized
+from plico.utils.logger import Logger
+from pysilico_server.devices.abstract_camera import AbstractCamera, \
+    CameraException
+from pysilico_server.utils.array_file import memoryMapArray
+from pysilico_server.utils.frame_utils import cameraFrameFromArray, \
+    stampFrame
+
+
+class ReplayCamera(AbstractCamera):
+    '''
+    Play back recorded frames, to run the server on real data without
+    the camera.
+
+    path is a cube of frames (nFrames, rows, cols) in a .npy or .fits
+    file, or a directory whose .npy and .fits files, sorted by name,
+    hold one frame each. Files are memory mapped and the published
+    frames are views of the mapped data, without copies, in the dtype
+    of the files. FITS files with scaled data (BZERO/BSCALE) cannot be
+    mapped and are loaded in memory.
+
+    With recorded timestamps (seconds, one per frame, in a .npy or
+    .fits file) frames are played at the recorded pace, divided by
+    speed; otherwise, or after setFrameRate(), at a fixed frame rate.
+    At the end of the recording playback starts again from the first
+    frame if loop is True, otherwise it stops.
+    '''
+
+    DEFAULT_FRAME_RATE = 10.
+    EXTENSIONS = ('.npy', '.fits')
+
+    def __init__(self, name, path, timestampsPath=None, frameRate=None,
+                 loop=True, speed=1., binning=1, exposureTimeInMilliSec=0.):
+        self._name = name
+        self._logger = Logger.of('ReplayCamera')
+        self._mutex = threading.RLock()
+        self._path = path
+        self._frames = self._loadFrames(path)
+        if len(self._frames) == 0:
+            raise CameraException('No frames in %s' % path)
+        self._timestamps = None
+        if timestampsPath is not None:
+            self._timestamps = np.asarray(
+                self._memoryMap(timestampsPath), dtype=float).ravel()
+            if len(self._timestamps) != len(self._frames):
+                raise CameraException(
+                    '%d timestamps for %d frames' % (
+                        len(self._timestamps), len(self._frames)))
+        if frameRate is None and self._timestamps is None:
+            frameRate = self.DEFAULT_FRAME_RATE
+        self._frameRate = frameRate
+        if speed <= 0:
+            raise CameraException('Replay speed must be positive')
+        self._speed = speed
+        self._loop = loop
+        self._binning = binning
+        self._exposureTimeMs = exposureTimeInMilliSec
+        self._position = 0
+        self._playbackVersion = 0
+        self._counter = 0
+        self._callbackList = []
+        self._stopRequest = threading.Event()
+        self._thread = None
+        self._logger.notice('Replaying %d frames of shape %s from %s' % (
+            len(self._frames), str(self._frames[0].shape), path))
+
+    @classmethod
+    def _loadFrames(cls, path):
+        if os.path.isdir(path):
+            names = sorted(n for n in os.listdir(path)
+                           if os.path.splitext(n)[1] in cls.EXTENSIONS)
+            return [np.asarray(cls._memoryMap(os.path.join(path, n)))
+                    for n in names]
+        cube = np.asarray(cls._memoryMap(path))
+        if cube.ndim == 2:
+            cube = cube[np.newaxis]
+        if cube.ndim != 3:
+            raise CameraException('Expected a cube of frames in %s, got'
+                                  ' shape %s' % (path, str(cube.shape)))
+        return cube
+
+    @staticmethod
+    def _memoryMap(path):
+        try:
+            return memoryMapArray(path)
+        except ValueError as e:
+            raise CameraException(str(e))
+
+    def _playbackTime(self, start, i):
+        '''Time of frame i after frame start, at the current pace'''
+        if self._frameRate is not None:
+            return (i - start) / self._frameRate
+        return (self._timestamps[i] - self._timestamps[start]) / self._speed
+
+    def _play(self):
+        version = None
+        while True:
+            with self._mutex:
+                now = time.monotonic()
+                i = self._position
+                if i >= len(self._frames):
+                    if not self._loop:
+                        self._position = 0
+                        self._logger.notice('End of the recording')
+                        return
+                    i = self._position = 0
+                    version = None
+                    now += 1. / max(self.getFrameRate(), 1e-3)
+                if version != self._playbackVersion or i < start:
+                    version = self._playbackVersion
+                    start, t0 = i, now
+                due = t0 + self._playbackTime(start, i)
+            delay = due - time.monotonic()
+            if self._stopRequest.wait(max(delay, 0)):
+                return
+            self._publish(i)
+
+    def _nextFrame(self, i):
+        self._counter += 1
+        frame = cameraFrameFromArray(self._frames[i], self._counter)
+        if self._timestamps is not None:
+            stampFrame(frame, device=float(self._timestamps[i]))
+        return stampFrame(frame, receive=time.monotonic())
+
+    def _publish(self, i):
+        with self._mutex:
+            frame = self._nextFrame(i)
+            self._position = i + 1
+        for callback in self._callbackList:
+            callback(frame)
+
+    @override
+    def name(self):
+        return self._name
+
+    @override
+    def readFrame(self, timeoutMilliSec=2000):
+        with self._mutex:
+            i = self._position % len(self._frames)
+            self._position = i + 1
+            return np.asarray(self._nextFrame(i).toNumpyArray())
+
+    @override
+    def rows(self):
+        return self._frames[0].shape[0]
+
+    @override
+    def cols(self):
+        return self._frames[0].shape[1]
+
+    @override
+    def dtype(self):
+        return self._frames[0].dtype
+
+    @override
+    def setExposureTime(self, exposureTimeInMilliSeconds):
+        self._exposureTimeMs = exposureTimeInMilliSeconds
+
+    @override
+    def exposureTime(self):
+        return self._exposureTimeMs
+
+    @override
+    def setBinning(self, binning):
+        if binning != self._binning:
+            raise CameraException('Recorded frames have binning %d' %
+                                  self._binning)
+
+    @override
+    def getBinning(self):
+        return self._binning
+
+    @override
+    def registerCallback(self, callback):
+        self._callbackList.append(callback)
+
+    @override
+    def startAcquisition(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopRequest.clear()
+        self._thread = threading.Thread(target=self._play,
+                                        name='ReplayCamera')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @override
+    def stopAcquisition(self):
+        self._stopRequest.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @override
+    def getFrameCounter(self):
+        return self._counter
+
+    @override
+    @synchronized("_mutex")
+    def getFrameRate(self):
+        if self._frameRate is not None:
+            return self._frameRate
+        duration = self._timestamps[-1] - self._timestamps[0]
+        if duration <= 0:
+            return 0.
+        return (len(self._timestamps) - 1) / duration * self._speed
+
+    @override
+    @synchronized("_mutex")
+    def setFrameRate(self, frameRateInHz):
+        '''Play at a fixed rate, ignoring the recorded timestamps'''
+        if frameRateInHz <= 0:
+            raise CameraException('Frame rate must be positive')
+        self._frameRate = frameRateInHz
+        self._playbackVersion += 1
+
+    @override
+    def deinitialize(self):
+        self.stopAcquisition()
+
+    @override
+    @synchronized("_mutex")
+    def setParameter(self, name, value):
+        if name == 'loop':
+            self._loop = bool(value)
+        elif name == 'position':
+            if not 0 <= value < len(self._frames):
+                raise CameraException('Position %d out of [0, %d)' % (
+                    value, len(self._frames)))
+            self._position = int(value)
+            self._playbackVersion += 1
+        elif name == 'speed':
+            if value <= 0:
+                raise CameraException('Replay speed must be positive')
+            self._speed = value
+            self._playbackVersion += 1
+        elif name == 'recordedTimestamps':
+            if value and self._timestamps is None:
+                raise CameraException('No recorded timestamps')
+            if value:
+                self._frameRate = None
+                self._playbackVersion += 1
+        else:
+            raise CameraException('Parameter %s is not valid' % str(name))
+
+    @override
+    @synchronized("_mutex")
+    def getParameters(self):
+        return {'path': self._path,
+                'nFrames': len(self._frames),
+                'position': self._position,
+                'loop': self._loop,
+                'speed': self._speed,
+                'recordedTimestamps': self._frameRate is None}
@@ -1,15 +1,22 @@
 #!/usr/bin/env python
 
 import numpy as np
-import time
 from pysilico_server.devices.base_simulated_camera import BaseSimulatedCamera
 
 
 class SimulatedAuxiliaryCamera(BaseSimulatedCamera):
+    '''
+    Camera imaging a static letter F. The noiseless scene is cached and
+    computed again only when the frame shape, the exposure time or the
+    flux change.
+    '''
 
-    def __init__(self, name='SimulatedAuxiliaryCamera'):
-        BaseSimulatedCamera.__init__(self, name)
+    def __init__(self, name='SimulatedAuxiliaryCamera', seed=None):
+        BaseSimulatedCamera.__init__(self, name, seed)
         self._totalFluxPerMilliSecond = 1e5
+        self._scene = None
+        self._sceneKey = None
+        self._frameBuffer = None
         self.setFrameRate(3)
 
     def _makeLetterF(self, h, w):
@@ -27,26 +34,31 @@ class SimulatedAuxiliaryCamera(BaseSimulatedCamera):
                int(w / 2): int(w / 2 + 1)] = 1.0
         return pixels
 
-    def _computeFrameFromWavefront(self):
+    def _getScene(self):
         h, w = (self.rows(), self.cols())
+        key = (h, w, self.exposureTime(), self._totalFluxPerMilliSecond)
+        if key != self._sceneKey:
+            pixels = self._makeLetterF(h, w)
+            normalize = self._totalFluxPerMilliSecond * \
+                self.exposureTime() / pixels.sum()
+            pixels *= normalize
+            self._scene = pixels.astype(np.float32)
+            self._sceneKey = key
+        return self._scene
 
-        pixels = self._makeLetterF(h, w)
-
-        normalize = self._totalFluxPerMilliSecond * \
-            self.exposureTime() / pixels.sum()
-        pixels *= normalize
-
-        if self._noiseInCount > 0:
-            pixels += np.random.normal(
-                3 * self._noiseInCount,
-                self._noiseInCount,
-                size=(h, w))
+    def _computeFrameFromWavefront(self):
+        scene = self._getScene()
+        if self._frameBuffer is None or \
+                self._frameBuffer.shape != scene.shape:
+            self._frameBuffer = np.empty_like(scene)
+        pixels = self._frameBuffer
+        np.copyto(pixels, scene)
+        self._addNoise(pixels, 3 * self._noiseInCount, self._noiseInCount)
 
         # if self.getBinning() != 1:
         #    pixels= rebin(pixels, self.getBinning()) * \
         #        self.getBinning()**2
-        pixels = pixels.clip(min=0, max=self.MAX_VALUE)
+        np.clip(pixels, 0, self.MAX_VALUE, out=pixels)
 
         self._counter += 1
-        time.sleep(1. / self.getFrameRate())
         return pixels.astype(self.DTYPE)
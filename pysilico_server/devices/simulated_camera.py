@@ -1,7 +1,6 @@
 #!/usr/bin/env python
 
 import numpy as np
-import time
 from rebin import rebin
 from plico.utils.zernike_generator import ZernikeGenerator
 from plico.types.zernike_coefficients import ZernikeCoefficients
@@ -12,13 +11,31 @@ __version__ = "$Id: simulated_camera.py 293 2017-06-21 17:10:57Z lbusoni $"
 
 
 class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
+    '''
+    Pyramid WFS camera whose 4 pupil images follow the slopes of the
+    wavefront.
+
+    The noiseless frame only depends on the wavefront and on the
+    optical and exposure parameters: it is computed again only when
+    one of them changes (the wavefront setters increment a version
+    number) and each frame just adds the read noise to it, in a reused
+    buffer.
+    '''
     SENSOR_H = 1024
     SENSOR_W = 1360
     DTYPE = np.uint16
     MAX_VALUE = 4096
 
-    def __init__(self, name='Simulated Pyramid Wfs Camera'):
-        BaseSimulatedCamera.__init__(self, name)
+    # Each pupil image is a combination of the 4 quadrant fluxes
+    # [1-dx, 1+dx, 1-dy, 1+dy] through this matrix
+    PUPILS_MATRIX = np.array([[1., 0, 1, 0],
+                              [0., 1, 0, 1],
+                              [0., 0, 1, 1],
+                              [1., 1, 0, 0]])
+    PUPILS_MATRIX_PINV = np.linalg.pinv(PUPILS_MATRIX)
+
+    def __init__(self, name='Simulated Pyramid Wfs Camera', seed=None):
+        BaseSimulatedCamera.__init__(self, name, seed)
         self._pupilRadius = None
         pupilsSeparation = 520
         opticalAxis = (self.SENSOR_H / 2, self.SENSOR_W / 2)
@@ -27,6 +44,10 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
         self._tipTiltCoefficients = np.zeros(2)
         self._wavefront = None
         self._zernikeGenerator = None
+        self._wavefrontVersion = 0
+        self._noiselessFrame = None
+        self._noiselessFrameKey = None
+        self._frameBuffer = None
 
         self.setPupilsRadiusInUnbinnedPixels(80)
         self.setScaleInMeterPerPixel(
@@ -42,15 +63,18 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
         self._wavefront = np.zeros(
             (2 * self._pupilRadius, 2 * self._pupilRadius))
         self._zernikeGenerator = ZernikeGenerator(2 * self._pupilRadius)
+        self._wavefrontVersion += 1
 
     def getPupilsRadiusInUnbinnedPixels(self):
         return self._pupilRadius
 
     def setTilt(self, tipTiltCoefficients):
         self._tipTiltCoefficients = tipTiltCoefficients
+        self._wavefrontVersion += 1
 
     def setWavefront(self, wavefront):
         self._wavefront = wavefront
+        self._wavefrontVersion += 1
 
     def _computeWavefrontFromZernikeCoefficients(self, coeff, zg):
         wf = 0. * zg.getZernike(1)
@@ -77,6 +101,7 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
     def setPupilsCenterInUnbinnedPixels(self, centers):
         assert centers.shape == (4, 2)
         self._pupilsCenter = centers
+        self._wavefrontVersion += 1
 
     def getPupilsCenterInUnbinnedPixels(self):
         return self._pupilsCenter
@@ -96,11 +121,6 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
         return tl, tr, bl, br
 
     def _pupilImagesFromWavefront(self, wavefront):
-        Amat = np.array([[1., 0, 1, 0],
-                         [0., 1, 0, 1],
-                         [0., 0, 1, 1],
-                         [1., 1, 0, 0]])
-
         (dyMap, dxMap) = np.gradient(wavefront / self._scaleInMeterPerPixel)
         dxMapClipped = dxMap.clip(min=-self._slopeSaturationInRad,
                                   max=self._slopeSaturationInRad)
@@ -113,8 +133,8 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
         B = totalIntensity / (sz0 * sz1) / 2 * np.array(
             [1 - dx, 1 + dx, 1 - dy, 1 + dy])
 
-        res = np.linalg.lstsq(Amat, B.reshape((4, sz0 * sz1)), rcond=-1)
-        pupils = res[0].reshape((4, sz0, sz1))
+        pupils = np.dot(self.PUPILS_MATRIX_PINV,
+                        B.reshape((4, sz0 * sz1))).reshape((4, sz0, sz1))
 
         if isinstance(wavefront, np.ma.MaskedArray):
             for i in range(4):
@@ -122,13 +142,37 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
 
         return pupils
 
-    @logEnterAndExit('Enter _computeFrameFromWavefront',
-                     'Exit _computeFrameFromWavefront',
-                     level='debug')
     def _computeFrameFromWavefront(self):
+        frame = self._getNoiselessFrame()
+        if self._frameBuffer is None or \
+                self._frameBuffer.shape != frame.shape:
+            self._frameBuffer = np.empty_like(frame)
+        pixels = self._frameBuffer
+        maxNoiseInCount = self._noiseInCount
+        np.copyto(pixels, frame)
+        # The sum of binning**2 gaussian noises is gaussian: draw it
+        # directly on the binned pixels
+        self._addNoise(pixels, 3 * maxNoiseInCount * self._binning ** 2,
+                       maxNoiseInCount * self._binning)
+        np.clip(pixels, 0, self.MAX_VALUE, out=pixels)
+        return pixels.astype(self.DTYPE)
+
+    def _getNoiselessFrame(self):
+        key = (self._wavefrontVersion, self._binning, self.exposureTime(),
+               self._totalFluxPerMilliSecond, self._scaleInMeterPerPixel,
+               self._slopeSaturationInRad)
+        if key != self._noiselessFrameKey:
+            self._noiselessFrame = self._computeNoiselessFrame().astype(
+                np.float32)
+            self._noiselessFrameKey = key
+        return self._noiselessFrame
+
+    @logEnterAndExit('Enter _computeNoiselessFrame',
+                     'Exit _computeNoiselessFrame',
+                     level='debug')
+    def _computeNoiselessFrame(self):
         radius = self._pupilRadius
         cc = self._pupilsCenter
-        maxNoiseInCount = self._noiseInCount
 
         pupils = self._pupilImagesFromWavefront(self._wavefront)
         pixels = np.zeros((self.SENSOR_H, self.SENSOR_W),
@@ -147,18 +191,9 @@ class SimulatedPyramidWfsCamera(BaseSimulatedCamera):
             self.exposureTime() / pixels.sum()
         pixels *= normalize
 
-        if maxNoiseInCount > 0:
-            pixels += np.random.normal(
-                3 * maxNoiseInCount,
-                maxNoiseInCount,
-                size=(self.SENSOR_H, self.SENSOR_W))
-
         if self._binning != 1:
             pixels = rebin(pixels, self._binning) * self._binning ** 2
-        pixels = pixels.clip(min=0, max=self.MAX_VALUE)
-
-        time.sleep(1. / self.getFrameRate())
-        return pixels.astype(self.DTYPE)
+        return pixels
 
     def setSlopeSaturationInRadians(self, slopeSaturationInRadians):
         self._slopeSaturationInRad = slopeSaturationInRadians
@@ -0,0 +1,161 @@
+import threading
+import time
+import numpy as np
+from plico.utils.decorator import override, synchronized
+from plico.utils.logger import Logger
+from pysilico_server.devices.abstract_camera import AbstractCamera, \
+    CameraException
+from pysilico_server.devices.frame_pacer import FramePacer
+from pysilico_server.utils.frame_utils import cameraFrameFromArray, \
+    stampFrame
+
+
+class SyntheticStressCamera(AbstractCamera):
+    '''
+    Load generator for throughput tests of the server.
+
+    A ring of nFrames random frames of the given shape and dtype is
+    generated once; acquisition emits them in turn, paced by a
+    FramePacer at frameRate, up to tens of kHz. Frames are views of
+    the ring, that is never modified, so emitting one costs no copy.
+
+    getParameters() reports the requested and the achieved frame rate
+    and the frames the camera could not emit in time.
+    '''
+
+    DEFAULT_SHAPE = (240, 240)
+    DEFAULT_N_FRAMES = 16
+    DEFAULT_FRAME_RATE = 1000.
+
+    def __init__(self, name='SyntheticStressCamera', shape=DEFAULT_SHAPE,
+                 dtype=np.uint16, nFrames=DEFAULT_N_FRAMES,
+                 frameRate=DEFAULT_FRAME_RATE, seed=None):
+        self._name = name
+        self._logger = Logger.of('SyntheticStressCamera')
+        self._mutex = threading.RLock()
+        self._ring = self._makeRing(tuple(shape), np.dtype(dtype),
+                                    int(nFrames), seed)
+        self._binning = 1
+        self._exposureTimeMs = 0.
+        self._counter = 0
+        self._callbackList = []
+        self._stopRequest = threading.Event()
+        self._pacer = FramePacer(frameRate, stopEvent=self._stopRequest)
+        self._thread = None
+        self._logger.notice('Ring of %d frames %s %s at %g Hz' % (
+            nFrames, str(shape), np.dtype(dtype).name, frameRate))
+
+    @staticmethod
+    def _makeRing(shape, dtype, nFrames, seed):
+        if nFrames < 1:
+            raise CameraException('The ring needs at least 1 frame')
+        rng = np.random.default_rng(seed)
+        size = (nFrames,) + shape
+        if np.issubdtype(dtype, np.integer):
+            high = min(np.iinfo(dtype).max, 4095)
+            return rng.integers(0, high, size=size, dtype=dtype,
+                                endpoint=True)
+        return rng.random(size=size, dtype=np.float64).astype(dtype)
+
+    def _run(self):
+        self._pacer.restart()
+        nFrames = len(self._ring)
+        while self._pacer.waitNext():
+            with self._mutex:
+                self._counter += 1
+                counter = self._counter
+            frame = cameraFrameFromArray(self._ring[counter % nFrames],
+                                         counter)
+            stampFrame(frame, receive=time.monotonic())
+            for callback in self._callbackList:
+                callback(frame)
+
+    @override
+    def name(self):
+        return self._name
+
+    @override
+    def readFrame(self, timeoutMilliSec=2000):
+        with self._mutex:
+            self._counter += 1
+            return self._ring[self._counter % len(self._ring)].copy()
+
+    @override
+    def rows(self):
+        return self._ring.shape[1]
+
+    @override
+    def cols(self):
+        return self._ring.shape[2]
+
+    @override
+    def dtype(self):
+        return self._ring.dtype
+
+    @override
+    def setExposureTime(self, exposureTimeInMilliSeconds):
+        self._exposureTimeMs = exposureTimeInMilliSeconds
+
+    @override
+    def exposureTime(self):
+        return self._exposureTimeMs
+
+    @override
+    def setBinning(self, binning):
+        if binning != 1:
+            raise CameraException('Binning is not supported')
+
+    @override
+    def getBinning(self):
+        return self._binning
+
+    @override
+    def registerCallback(self, callback):
+        self._callbackList.append(callback)
+
+    @override
+    def startAcquisition(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopRequest.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='SyntheticStressCamera')
+        self._thread.daemon = True
+        self._thread.start()
+
+    @override
+    def stopAcquisition(self):
+        self._stopRequest.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @override
+    @synchronized("_mutex")
+    def getFrameCounter(self):
+        return self._counter
+
+    @override
+    def getFrameRate(self):
+        return self._pacer.getFrameRate()
+
+    @override
+    def setFrameRate(self, frameRateInHz):
+        try:
+            self._pacer.setFrameRate(frameRateInHz)
+        except ValueError as e:
+            raise CameraException(str(e))
+
+    @override
+    def deinitialize(self):
+        self.stopAcquisition()
+
+    @override
+    def setParameter(self, name, value):
+        raise CameraException('Parameter %s is not valid' % str(name))
+
+    @override
+    def getParameters(self):
+        res = self._pacer.getStatistics()
+        res['ringFrames'] = len(self._ring)
+        return res
@@ -0,0 +1,27 @@
+import numpy as np
+
+
+def memoryMapArray(path, hdu=0):
+    '''
+    Return the array stored in a .npy file, or in the given HDU of a
+    FITS file, memory mapped read-only when possible.
+
+    FITS data with BZERO, BSCALE or BLANK cannot be memory mapped by
+    astropy: they are loaded in memory instead. That is the case of
+    every uint16 image, stored as int16 with BZERO=32768.
+    Raise ValueError if the HDU has no data.
+    '''
+    if path.endswith('.npy'):
+        return np.load(path, mmap_mode='r')
+    from astropy.io import fits
+    with fits.open(path, memmap=True) as hdul:
+        header = hdul[hdu].header
+        scaled = any(k in header for k in ('BZERO', 'BSCALE', 'BLANK'))
+        if not scaled:
+            data = hdul[hdu].data
+    if scaled:
+        with fits.open(path, memmap=False) as hdul:
+            data = hdul[hdu].data
+    if data is None:
+        raise ValueError('No data in HDU %d of %s' % (hdu, path))
+    return data
@@ -8,6 +8,14 @@ class Constants:
     PROCESS_MONITOR_CONFIG_SECTION = 'processMonitor'
     DEFAULT_SERVER_CONFIG_SECTION_PREFIX = 'camera'
 
+    # Offset from the server base port, after the ones defined in plico
+    PORT_ROI_OFFSET = 4
+    PORT_SLOPES_OFFSET = 5
+    PORT_CENTROIDS_OFFSET = 6
+    PORT_DISPLAY_STREAMS_OFFSET = 7
+    PORT_RING_NOTIFY_OFFSET = 8
+    PORT_OUTPUT_STREAMS_OFFSET = 9
+
     # TODO: must be the same of console_scripts in setup.py
     START_PROCESS_NAME = 'pysilico_start'
     STOP_PROCESS_NAME = 'pysilico_stop'
@@ -0,0 +1,228 @@
+import time
+import zlib
+import numpy as np
+
+
+class FrameCodec(object):
+    '''
+    Lossless compression of the frames sent to remote clients.
+
+    Frames go through [delta] -> [shuffle] -> compressor:
+
+    - DELTA subtracts the previous frame of the stream, modulo 2**bits
+      and zigzag encoded for integer frames, with a bitwise XOR for
+      float ones, so that mostly static images become mostly zeros.
+      A keyframe without delta is sent every keyframeInterval frames,
+      or when the shape or dtype change, so that late subscribers can
+      start decoding.
+    - SHUFFLE groups the bytes of the pixels by significance (all the
+      low bytes, then all the high bytes), that compresses much better
+      than interleaved 16 bit pixels.
+    - the compressor is one of NONE, ZLIB (standard library), LZ4
+      (lz4 package) or ZSTD (zstandard package). The latter two are
+      imported only when used.
+
+    The codec is advertised in the frame header by its name, e.g.
+    'zstd+shuffle+delta', that fromName() parses back.
+    '''
+
+    NONE = 'none'
+    ZLIB = 'zlib'
+    LZ4 = 'lz4'
+    ZSTD = 'zstd'
+    COMPRESSORS = (NONE, ZLIB, LZ4, ZSTD)
+    SHUFFLE = 'shuffle'
+    DELTA = 'delta'
+
+    DEFAULT_LEVELS = {NONE: None, ZLIB: 1, LZ4: 0, ZSTD: 3}
+    DEFAULT_KEYFRAME_INTERVAL = 100
+
+    def __init__(self, compressor=ZLIB, shuffle=True, delta=False,
+                 level=None, keyframeInterval=DEFAULT_KEYFRAME_INTERVAL):
+        if compressor not in self.COMPRESSORS:
+            raise ValueError('Unsupported compressor %s. Use one of %s' % (
+                compressor, str(self.COMPRESSORS)))
+        keyframeInterval = int(keyframeInterval)
+        if keyframeInterval < 1:
+            raise ValueError('keyframeInterval must be at least 1')
+        self._compressor = compressor
+        self._shuffle = shuffle
+        self._delta = delta
+        self._level = self.DEFAULT_LEVELS[compressor] if level is None \
+            else level
+        self._keyframeInterval = keyframeInterval
+        self._compress, _ = _compressorFunctions(compressor, self._level)
+        self._previous = None
+        self._sinceKeyframe = 0
+        self._frames = 0
+        self._keyframes = 0
+        self._rawBytes = 0
+        self._compressedBytes = 0
+        self._encodeSec = 0.
+
+    @classmethod
+    def fromName(cls, name, level=None,
+                 keyframeInterval=DEFAULT_KEYFRAME_INTERVAL):
+        compressor, options = _parseName(name)
+        return cls(compressor, cls.SHUFFLE in options, cls.DELTA in options,
+                   level, keyframeInterval)
+
+    def name(self):
+        return _codecName(self._compressor, self._shuffle, self._delta)
+
+    def reset(self):
+        '''Start again from a keyframe'''
+        self._previous = None
+
+    def encode(self, array, counter):
+        '''
+        Return (payload, reference) where reference is the counter of
+        the frame the delta refers to, or None for keyframes.
+        '''
+        t0 = time.perf_counter()
+        array = np.ascontiguousarray(array)
+        reference = None
+        data = array
+        if self._delta:
+            previous = self._previous
+            if previous is not None and \
+                    self._sinceKeyframe < self._keyframeInterval and \
+                    previous[0].shape == array.shape and \
+                    previous[0].dtype == array.dtype:
+                data = _delta(array, previous[0])
+                reference = previous[1]
+                self._sinceKeyframe += 1
+            else:
+                self._sinceKeyframe = 1
+            self._previous = (array.copy(), counter)
+        if self._shuffle:
+            data = _shuffle(data)
+        payload = self._compress(memoryview(data.reshape(-1)).cast('B'))
+        self._frames += 1
+        self._keyframes += reference is None
+        self._rawBytes += array.nbytes
+        self._compressedBytes += len(payload)
+        self._encodeSec += time.perf_counter() - t0
+        return payload, reference
+
+    def getStatistics(self):
+        return {'codec': self.name(),
+                'level': self._level,
+                'frames': self._frames,
+                'keyframes': self._keyframes,
+                'rawBytes': self._rawBytes,
+                'compressedBytes': self._compressedBytes,
+                'compressionRatio': self._rawBytes / self._compressedBytes
+                if self._compressedBytes else None,
+                'meanEncodeSec': self._encodeSec / self._frames
+                if self._frames else None}
+
+
+class FrameDecoder(object):
+    '''
+    Client side counterpart of FrameCodec: one per subscribed stream,
+    since delta frames are decoded from the previous frame.
+    '''
+
+    def __init__(self):
+        self._previous = None
+        self._decompressors = {}
+
+    def decode(self, header, payload):
+        '''
+        Return the array of a compressed frame, or None for a delta
+        frame whose reference has not been received (e.g. the first
+        frames after subscribing): decoding restarts at the next
+        keyframe.
+        '''
+        compressor, options = _parseName(header['codec'])
+        reference = header['reference']
+        if reference is not None and (
+                self._previous is None or self._previous[1] != reference):
+            return None
+        if compressor not in self._decompressors:
+            self._decompressors[compressor] = _compressorFunctions(
+                compressor, FrameCodec.DEFAULT_LEVELS[compressor])[1]
+        data = self._decompressors[compressor](payload)
+        dtype, shape = header['dtype'], header['shape']
+        if FrameCodec.SHUFFLE in options:
+            array = _unshuffle(data, dtype).reshape(shape)
+        else:
+            array = np.frombuffer(data, dtype=dtype).reshape(shape)
+        if reference is not None:
+            array = _undelta(array, self._previous[0])
+        if FrameCodec.DELTA in options:
+            self._previous = (array, header['counter'])
+        return array
+
+
+def _codecName(compressor, shuffle, delta):
+    return '+'.join([compressor] +
+                    ([FrameCodec.SHUFFLE] if shuffle else []) +
+                    ([FrameCodec.DELTA] if delta else []))
+
+
+def _parseName(name):
+    parts = name.split('+')
+    compressor, options = parts[0], set(parts[1:])
+    if compressor not in FrameCodec.COMPRESSORS or \
+            not options <= {FrameCodec.SHUFFLE, FrameCodec.DELTA}:
+        raise ValueError('Unsupported codec %s' % name)
+    return compressor, options
+
+
+def _compressorFunctions(compressor, level):
+    '''Return (compress, decompress) of the given compressor'''
+    if compressor == FrameCodec.NONE:
+        return bytes, bytes
+    if compressor == FrameCodec.ZLIB:
+        return (lambda data: zlib.compress(data, level)), zlib.decompress
+    if compressor == FrameCodec.LZ4:
+        import lz4.frame
+        return (lambda data: lz4.frame.compress(
+            data, compression_level=level)), lz4.frame.decompress
+    if compressor == FrameCodec.ZSTD:
+        import zstandard
+        return zstandard.ZstdCompressor(level=level).compress, \
+            zstandard.ZstdDecompressor().decompress
+    raise ValueError('Unsupported compressor %s' % compressor)
+
+
+def _unsignedView(array):
+    return array.view(np.dtype('u%d' % array.dtype.itemsize))
+
+
+def _delta(array, previous):
+    if array.dtype.kind not in 'iu':
+        return _unsignedView(array) ^ _unsignedView(previous)
+    # Zigzag encoding maps the small negative differences to small
+    # positive numbers, instead of 0xffxx, so that the high bytes of
+    # noisy static frames stay zero
+    diff = _unsignedView(array) - _unsignedView(previous)
+    signed = diff.view(np.dtype('i%d' % diff.dtype.itemsize))
+    return ((signed << 1) ^ (signed >> (8 * diff.dtype.itemsize - 1))).view(
+        diff.dtype)
+
+
+def _undelta(delta, previous):
+    delta = _unsignedView(delta)
+    if previous.dtype.kind not in 'iu':
+        return (delta ^ _unsignedView(previous)).view(previous.dtype)
+    diff = (delta >> 1) ^ (delta.dtype.type(0) - (delta & 1))
+    return (diff + _unsignedView(previous)).view(previous.dtype)
+
+
+def _shuffle(array):
+    itemsize = array.dtype.itemsize
+    if itemsize == 1:
+        return array
+    return np.ascontiguousarray(
+        array.reshape(-1).view(np.uint8).reshape(-1, itemsize).T)
+
+
+def _unshuffle(data, dtype):
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if dtype.itemsize == 1:
+        return raw.view(dtype)
+    return np.ascontiguousarray(
+        raw.reshape(dtype.itemsize, -1).T).view(dtype).reshape(-1)
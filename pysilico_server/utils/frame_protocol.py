@@ -0,0 +1,159 @@
+import pickle
+import struct
+import time
+import numpy as np
+import zmq
+from plico.utils.constants import Constants
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+class FrameProtocol(object):
+    '''
+    Wire formats of the frame sockets.
+
+    PICKLE (version 0) is the original format: a single message part
+    holding the pickled CameraFrame. Clients using recvCameraFrame
+    only understand this one, so it is the default.
+
+    RAW (version 1) sends two parts: a fixed size header and the
+    contiguous pixel buffer of the frame
+
+        header = magic 'PSLC', version, ndim, counter, timestamp,
+                 shape (4 x uint32), dtype string, ROI id
+
+    so that the receiver builds the array with np.frombuffer and the
+    sender has no pickling to do. With copy=False the buffer is handed
+    to ZMQ without copying it: only do so when the array is not
+    reused after the call, since ZMQ reads it later from its I/O thread.
+
+    Compressed frames (version 2) have the RAW layout with two more
+    header fields, the FrameCodec name and the counter of the frame
+    a delta refers to (-1 for keyframes), and the compressed payload
+    in place of the pixel buffer.
+
+    On topic sockets all formats are preceded by a topic part.
+    decode() recognizes all versions; compressed frames need a
+    FrameDecoder.
+    '''
+
+    PICKLE = 'pickle'
+    RAW = 'raw'
+    PROTOCOLS = (PICKLE, RAW)
+
+    MAGIC = b'PSLC'
+    VERSION = 1
+    VERSION_COMPRESSED = 2
+    MAX_DIMENSIONS = 4
+    HEADER = struct.Struct('<4sBBQd4I8s32s')
+    HEADER_COMPRESSED = struct.Struct('<4sBBQd4I8s32s24sq')
+
+    @classmethod
+    def checkProtocol(cls, protocol):
+        if protocol not in cls.PROTOCOLS:
+            raise ValueError('Unsupported frame protocol %s. Use one of %s' %
+                             (protocol, str(cls.PROTOCOLS)))
+
+    @classmethod
+    def encodeHeader(cls, array, counter, timestamp, roiId='', codec=None,
+                     reference=None):
+        if array.ndim > cls.MAX_DIMENSIONS:
+            raise ValueError('Cannot encode a %d dimensional array' %
+                             array.ndim)
+        shape = tuple(array.shape) + (0,) * (cls.MAX_DIMENSIONS - array.ndim)
+        fields = (array.ndim, counter, timestamp) + shape + (
+            array.dtype.str.encode(), roiId.encode())
+        if codec is None:
+            return cls.HEADER.pack(cls.MAGIC, cls.VERSION, *fields)
+        return cls.HEADER_COMPRESSED.pack(
+            cls.MAGIC, cls.VERSION_COMPRESSED, *fields, codec.encode(),
+            -1 if reference is None else reference)
+
+    @classmethod
+    def isHeader(cls, part):
+        return len(part) in (cls.HEADER.size, cls.HEADER_COMPRESSED.size) \
+            and part[:4] == cls.MAGIC
+
+    @classmethod
+    def decodeHeader(cls, header):
+        if len(header) == cls.HEADER_COMPRESSED.size:
+            fields = cls.HEADER_COMPRESSED.unpack(header)
+        else:
+            fields = cls.HEADER.unpack(header)
+        magic, version, ndim, counter, timestamp = fields[:5]
+        if magic != cls.MAGIC:
+            raise ValueError('Not a frame header')
+        if version not in (cls.VERSION, cls.VERSION_COMPRESSED) or \
+                (version == cls.VERSION_COMPRESSED) != (len(fields) == 13):
+            raise ValueError('Unsupported frame protocol version %d' % version)
+        res = {'version': version,
+               'counter': counter,
+               'timestamp': timestamp,
+               'shape': fields[5:5 + ndim],
+               'dtype': np.dtype(fields[9].rstrip(b'\0').decode()),
+               'roiId': fields[10].rstrip(b'\0').decode()}
+        if version == cls.VERSION_COMPRESSED:
+            res['codec'] = fields[11].rstrip(b'\0').decode()
+            res['reference'] = None if fields[12] < 0 else fields[12]
+        return res
+
+    @classmethod
+    def encode(cls, frame, protocol, topic=None, timestamp=None):
+        '''Return the list of message parts of frame'''
+        parts = [] if topic is None else [topic.encode()]
+        if protocol == cls.PICKLE:
+            return parts + [pickle.dumps(frame, Constants.PICKLE_PROTOCOL)]
+        array = np.ascontiguousarray(frame.toNumpyArray())
+        if timestamp is None:
+            timestamp = time.time()
+        header = cls.encodeHeader(array, frame.counter(), timestamp,
+                                  topic or '')
+        return parts + [header, memoryview(array.reshape(-1)).cast('B')]
+
+    @classmethod
+    def encodeCompressed(cls, frame, codec, topic=None, timestamp=None):
+        '''Return the message parts of frame compressed with codec'''
+        parts = [] if topic is None else [topic.encode()]
+        array = frame.toNumpyArray()
+        payload, reference = codec.encode(array, frame.counter())
+        if timestamp is None:
+            timestamp = time.time()
+        header = cls.encodeHeader(array, frame.counter(), timestamp,
+                                  topic or '', codec.name(), reference)
+        return parts + [header, payload]
+
+    @classmethod
+    def send(cls, socket, frame, protocol, topic=None, timestamp=None,
+             copy=True):
+        socket.send_multipart(cls.encode(frame, protocol, topic, timestamp),
+                              zmq.NOBLOCK, copy=copy)
+
+    @classmethod
+    def sendCompressed(cls, socket, frame, codec, topic=None,
+                       timestamp=None):
+        socket.send_multipart(
+            cls.encodeCompressed(frame, codec, topic, timestamp),
+            zmq.NOBLOCK, copy=False)
+
+    @classmethod
+    def decode(cls, parts, decoder=None):
+        '''
+        Return (frame, header) from the parts of a message of any
+        version. header is None for PICKLE messages. Compressed
+        messages need the FrameDecoder of the stream; frame is None
+        if it cannot decode them yet.
+        '''
+        parts = [p.buffer if isinstance(p, zmq.Frame) else p for p in parts]
+        if len(parts) >= 2 and cls.isHeader(parts[-2]):
+            header = cls.decodeHeader(parts[-2])
+            if header['version'] == cls.VERSION_COMPRESSED:
+                if decoder is None:
+                    raise ValueError('Compressed frame (%s): a FrameDecoder '
+                                     'is needed' % header['codec'])
+                array = decoder.decode(header, parts[-1])
+                if array is None:
+                    return None, header
+            else:
+                array = np.frombuffer(parts[-1], dtype=header['dtype'])
+            return cameraFrameFromArray(array.reshape(header['shape']),
+                                        header['counter']), header
+        return pickle.loads(parts[-1]), None
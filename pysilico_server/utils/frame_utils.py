@@ -0,0 +1,40 @@
+from pysilico.types.camera_frame import CameraFrame
+
+
+def cameraFrameFromArray(array, counter=0, timestamps=None):
+    '''
+    Build a CameraFrame that references array without copying it.
+
+    CameraFrame.__init__ always makes a uint16 copy of the array.
+    In the publish path the frame is pickled right away, so there is no
+    need for that copy and the array dtype is preserved on the wire.
+    The caller must not modify array while the frame is in use.
+    timestamps are set as in stampFrame.
+    '''
+    frame = CameraFrame.__new__(CameraFrame)
+    frame._array = array
+    frame._counter = counter
+    if timestamps:
+        frame.timestamps = dict(timestamps)
+    return frame
+
+
+def stampFrame(frame, **timestamps):
+    '''
+    Add timestamps to the frame.timestamps dictionary and return frame.
+
+    - 'device': acquisition time in seconds in the clock of the camera,
+      for devices whose SDK exposes it
+    - 'receive': host time.monotonic() when the device handed the frame
+      over to the server
+    - 'publish': host time.monotonic() when the frame was published
+
+    The dictionary is pickled with the frame; clients that do not know
+    about it just ignore it.
+    '''
+    frame.timestamps = dict(frameTimestamps(frame), **timestamps)
+    return frame
+
+
+def frameTimestamps(frame):
+    return getattr(frame, 'timestamps', {})
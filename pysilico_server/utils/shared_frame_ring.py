@@ -0,0 +1,174 @@
+import struct
+from multiprocessing import shared_memory
+import numpy as np
+
+
+class SharedFrameRing(object):
+    '''
+    Ring of frame slots in POSIX shared memory, for consumers running
+    on the same host as the server.
+
+    The server creates the ring and writes each frame in the next slot;
+    it then publishes a NOTIFICATION (slot, sequence, counter) on a ZMQ
+    socket. Readers attach to the ring by name and get a read-only view
+    of the slot, without copying the frame.
+
+    Each slot has a seqlock: its sequence number is odd while the
+    writer fills the slot and is incremented again when done. A reader
+    checks with isValid(slot, sequence) after having used the view that
+    the slot was not overwritten meanwhile; readCopy() does it for you.
+
+    Layout: a 64 bytes ring header (magic, version, nSlots, slotBytes)
+    followed by nSlots slots, each one a 64 bytes slot header
+    (sequence, counter, timestamp, ndim, shape, dtype, nbytes) and
+    slotBytes of pixel data.
+    '''
+
+    MAGIC = b'PSRG'
+    VERSION = 1
+    HEADER_BYTES = 64
+    RING_HEADER = struct.Struct('<4sIIQ')
+    SLOT_HEADER = struct.Struct('<QQdI4I8sQ')
+    NOTIFICATION = struct.Struct('<IQQ')
+    MAX_DIMENSIONS = 4
+
+    _createdHere = set()
+
+    def __init__(self, shm, owner):
+        self._shm = shm
+        self._owner = owner
+        magic, version, nSlots, slotBytes = self.RING_HEADER.unpack_from(
+            shm.buf, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('%s is not a version %d frame ring' % (
+                shm.name, self.VERSION))
+        self._nSlots = nSlots
+        self._slotBytes = slotBytes
+        self._slotStride = self.HEADER_BYTES + slotBytes
+        self._sequences = np.ndarray(
+            (nSlots,), dtype=np.uint64, buffer=shm.buf,
+            offset=self.HEADER_BYTES, strides=(self._slotStride,))
+        self._next = 0
+
+    @classmethod
+    def create(cls, name, nSlots, slotBytes):
+        nSlots, slotBytes = int(nSlots), int(slotBytes)
+        if nSlots < 1 or slotBytes < 1:
+            raise ValueError('Invalid ring of %d slots of %d bytes' % (
+                nSlots, slotBytes))
+        slotBytes = -(-slotBytes // 64) * 64
+        size = cls.HEADER_BYTES + nSlots * (cls.HEADER_BYTES + slotBytes)
+        try:
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        except FileExistsError:
+            stale = shared_memory.SharedMemory(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name, create=True, size=size)
+        cls._createdHere.add(shm.name)
+        shm.buf[:size] = bytes(size)
+        cls.RING_HEADER.pack_into(shm.buf, 0, cls.MAGIC, cls.VERSION,
+                                  nSlots, slotBytes)
+        return cls(shm, owner=True)
+
+    @classmethod
+    def attach(cls, name):
+        shm = shared_memory.SharedMemory(name)
+        cls._untrack(shm)
+        return cls(shm, owner=False)
+
+    @classmethod
+    def _untrack(cls, shm):
+        # Up to python 3.12 attaching registers the segment in the
+        # resource tracker, that unlinks it when the reader exits.
+        if shm.name in cls._createdHere:
+            return
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, 'shared_memory')
+        except Exception:
+            pass
+
+    def name(self):
+        return self._shm.name
+
+    def nSlots(self):
+        return self._nSlots
+
+    def slotBytes(self):
+        return self._slotBytes
+
+    def _slotOffset(self, slot):
+        return self.HEADER_BYTES + slot * self._slotStride
+
+    def write(self, array, counter, timestamp):
+        '''
+        Copy array in the next slot. Return the notification to publish,
+        or None if the array does not fit in a slot.
+        '''
+        if array.nbytes > self._slotBytes or array.ndim > self.MAX_DIMENSIONS:
+            return None
+        slot = self._next % self._nSlots
+        offset = self._slotOffset(slot)
+        sequence = int(self._sequences[slot]) + 1
+        self._sequences[slot] = sequence
+        shape = tuple(array.shape) + (0,) * (self.MAX_DIMENSIONS - array.ndim)
+        self.SLOT_HEADER.pack_into(
+            self._shm.buf, offset, sequence, counter, timestamp,
+            array.ndim, *shape, array.dtype.str.encode(), array.nbytes)
+        dst = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf,
+                         offset=offset + self.HEADER_BYTES)
+        np.copyto(dst, array)
+        sequence += 1
+        self._sequences[slot] = sequence
+        self._next += 1
+        return self.NOTIFICATION.pack(slot, sequence, counter)
+
+    @classmethod
+    def decodeNotification(cls, message):
+        '''Return (slot, sequence, counter)'''
+        return cls.NOTIFICATION.unpack(message)
+
+    def isValid(self, slot, sequence):
+        return int(self._sequences[slot]) == sequence
+
+    def read(self, slot, sequence=None):
+        '''
+        Return (array, counter, timestamp, sequence) where array is a
+        read-only view of the slot, or None if the slot is being written
+        or does not hold the given sequence anymore.
+        '''
+        current = int(self._sequences[slot])
+        if current % 2 or current == 0:
+            return None
+        if sequence is not None and current != sequence:
+            return None
+        offset = self._slotOffset(slot)
+        fields = self.SLOT_HEADER.unpack_from(self._shm.buf, offset)
+        _, counter, timestamp, ndim = fields[:4]
+        shape = fields[4:4 + ndim]
+        dtype = np.dtype(fields[8].rstrip(b'\0').decode())
+        array = np.ndarray(shape, dtype=dtype, buffer=self._shm.buf,
+                           offset=offset + self.HEADER_BYTES)
+        array.flags.writeable = False
+        if not self.isValid(slot, current):
+            return None
+        return array, counter, timestamp, current
+
+    def readCopy(self, slot, sequence=None):
+        '''Like read() but returns a copy checked against the seqlock'''
+        res = self.read(slot, sequence)
+        if res is None:
+            return None
+        array, counter, timestamp, current = res
+        copied = array.copy()
+        if not self.isValid(slot, current):
+            return None
+        return copied, counter, timestamp, current
+
+    def close(self):
+        self._sequences = None
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+            self._createdHere.discard(self._shm.name)
@@ -91,6 +91,7 @@ setup(name=NAME,
       install_requires=["plico>=0.30",
                         "pysilico>=0.19",
                         "numpy",
+                        "astropy",
                         "psutil",
                         "six",
                         "rebin",
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+import threading
+import time
+import unittest
+import zmq
+from plico.utils.logger import Logger
+from pysilico_server.camera_controller.asyncio_control_loop import \
+    AsyncioControlLoop
+
+
+class MyController():
+
+    def __init__(self, replySocket):
+        self._replySocket = replySocket
+        self._terminated = False
+        self.requests = []
+        self.statusPublished = 0
+        self.pings = 0
+        self.steps = 0
+        self.failPing = False
+
+    def serveRequests(self):
+        while True:
+            try:
+                msg = self._replySocket.recv(zmq.NOBLOCK)
+            except zmq.Again:
+                return
+            self.requests.append(msg)
+            if msg == b'terminate':
+                self._terminated = True
+            self._replySocket.send(b'ok:' + msg)
+
+    def publishStatus(self):
+        self.statusPublished += 1
+
+    def countStep(self):
+        self.steps += 1
+
+    def pingCamera(self):
+        self.pings += 1
+        if self.failPing:
+            raise RuntimeError('camera unreachable')
+
+    def isTerminated(self):
+        return self._terminated
+
+    def terminate(self):
+        self._terminated = True
+
+
+class AsyncioControlLoopTest(unittest.TestCase):
+
+    def setUp(self):
+        self._context = zmq.Context()
+        self._replySocket = self._context.socket(zmq.REP)
+        self._replySocket.bind('inproc://controller')
+        self._requestSocket = self._context.socket(zmq.REQ)
+        self._requestSocket.connect('inproc://controller')
+        self._requestSocket.setsockopt(zmq.RCVTIMEO, 2000)
+        self._ctrl = MyController(self._replySocket)
+        self._errors = []
+
+    def tearDown(self):
+        self._ctrl.terminate()
+        self._thread.join(5)
+        self._requestSocket.close(linger=0)
+        self._replySocket.close(linger=0)
+        self._context.term()
+
+    def _startLoop(self, **kwds):
+        loop = AsyncioControlLoop(self._ctrl, self._replySocket,
+                                  Logger.of('test loop'), **kwds)
+
+        def run():
+            try:
+                loop.start()
+            except Exception as e:
+                self._errors.append(e)
+
+        self._thread = threading.Thread(target=run)
+        self._thread.start()
+
+    def _request(self, msg):
+        self._requestSocket.send(msg)
+        return self._requestSocket.recv()
+
+    def testServesRequestsWithoutWaitingForAPeriod(self):
+        self._startLoop(statusPeriodSec=10.)
+        self.assertEqual(b'ok:hello', self._request(b'hello'))
+        t0 = time.time()
+        for i in range(10):
+            self._request(b'%d' % i)
+        self.assertLess((time.time() - t0) / 10, 0.02)
+        self.assertEqual(11, len(self._ctrl.requests))
+
+    def testPublishesStatusPeriodicallyAndAfterRequests(self):
+        self._startLoop(statusPeriodSec=10.)
+        self._request(b'hello')
+        deadline = time.time() + 2
+        while self._ctrl.statusPublished < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(2, self._ctrl.statusPublished)
+
+    def testCountsAStepAtEveryStatusPeriod(self):
+        self._startLoop(statusPeriodSec=0.01)
+        deadline = time.time() + 2
+        while self._ctrl.steps < 5 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(self._ctrl.steps, 5)
+
+    def testStopsWhenTerminated(self):
+        self._startLoop()
+        self._request(b'terminate')
+        self._thread.join(2)
+        self.assertFalse(self._thread.is_alive())
+        self.assertEqual([], self._errors)
+
+    def testControllerExceptionsStopTheLoop(self):
+        self._ctrl.failPing = True
+        self._startLoop(pingPeriodSec=0.05)
+        self._thread.join(2)
+        self.assertFalse(self._thread.is_alive())
+        self.assertEqual(1, len(self._errors))
+        self.assertIsInstance(self._errors[0], RuntimeError)
+
+    def testCheckMode(self):
+        AsyncioControlLoop.checkMode(AsyncioControlLoop.ASYNCIO)
+        self.assertRaises(ValueError, AsyncioControlLoop.checkMode, 'foo')
+        self._startLoop()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+
+
+class BufferPoolTest(unittest.TestCase):
+
+    def setUp(self):
+        self._pool = BufferPool()
+
+    def testBufferIsReused(self):
+        a = self._pool.get('foo', (4, 3), np.uint16)
+        b = self._pool.get('foo', (4, 3), np.uint16)
+        self.assertIs(a, b)
+        self.assertEqual(1, self._pool.getStatistics()['allocations'])
+
+    def testBufferIsReallocatedWhenShapeOrDtypeChange(self):
+        a = self._pool.get('foo', (4, 3), np.uint16)
+        b = self._pool.get('foo', (2, 3), np.uint16)
+        c = self._pool.get('foo', (2, 3), np.float32)
+        self.assertEqual((2, 3), b.shape)
+        self.assertEqual(np.float32, c.dtype)
+        self.assertIsNot(a, b)
+        self.assertEqual(1, self._pool.getStatistics()['buffers'])
+        self.assertEqual(3, self._pool.getStatistics()['allocations'])
+
+    def testBuffersAreIdentifiedByName(self):
+        a = self._pool.get('foo', (4, 3), np.uint16)
+        b = self._pool.get('bar', (4, 3), np.uint16)
+        self.assertIsNot(a, b)
+        self.assertEqual(2 * a.nbytes, self._pool.getStatistics()['bytes'])
+
+
+if __name__ == "__main__":
+    unittest.main()
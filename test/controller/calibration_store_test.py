@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+import os
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.calibration_store import \
+    CalibrationStore
+
+
+class CalibrationStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self._folder = tempfile.mkdtemp()
+        self._store = CalibrationStore(self._folder, 'My Camera')
+
+    def tearDown(self):
+        shutil.rmtree(self._folder)
+
+    def testSavedDarksAreReloadedMemoryMapped(self):
+        dark = np.arange(6, dtype=np.uint16).reshape((2, 3))
+        self._store.save(2, 0.75, dark)
+        reloaded = CalibrationStore(self._folder, 'My Camera')
+        reloaded.load()
+        got = reloaded.get(2, 0.75)
+        np.testing.assert_array_equal(dark, got)
+        self.assertIsInstance(got.base, np.memmap)
+        self.assertIsNone(reloaded.get(1, 0.75))
+        self.assertIsNone(reloaded.get(2, 10))
+
+    def testDarksOfOtherCamerasAreIgnored(self):
+        CalibrationStore(self._folder, 'other').save(1, 10, np.zeros((2, 2)))
+        self._store.load()
+        self.assertEqual([], self._store.keys())
+
+    def testFitsDarksAreLoaded(self):
+        from astropy.io import fits
+        dark = np.full((2, 2), 7, dtype=np.int16)
+        fits.writeto(os.path.join(self._folder,
+                                  self._store.fileName(1, 10, 'fits')), dark)
+        self._store.load()
+        np.testing.assert_array_equal(dark, self._store.get(1, 10.0))
+
+    def testUint16FitsDarksAreLoaded(self):
+        from astropy.io import fits
+        dark = np.full((2, 2), 40000, dtype=np.uint16)
+        fits.writeto(os.path.join(self._folder,
+                                  self._store.fileName(1, 10, 'fits')), dark)
+        self._store.load()
+        np.testing.assert_array_equal(dark, self._store.get(1, 10.0))
+
+    def testDefaultDarkInThePysilicoLayout(self):
+        from astropy.io import fits
+        from pysilico.calibration.calibration_manager import \
+            CalibrationManager
+        from pysilico.types.camera_frame import CameraFrame
+        manager = CalibrationManager(self._folder)
+        dark = np.full((2, 2), 300, dtype=np.uint16)
+        manager.saveDarkFrame('tag', CameraFrame(dark, counter=3))
+        store = CalibrationStore(
+            os.path.join(self._folder, 'dark_frame', 'tag'), 'My Camera',
+            manager.getDarkFrameFileName('tag'))
+        store.load()
+        np.testing.assert_array_equal(dark, store.get(1, 10.0))
+        store.save(1, 10.0, np.zeros((2, 2)))
+        np.testing.assert_array_equal(np.zeros((2, 2)), store.get(1, 10.0))
+        np.testing.assert_array_equal(dark, store.get(2, 10.0))
+        self.assertTrue(fits.getheader(
+            manager.getDarkFrameFileName('tag'))['BZERO'])
+
+    def testUnreadableFilesAreSkipped(self):
+        open(os.path.join(self._folder,
+                          self._store.fileName(1, 10, 'fits')), 'w').close()
+        self._store.load()
+        self.assertEqual([], self._store.keys())
+
+
+if __name__ == "__main__":
+    unittest.main()
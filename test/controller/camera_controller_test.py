@@ -1,9 +1,24 @@
 #!/usr/bin/env python
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
+import numpy as np
+from test.test_helper import Poller, ExecutionProbe
 from pysilico_server.devices.simulated_auxiliary_camera import \
     SimulatedAuxiliaryCamera
 from pysilico_server.camera_controller.camera_controller import \
     CameraController
+from pysilico_server.camera_controller.frame_accumulator import \
+    FrameAccumulator
+from pysilico_server.camera_controller.calibration_store import \
+    CalibrationStore
+from pysilico_server.camera_controller.output_streams import OutputStream
+from pysilico_server.utils.shared_frame_ring import SharedFrameRing
+from pysilico_server.utils.frame_utils import stampFrame, frameTimestamps
+from pysilico.types.camera_frame import CameraFrame
 
 __version__ = "$Id: camera_controller_test.py 293 2017-06-21 17:10:57Z lbusoni $"
 
@@ -38,6 +53,15 @@ class MyRpcHandler():
         self.publishPickable(socket, frame)
 
 
+class MyNotifySocket():
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message, flags=0):
+        self.sent.append(message)
+
+
 class CameraControllerTest(unittest.TestCase):
 
     def setUp(self):
@@ -61,6 +85,7 @@ class CameraControllerTest(unittest.TestCase):
 
 
     def tearDown(self):
+        self._ctrl.stopFramePipeline()
         self._camera.raiseExceptionOnDeinitialize(False)
         self._camera.deinitialize()
 
@@ -93,6 +118,369 @@ class CameraControllerTest(unittest.TestCase):
         self.assertNotEqual(status, status3)
 
 
+    def testStatusIsRepublishedWhenPolledParametersChange(self):
+        self._ctrl.setStatusPublishing(60., parameterPollSec=0.001)
+        self._ctrl.step()
+        self._camera.setParameter('testParameter', 123)
+        Poller(2).check(ExecutionProbe(lambda: (
+            self._ctrl.step(),
+            self.assertEqual(123, self._rpcHandler.getLastPublished(
+                self._statusSocket).parameters['testParameter']))))
+
+    def testSetStatusPublishingKeepsTheArgumentsNotGiven(self):
+        self._ctrl.setStatusPublishing(5., parameterPollSec=2.)
+        self._ctrl.setStatusPublishing(1.)
+        stats = self._ctrl.getStatusPublisherStatistics()
+        self.assertEqual((1., 2.), (stats['heartbeatSec'],
+                                    stats['parameterPollSec']))
+        self._ctrl.setStatusPublishing(parameterPollSec=None)
+        stats = self._ctrl.getStatusPublisherStatistics()
+        self.assertEqual((1., None), (stats['heartbeatSec'],
+                                      stats['parameterPollSec']))
+
+    def _waitFramePublished(self, counter):
+        def _published():
+            frame = self._rpcHandler.getLastPublished(self._publisherSocket)
+            self.assertEqual(counter, frame.counter())
+            stats = self._ctrl.getFrameDispatcherStatistics()
+            self.assertEqual(1, stats['publishedFrames'])
+        Poller(2).check(ExecutionProbe(_published))
+
+    def testFramesArePublishedByTheDispatcherThread(self):
+        self._camera.setFrameRate(1000)
+        self._camera.produceFrame()
+        self._waitFramePublished(self._camera.getFrameCounter())
+
+    def testDarkFrameIsSubtractedIntoAReusedBuffer(self):
+        raw = CameraFrame(np.arange(12).reshape((3, 4)) + 10, counter=3)
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 10)))
+        self._ctrl._publishFrame(raw)
+        first = self._rpcHandler.getLastPublished(self._publisherSocket)
+        np.testing.assert_array_equal(np.arange(12).reshape((3, 4)),
+                                      first.toNumpyArray())
+        self.assertEqual(3, first.counter())
+        self._ctrl._publishFrame(raw)
+        second = self._rpcHandler.getLastPublished(self._publisherSocket)
+        self.assertIs(first.toNumpyArray(), second.toNumpyArray())
+
+    def testBufferPoolIsReleasedOnBinningChange(self):
+        self._ctrl.setDarkFrame(CameraFrame(np.zeros((3, 4))))
+        self._ctrl._publishFrame(CameraFrame(np.ones((3, 4))))
+        self.assertNotEqual(
+            0, self._ctrl.getBufferPoolStatistics()['buffers'])
+        self._ctrl.setBinning(2)
+        self.assertEqual(
+            0, self._ctrl.getBufferPoolStatistics()['buffers'])
+
+    def testGetOutputDtype(self):
+        self.assertEqual(self._camera.dtype(), self._ctrl.getOutputDtype())
+        self._ctrl.setOutputDtype('float32')
+        self.assertEqual(np.float32, self._ctrl.getOutputDtype())
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertFalse(hasattr(status, 'outputDtype'))
+
+    def testDarkFramesFollowTheCameraMode(self):
+        folder = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, folder)
+        store = CalibrationStore(folder, self._camera.name())
+        self._ctrl.stopFramePipeline()
+        self._ctrl = CameraController(
+            self._serverName, self._ports, self._camera,
+            self._replySocket, self._publisherSocket, self._statusSocket,
+            self._displaySocket, self._rpcHandler, calibrationStore=store)
+        self._ctrl.setExposureTime(1.0)
+        dark1ms = np.full((3, 4), 1)
+        self._ctrl.setDarkFrame(CameraFrame(dark1ms))
+        self._ctrl.setExposureTime(2.0)
+        self.assertIsNone(self._ctrl.getDarkFrame())
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 2)))
+        self._ctrl.setExposureTime(1.0)
+        np.testing.assert_array_equal(
+            dark1ms, self._ctrl.getDarkFrame().toNumpyArray())
+        self.assertEqual([(1, '1'), (1, '2')], store.keys())
+
+    def _publishUntilSet(self, frame, stop):
+        while not stop.is_set():
+            self._ctrl._publishFrame(frame)
+
+    def _callWhilePublishing(self, frame, func, *args):
+        stop = threading.Event()
+        publisher = threading.Thread(target=self._publishUntilSet,
+                                     args=(frame, stop))
+        publisher.start()
+        try:
+            return func(*args, timeoutSec=2)
+        finally:
+            stop.set()
+            publisher.join()
+
+    def testAccumulateAveragesCorrectedFrames(self):
+        self._camera.setFrameRate(1000)
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 10)))
+        raw = CameraFrame(np.full((3, 4), 14))
+        res = self._callWhilePublishing(raw, self._ctrl.accumulate, 5)
+        np.testing.assert_array_equal(np.full((3, 4), 4.), res)
+        self.assertEqual([], self._ctrl._accumulators)
+
+    def testAcquireDarkFrameUsesRawFrames(self):
+        self._camera.setFrameRate(1000)
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 10)))
+        raw = CameraFrame(np.full((3, 4), 14))
+        self._callWhilePublishing(raw, self._ctrl.acquireDarkFrame, 3)
+        np.testing.assert_array_equal(
+            np.full((3, 4), 14), self._ctrl.getDarkFrame().toNumpyArray())
+
+    def testAccumulateTimesOut(self):
+        self._camera.setFrameRate(1000)
+        self.assertRaises(TimeoutError, self._ctrl.accumulate, 2,
+                          timeoutSec=0.01)
+        self.assertEqual([], self._ctrl._accumulators)
+
+    def testLongAccumulationsDoNotBlockRequests(self):
+        self.assertRaises(ValueError, self._ctrl.accumulate, 100)
+        self.assertRaises(ValueError, self._ctrl.acquireDarkFrame, 100)
+        self.assertEqual([], self._ctrl._accumulators)
+
+    def testStartAccumulationAndPollTheResult(self):
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 10)))
+        accumulationId = self._ctrl.startAccumulation(100)
+        raw = CameraFrame(np.full((3, 4), 14))
+        for _ in range(99):
+            self._ctrl._publishFrame(raw)
+        self.assertIsNone(self._ctrl.getAccumulationResult(accumulationId))
+        self._ctrl._publishFrame(raw)
+        res = self._ctrl.getAccumulationResult(accumulationId)
+        np.testing.assert_array_equal(np.full((3, 4), 4.), res)
+        self.assertEqual([], self._ctrl._accumulators)
+        self.assertRaises(ValueError, self._ctrl.getAccumulationResult,
+                          accumulationId)
+
+    def testStartDarkFrameAcquisitionInstallsTheDark(self):
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 10)))
+        accumulationId = self._ctrl.startDarkFrameAcquisition(3)
+        for _ in range(3):
+            self._ctrl._publishFrame(CameraFrame(np.full((3, 4), 14)))
+        self._ctrl.getAccumulationResult(accumulationId)
+        np.testing.assert_array_equal(
+            np.full((3, 4), 14), self._ctrl.getDarkFrame().toNumpyArray())
+
+    def testFailedAccumulationsDoNotStopPublishing(self):
+        accumulationId = self._ctrl.startAccumulation(3)
+        self._ctrl._publishFrame(CameraFrame(np.zeros((3, 4)), counter=1))
+        self._ctrl._publishFrame(CameraFrame(np.zeros((5, 4)), counter=2))
+        self.assertEqual([], self._ctrl._accumulators)
+        self._ctrl._publishFrame(CameraFrame(np.zeros((5, 4)), counter=3))
+        self.assertEqual(3, self._rpcHandler.getLastPublished(
+            self._publisherSocket).counter())
+        self.assertRaises(ValueError, self._ctrl.getAccumulationResult,
+                          accumulationId)
+
+    def testMedianCubesAreLimited(self):
+        nFrames = FrameAccumulator.MAX_CUBE_BYTES // (
+            4 * self._camera.rows() * self._camera.cols()) + 1
+        self.assertRaises(ValueError, self._ctrl.startAccumulation,
+                          nFrames, FrameAccumulator.MEDIAN)
+        self._ctrl.startAccumulation(nFrames, FrameAccumulator.MEAN)
+
+    def testUncollectedAccumulationsExpire(self):
+        for _ in range(CameraController.MAX_ACCUMULATIONS):
+            self._ctrl.startAccumulation(1)
+        self.assertRaises(ValueError, self._ctrl.startAccumulation, 1)
+        self._ctrl._publishFrame(CameraFrame(np.zeros((3, 4))))
+        self._ctrl.ACCUMULATION_EXPIRY_SEC = -1
+        self._ctrl.startAccumulation(1)
+        self.assertEqual(1, len(self._ctrl._accumulations))
+
+    def testCancelAccumulation(self):
+        accumulationId = self._ctrl.startAccumulation(3)
+        self._ctrl.cancelAccumulation(accumulationId)
+        self.assertEqual([], self._ctrl._accumulators)
+        self.assertRaises(ValueError, self._ctrl.getAccumulationResult,
+                          accumulationId)
+
+    def testPyramidSlopesArePublished(self):
+        slopesSocket = MyPublisherSocket()
+        self._ctrl.stopFramePipeline()
+        self._ctrl = CameraController(
+            self._serverName, self._ports, self._camera,
+            self._replySocket, self._publisherSocket, self._statusSocket,
+            self._displaySocket, self._rpcHandler, slopesSocket=slopesSocket)
+        frame = np.zeros((20, 20))
+        frame[:, 10:] = 3
+        frame[:, :10] = 1
+        self._ctrl.enablePyramidSlopes(
+            [[15, 5], [15, 15], [5, 5], [5, 15]], 3)
+        self._ctrl._publishFrame(CameraFrame(frame, counter=4))
+        slopes = self._rpcHandler.getLastPublished(slopesSocket)
+        self.assertEqual(4, slopes.counter())
+        n = self._ctrl.getPyramidSlopesGeometry()['nSubapertures']
+        np.testing.assert_allclose(0.5, slopes.toNumpyArray()[:n])
+
+    def testShackHartmannCentroidsArePublished(self):
+        centroidsSocket = MyPublisherSocket()
+        self._ctrl.stopFramePipeline()
+        self._ctrl = CameraController(
+            self._serverName, self._ports, self._camera,
+            self._replySocket, self._publisherSocket, self._statusSocket,
+            self._displaySocket, self._rpcHandler,
+            centroidsSocket=centroidsSocket)
+        frame = np.zeros((8, 8))
+        frame[1, 3] = 7
+        self._ctrl.enableShackHartmann((0, 0), 4, (2, 2))
+        self._ctrl._publishFrame(CameraFrame(frame, counter=5))
+        centroids = self._rpcHandler.getLastPublished(centroidsSocket)
+        self.assertEqual(5, centroids.counter())
+        np.testing.assert_allclose([1.5, -0.5, 7],
+                                   centroids.toNumpyArray()[:, 0])
+
+    def testDisablePyramidSlopesKeepsCentroids(self):
+        slopesSocket = MyPublisherSocket()
+        centroidsSocket = MyPublisherSocket()
+        self._ctrl.stopFramePipeline()
+        self._ctrl = CameraController(
+            self._serverName, self._ports, self._camera,
+            self._replySocket, self._publisherSocket, self._statusSocket,
+            self._displaySocket, self._rpcHandler, slopesSocket=slopesSocket,
+            centroidsSocket=centroidsSocket)
+        self._ctrl.enablePyramidSlopes(
+            [[6, 2], [6, 6], [2, 2], [2, 6]], 1)
+        self._ctrl.enableShackHartmann((0, 0), 4, (2, 2))
+        self._ctrl.disablePyramidSlopes()
+        self.assertIsNone(self._ctrl.getPyramidSlopesGeometry())
+        frame = np.zeros((8, 8))
+        frame[1, 3] = 7
+        self._ctrl._publishFrame(CameraFrame(frame, counter=6))
+        self.assertEqual(6, self._rpcHandler.getLastPublished(
+            centroidsSocket).counter())
+        self.assertRaises(KeyError, self._rpcHandler.getLastPublished,
+                          slopesSocket)
+
+    def testDisplayFramesArePublishedOffThePublisherThread(self):
+        self._ctrl.setDisplayStream(targetSize=2, mode='rebin-mean')
+        self._ctrl._publishFrame(CameraFrame(np.ones((4, 6)), counter=9))
+
+        def _published():
+            frame = self._rpcHandler.getLastPublished(self._displaySocket)
+            self.assertEqual(9, frame.counter())
+            np.testing.assert_array_equal(np.ones((2, 3)),
+                                          frame.toNumpyArray())
+        Poller(2).check(ExecutionProbe(_published))
+        self.assertRaises(ValueError, self._ctrl.setDisplayStream, 'gui')
+
+    def testFramesAreWrittenInTheSharedFrameRing(self):
+        ring = SharedFrameRing.create('pysilico_ctrl_test_%d' % os.getpid(),
+                                      2, 1000)
+        notifySocket = MyNotifySocket()
+        self._ctrl.stopFramePipeline()
+        self._ctrl = CameraController(
+            self._serverName, self._ports, self._camera,
+            self._replySocket, self._publisherSocket, self._statusSocket,
+            self._displaySocket, self._rpcHandler,
+            sharedFrameRing=ring, ringNotifySocket=notifySocket)
+        self.assertEqual(2, self._ctrl.getSharedFrameRingInfo()['nSlots'])
+        self._ctrl._publishFrame(CameraFrame(np.full((3, 4), 5), counter=3))
+        slot, sequence, counter = SharedFrameRing.decodeNotification(
+            notifySocket.sent[-1])
+        array, _, _, _ = ring.readCopy(slot, sequence)
+        np.testing.assert_array_equal(np.full((3, 4), 5), array)
+        self.assertEqual(3, counter)
+
+    def testFramesArePublishedOnTheOutputStreams(self):
+        fullSocket = MyPublisherSocket()
+        decimatedSocket = MyPublisherSocket()
+        self._ctrl.stopFramePipeline()
+        self._ctrl = CameraController(
+            self._serverName, self._ports, self._camera,
+            self._replySocket, self._publisherSocket, self._statusSocket,
+            self._displaySocket, self._rpcHandler,
+            outputStreams=[OutputStream('full', fullSocket),
+                           OutputStream('logger', decimatedSocket, 2)])
+        for counter in range(3):
+            self._ctrl._publishFrame(
+                CameraFrame(np.full((3, 4), counter), counter=counter))
+            self.assertEqual(counter, self._rpcHandler.getLastPublished(
+                fullSocket).counter())
+            self.assertEqual(counter // 2 * 2, self._rpcHandler.
+                             getLastPublished(decimatedSocket).counter())
+        self.assertEqual(2, self._ctrl.getOutputStreams()['logger']['sent'])
+        self._ctrl.setOutputStreamRate('logger', 1)
+        self.assertEqual(1, self._ctrl.getOutputStreams()['logger'][
+            'decimation'])
+
+    def testApplyBatchRebuildsTheStatusOnce(self):
+        self._ctrl.step()
+        calls = []
+        getParameters = self._camera.getParameters
+        self._camera.getParameters = \
+            lambda: calls.append(1) or getParameters()
+        results = self._ctrl.applyBatch([
+            ('setExposureTime', (3.,)),
+            ('setFrameRate', [7.]),
+            ('setParameter', ('testParameter', 5))])
+        self.assertEqual([None, None, None], results)
+        self._ctrl.step()
+        status = self._rpcHandler.getLastPublished(self._statusSocket)
+        self.assertEqual(3., status.exposureTimeInMilliSec)
+        self.assertEqual(7., status.frameRate)
+        self.assertEqual(5, status.parameters['testParameter'])
+        self.assertEqual(1, len(calls))
+
+    def testApplyBatchChecksOperationsBeforeApplyingThem(self):
+        self.assertRaises(ValueError, self._ctrl.applyBatch,
+                          [('setExposureTime', (3.,)), ('terminate', ())])
+        self.assertNotEqual(3., self._camera.exposureTime())
+        self.assertFalse(self._ctrl.isTerminated())
+
+    def testApplyBatchStopsAtTheFirstFailure(self):
+        with self.assertRaises(RuntimeError) as cm:
+            self._ctrl.applyBatch([('setFrameRate', (7.,)),
+                                   ('setParameter', ('foo', 1)),
+                                   ('setExposureTime', (3.,))])
+        self.assertIn('operation 1', str(cm.exception))
+        self.assertEqual(7., self._camera.getFrameRate())
+        self.assertNotEqual(3., self._camera.exposureTime())
+
+    def testGetLatestFrame(self):
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 1)))
+        self._ctrl._publishFrame(CameraFrame(np.full((3, 4), 3), counter=4))
+        frame = self._ctrl.getLatestFrame()
+        self.assertEqual(4, frame.counter())
+        np.testing.assert_array_equal(np.full((3, 4), 2),
+                                      frame.toNumpyArray())
+        self.assertRaises(TimeoutError, self._ctrl.getLatestFrame, 4)
+
+    def testGetLatestFrameWaitsAtMostOneLoopPeriod(self):
+        self._ctrl._publishFrame(CameraFrame(np.full((3, 4), 3), counter=4))
+        t0 = time.time()
+        self.assertRaises(TimeoutError, self._ctrl.getLatestFrame, 4, 10.)
+        self.assertLess(time.time() - t0, 1.)
+
+    def testPublishedFramesCarryTimestamps(self):
+        self._ctrl.setDarkFrame(CameraFrame(np.full((3, 4), 1)))
+        frame = stampFrame(CameraFrame(np.full((3, 4), 3), counter=4),
+                           device=12.5, receive=time.monotonic())
+        self._ctrl._publishFrame(frame)
+        published = self._rpcHandler.getLastPublished(
+            self._publisherSocket)
+        timestamps = frameTimestamps(published)
+        self.assertEqual(12.5, timestamps['device'])
+        self.assertLessEqual(timestamps['receive'], timestamps['publish'])
+        self.assertEqual(timestamps,
+                         frameTimestamps(self._ctrl.getLatestFrame()))
+        histograms = self._ctrl.getLatencyHistograms()
+        self.assertEqual(1, histograms['total']['count'])
+        self.assertEqual(1, histograms['queue']['count'])
+        self._ctrl.resetLatencyHistograms()
+        self.assertEqual(0, self._ctrl.getLatencyHistograms()[
+            'processing']['count'])
+
+    def testCameraWithoutParameterCache(self):
+        self.assertEqual({}, self._ctrl.getParameterCacheStatistics())
+        self.assertRaises(Exception,
+                          self._ctrl.setParameterCacheTtl, 'gain', 1.)
+
+
     def testTerminate(self):
         self._camera.raiseExceptionOnDeinitialize(True)
         self._ctrl.terminate()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from test.test_helper import Poller, ExecutionProbe
+from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.display_streams import \
+    DisplayStream, DisplayStreams
+
+
+class MyTime():
+
+    def __init__(self):
+        self.now = 100.
+
+    def time(self):
+        return self.now
+
+
+class DisplayStreamTest(unittest.TestCase):
+
+    def setUp(self):
+        self._array = np.arange(60, dtype=np.uint16).reshape((6, 10))
+
+    def _reduce(self, mode, targetSize=3):
+        return DisplayStream('s', targetSize, 10, mode).reduce(
+            self._array, BufferPool())
+
+    def testSample(self):
+        res = self._reduce(DisplayStream.SAMPLE)
+        np.testing.assert_array_equal(self._array[::2, ::2], res)
+        self.assertEqual(np.uint16, res.dtype)
+
+    def testBlockReductions(self):
+        blocks = self._array.reshape(3, 2, 5, 2)
+        np.testing.assert_allclose(blocks.sum(axis=(1, 3)),
+                                   self._reduce(DisplayStream.REBIN_SUM))
+        np.testing.assert_allclose(blocks.mean(axis=(1, 3)),
+                                   self._reduce(DisplayStream.REBIN_MEAN))
+        res = self._reduce(DisplayStream.MAX_POOL)
+        np.testing.assert_array_equal(blocks.max(axis=(1, 3)), res)
+        self.assertEqual(np.uint16, res.dtype)
+
+    def testIncompleteBlocksAreDropped(self):
+        self._array = self._array[:5, :9]
+        self.assertEqual((2, 4), self._reduce(DisplayStream.MAX_POOL).shape)
+
+    def testSmallFramesAreNotReduced(self):
+        self.assertIs(self._array,
+                      self._reduce(DisplayStream.REBIN_MEAN, targetSize=8))
+
+    def testInvalidParameters(self):
+        self.assertRaises(ValueError, DisplayStream, 's', 0)
+        self.assertRaises(ValueError, DisplayStream, 's', 8, 0)
+        self.assertRaises(ValueError, DisplayStream, 's', 8, 1, 'foo')
+
+
+class DisplayStreamsTest(unittest.TestCase):
+
+    def setUp(self):
+        self._sent = []
+        self._time = MyTime()
+        self._streams = DisplayStreams(self._send, BufferPool(), self._time)
+        self._streams.start()
+
+    def tearDown(self):
+        self._streams.stop()
+
+    def _send(self, name, frame):
+        self._sent.append((name, frame.counter(),
+                           frame.toNumpyArray().shape))
+
+    def _waitSent(self, n):
+        def _sentAtLeast():
+            self.assertEqual(n, len(self._sent))
+        Poller(2).check(ExecutionProbe(_sentAtLeast))
+
+    def _offer(self, counter):
+        self._streams.offer(CameraFrame(np.zeros((512, 512)), counter))
+
+    def testStreamsHaveTheirOwnRateAndSize(self):
+        self._streams.setStream('slow', 128, 5)
+        self._offer(1)
+        self._waitSent(2)
+        self._time.now += 0.1
+        self._offer(2)
+        self._waitSent(3)
+        self.assertEqual(
+            sorted([('default', 1, (256, 256)), ('slow', 1, (128, 128))]),
+            sorted(self._sent[:2]))
+        self.assertEqual(('default', 2, (256, 256)), self._sent[2])
+
+    def testStreamsOfDroppedFramesAreNotMarkedPublished(self):
+        self._streams.stop()
+        self._streams = DisplayStreams(self._send, BufferPool(), self._time)
+        self._streams.setStream('slow', 128, 5)
+        self._offer(1)
+        self._streams.setStream('late', 64)
+        self._time.now += 0.1
+        self._offer(2)
+        self._streams.start()
+        self._waitSent(3)
+        self.assertEqual(
+            sorted([('default', 2, (256, 256)), ('late', 2, (64, 64)),
+                    ('slow', 2, (128, 128))]),
+            sorted(self._sent))
+        self._time.now += 0.1
+        self._offer(3)
+        self._waitSent(5)
+        self.assertEqual(
+            sorted([('default', 3, (256, 256)), ('late', 3, (64, 64))]),
+            sorted(self._sent[3:]))
+
+    def testDefaultStreamCannotBeRemoved(self):
+        self.assertRaises(ValueError, self._streams.removeStream,
+                          DisplayStreams.DEFAULT)
+        self._streams.setStream('a')
+        self._streams.removeStream('a')
+        self.assertEqual([DisplayStreams.DEFAULT],
+                         list(self._streams.getStreams().keys()))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.frame_accumulator import \
+    FrameAccumulator
+
+
+class FrameAccumulatorTest(unittest.TestCase):
+
+    def _accumulate(self, frames, mode):
+        acc = FrameAccumulator(len(frames), mode)
+        for frame in frames:
+            self.assertFalse(acc.isCompleted())
+            acc.add(frame)
+        self.assertTrue(acc.wait(0))
+        return acc.result()
+
+    def _frames(self):
+        return [np.full((2, 3), v, dtype=np.uint16) for v in (1, 2, 6)]
+
+    def testMeanAndSum(self):
+        np.testing.assert_allclose(
+            np.full((2, 3), 3.),
+            self._accumulate(self._frames(), FrameAccumulator.MEAN))
+        np.testing.assert_allclose(
+            np.full((2, 3), 9.),
+            self._accumulate(self._frames(), FrameAccumulator.SUM))
+
+    def testMedian(self):
+        np.testing.assert_allclose(
+            np.full((2, 3), 2.),
+            self._accumulate(self._frames(), FrameAccumulator.MEDIAN))
+
+    def testSigmaClipRejectsOutliers(self):
+        frames = [np.full((2, 3), 10.) + (i % 2) for i in range(20)]
+        frames[7][1, 2] = 1000.
+        res = self._accumulate(frames, FrameAccumulator.SIGMA_CLIP)
+        np.testing.assert_allclose(np.full((2, 3), 10.5), res, atol=0.03)
+        self.assertEqual(np.float64, res.dtype)
+
+    def testResultBeforeCompletionRaises(self):
+        acc = FrameAccumulator(2)
+        acc.add(np.zeros((2, 2)))
+        self.assertFalse(acc.wait(0))
+        self.assertRaises(RuntimeError, acc.result)
+
+    def testShapeChangeIsAnError(self):
+        acc = FrameAccumulator(3)
+        acc.add(np.zeros((2, 2)))
+        acc.add(np.zeros((4, 4)))
+        self.assertTrue(acc.isCompleted())
+        self.assertRaises(ValueError, acc.result)
+
+    def testCubeSizeIsLimited(self):
+        nFrames = FrameAccumulator.MAX_CUBE_BYTES // (4 * 100) + 1
+        self.assertRaises(ValueError, FrameAccumulator, nFrames,
+                          FrameAccumulator.MEDIAN, frameShape=(10, 10))
+        FrameAccumulator(nFrames, FrameAccumulator.SUM, frameShape=(10, 10))
+        acc = FrameAccumulator(nFrames, FrameAccumulator.MEDIAN)
+        acc.add(np.zeros((10, 10)))
+        self.assertTrue(acc.isCompleted())
+        self.assertRaises(ValueError, acc.result)
+
+    def testFailCompletesWithTheError(self):
+        acc = FrameAccumulator(3)
+        acc.fail(MemoryError('no memory'))
+        self.assertTrue(acc.wait(0))
+        self.assertIsNotNone(acc.completionTime())
+        self.assertRaises(MemoryError, acc.result)
+
+    def testInvalidArguments(self):
+        self.assertRaises(ValueError, FrameAccumulator, 0)
+        self.assertRaises(ValueError, FrameAccumulator, 2, 'foo')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.frame_corrector import FrameCorrector
+
+
+class FrameCorrectorTest(unittest.TestCase):
+
+    def setUp(self):
+        self._corrector = FrameCorrector(BufferPool())
+        self._raw = np.array([[0, 5], [10, 4000]], dtype=np.uint16)
+        self._dark = np.array([[2, 2], [2, 2]], dtype=np.uint16)
+
+    def testWithoutCalibrationTheRawFrameIsReturned(self):
+        self.assertIs(self._raw, self._corrector.correct(self._raw))
+
+    def testUnsignedSubtractionSaturatesAtZero(self):
+        self._corrector.setDarkFrame(self._dark)
+        res = self._corrector.correct(self._raw)
+        self.assertEqual(np.uint16, res.dtype)
+        np.testing.assert_array_equal([[0, 3], [8, 3998]], res)
+
+    def testFloatDarkDoesNotUpcastTheOutput(self):
+        self._corrector.setDarkFrame(self._dark.astype(np.float64) + 0.4)
+        res = self._corrector.correct(self._raw)
+        self.assertEqual(np.uint16, res.dtype)
+        np.testing.assert_array_equal([[0, 3], [8, 3998]], res)
+
+    def testSignedOutputKeepsNegativeValues(self):
+        self._corrector.setOutputDtype('int32')
+        self._corrector.setDarkFrame(self._dark)
+        res = self._corrector.correct(self._raw)
+        self.assertEqual(np.int32, res.dtype)
+        np.testing.assert_array_equal([[-2, 3], [8, 3998]], res)
+
+    def testFloatOutputWithoutDarkConvertsTheFrame(self):
+        self._corrector.setOutputDtype(np.float32)
+        res = self._corrector.correct(self._raw)
+        self.assertEqual(np.float32, res.dtype)
+        np.testing.assert_array_equal(self._raw, res)
+
+    def testDarkPlaneIsComputedOnce(self):
+        self._corrector.setDarkFrame(self._dark)
+        self._corrector.correct(self._raw)
+        plane = self._corrector._darkPlane
+        self._corrector.correct(self._raw)
+        self.assertIs(plane, self._corrector._darkPlane)
+
+    def testDarkPlaneIsBuiltWhenTheDarkIsSet(self):
+        self._corrector.setSensorDtype(np.uint16)
+        self._corrector.setDarkFrame(self._dark.astype(np.float64))
+        plane = self._corrector._darkPlane
+        self.assertEqual(np.uint16, plane.dtype)
+        self._corrector.correct(self._raw)
+        self.assertIs(plane, self._corrector._darkPlane)
+        self._corrector.setFlatFrame(np.ones((2, 2)))
+        self.assertEqual(np.float32, self._corrector._darkPlane.dtype)
+
+    def testDarkWithWrongShapeIsIgnored(self):
+        self._corrector.setDarkFrame(np.zeros((3, 3)))
+        self.assertIs(self._raw, self._corrector.correct(self._raw))
+
+    def testFlatFieldGainIsApplied(self):
+        self._corrector.setDarkFrame(self._dark)
+        self._corrector.setFlatFrame([[1., 1.], [2., 4.]])
+        res = self._corrector.correct(self._raw)
+        self.assertEqual(np.uint16, res.dtype)
+        np.testing.assert_array_equal([[0, 6], [8, 1999]], res)
+
+    def testBadPixelsAreReplacedByTheMeanOfGoodNeighbours(self):
+        raw = np.arange(16, dtype=np.uint16).reshape((4, 4))
+        mask = np.zeros((4, 4), dtype=bool)
+        mask[1, 1] = True
+        mask[0, 0] = True
+        mask[3, 3] = True
+        self._corrector.setOutputDtype(np.float32)
+        self._corrector.setBadPixelMask(mask)
+        res = self._corrector.correct(raw)
+        goodAround11 = [1, 2, 4, 6, 8, 9, 10]
+        self.assertAlmostEqual(np.mean(goodAround11), res[1, 1], places=5)
+        self.assertAlmostEqual(np.mean([1, 4]), res[0, 0], places=5)
+        self.assertAlmostEqual(np.mean([10, 11, 14]), res[3, 3], places=5)
+        unmasked = ~mask
+        np.testing.assert_array_equal(raw[unmasked], res[unmasked])
+
+    def testFusedKernelClipsIntegerOutput(self):
+        self._corrector.setFlatFrame([[1., 1.], [1., 0.01]])
+        res = self._corrector.correct(self._raw)
+        self.assertEqual(np.uint16, res.dtype)
+        self.assertEqual(65535, res[1, 1])
+
+    def testCorrectionTimingIsCounted(self):
+        self._corrector.correct(self._raw)
+        self.assertEqual(0, self._corrector.getTiming()['correctedFrames'])
+        self._corrector.setDarkFrame(self._dark)
+        self._corrector.correct(self._raw)
+        self._corrector.correct(self._raw)
+        timing = self._corrector.getTiming()
+        self.assertEqual(2, timing['correctedFrames'])
+        self.assertTrue(timing['maxUs'] >= timing['meanUs'])
+
+    def testUnsupportedOutputDtype(self):
+        self.assertRaises(ValueError, self._corrector.setOutputDtype,
+                          np.int8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python
+import threading
+import unittest
+from test.test_helper import Poller, ExecutionProbe
+from pysilico_server.camera_controller.frame_dispatcher import \
+    FrameDispatcher
+
+
+class FrameDispatcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self._published = []
+        self._gate = threading.Event()
+        self._gate.set()
+
+    def tearDown(self):
+        self._gate.set()
+        self._dispatcher.stop()
+
+    def _publish(self, frame):
+        self._gate.wait()
+        self._published.append(frame)
+
+    def _createDispatcher(self, queueSize, policy):
+        self._dispatcher = FrameDispatcher(self._publish, queueSize, policy)
+        self._dispatcher.start()
+
+    def _waitPublished(self, nFrames):
+        def _publishedAtLeast():
+            self.assertTrue(len(self._published) >= nFrames)
+        Poller(2).check(ExecutionProbe(_publishedAtLeast))
+
+    def _waitQueueLength(self, length):
+        def _queueLengthIs():
+            self.assertEqual(length, self._dispatcher.queueLength())
+        Poller(2).check(ExecutionProbe(_queueLengthIs))
+
+    def testFramesArePublishedInOrder(self):
+        self._createDispatcher(16, FrameDispatcher.DROP_OLDEST)
+        for i in range(10):
+            self._dispatcher.push(i)
+        self._waitPublished(10)
+        self.assertEqual(list(range(10)), self._published)
+        stats = self._dispatcher.getStatistics()
+        self.assertEqual(10, stats['pushedFrames'])
+        self.assertEqual(0, stats['droppedFrames'])
+
+    def _fillWhilePublisherIsStuck(self, policy):
+        self._createDispatcher(2, policy)
+        self._gate.clear()
+        self._dispatcher.push(0)
+        self._waitQueueLength(0)
+        for i in range(1, 5):
+            self._dispatcher.push(i)
+        self._gate.set()
+        self._waitPublished(3)
+
+    def testDropOldest(self):
+        self._fillWhilePublisherIsStuck(FrameDispatcher.DROP_OLDEST)
+        self.assertEqual([0, 3, 4], self._published)
+        self.assertEqual(2, self._dispatcher.getStatistics()['droppedOldest'])
+
+    def testDropNewest(self):
+        self._fillWhilePublisherIsStuck(FrameDispatcher.DROP_NEWEST)
+        self.assertEqual([0, 1, 2], self._published)
+        self.assertEqual(2, self._dispatcher.getStatistics()['droppedNewest'])
+
+    def testBlockWaitsForRoom(self):
+        self._createDispatcher(1, FrameDispatcher.BLOCK)
+        self._gate.clear()
+        self._dispatcher.push(0)
+        self._waitQueueLength(0)
+        self._dispatcher.push(1)
+        pusher = threading.Thread(target=self._dispatcher.push, args=(2,))
+        pusher.start()
+        pusher.join(0.1)
+        self.assertTrue(pusher.is_alive())
+        self._gate.set()
+        pusher.join(2)
+        self.assertFalse(pusher.is_alive())
+        self._waitPublished(3)
+        self.assertEqual([0, 1, 2], self._published)
+        self.assertEqual(0, self._dispatcher.getStatistics()['droppedFrames'])
+
+    def testPublishErrorsAreCountedAndDoNotStopTheThread(self):
+        def _failOnOdd(frame):
+            if frame % 2:
+                raise Exception('odd frame')
+            self._published.append(frame)
+        self._dispatcher = FrameDispatcher(_failOnOdd, 8)
+        self._dispatcher.start()
+        for i in range(4):
+            self._dispatcher.push(i)
+        self._waitPublished(2)
+        self.assertEqual([0, 2], self._published)
+        self.assertEqual(2, self._dispatcher.getStatistics()['publishErrors'])
+
+    def testInvalidPolicyIsRejected(self):
+        self._createDispatcher(2, FrameDispatcher.DROP_OLDEST)
+        self.assertRaises(ValueError, self._dispatcher.setDropPolicy, 'foo')
+
+
+if __name__ == "__main__":
+    unittest.main()
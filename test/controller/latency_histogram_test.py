@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+import unittest
+from pysilico_server.camera_controller.latency_histogram import \
+    LatencyHistogram, FrameLatencies
+
+
+class LatencyHistogramTest(unittest.TestCase):
+
+    def setUp(self):
+        self._histogram = LatencyHistogram()
+
+    def testEmpty(self):
+        stats = self._histogram.getStatistics()
+        self.assertEqual(0, stats['count'])
+        self.assertIsNone(stats['meanSec'])
+        self.assertIsNone(stats['p99Sec'])
+
+    def testStatistics(self):
+        for _ in range(98):
+            self._histogram.record(1e-3)
+        self._histogram.record(0.1)
+        self._histogram.record(0.2)
+        stats = self._histogram.getStatistics()
+        self.assertEqual(100, stats['count'])
+        self.assertEqual(1e-3, stats['minSec'])
+        self.assertEqual(0.2, stats['maxSec'])
+        self.assertAlmostEqual((0.098 + 0.3) / 100, stats['meanSec'])
+        self.assertTrue(1e-3 <= stats['p50Sec'] < 1.3e-3)
+        self.assertEqual(stats['p50Sec'], stats['p90Sec'])
+        self.assertTrue(0.1 <= stats['p99Sec'] < 0.13)
+        self.assertEqual(len(stats['edgesSec']) + 1, len(stats['counts']))
+        self.assertEqual(100, sum(stats['counts']))
+
+    def testValuesOutOfRange(self):
+        self._histogram.record(1e-9)
+        self._histogram.record(100.)
+        counts = self._histogram.getStatistics()['counts']
+        self.assertEqual(1, counts[0])
+        self.assertEqual(1, counts[-1])
+
+    def testReset(self):
+        self._histogram.record(1e-3)
+        self._histogram.reset()
+        self.assertEqual(0, self._histogram.getStatistics()['count'])
+
+
+class FrameLatenciesTest(unittest.TestCase):
+
+    def testRecordFromTimestamps(self):
+        latencies = FrameLatencies()
+        latencies.record({'receive': 10., 'publish': 10.003}, 10.001)
+        stats = latencies.getStatistics()
+        self.assertAlmostEqual(0.001, stats[FrameLatencies.QUEUE]['maxSec'])
+        self.assertAlmostEqual(0.002,
+                               stats[FrameLatencies.PROCESSING]['maxSec'])
+        self.assertAlmostEqual(0.003, stats[FrameLatencies.TOTAL]['maxSec'])
+
+    def testFramesWithoutReceiveTimestamp(self):
+        latencies = FrameLatencies()
+        latencies.record({'publish': 10.003}, 10.001)
+        stats = latencies.getStatistics()
+        self.assertEqual(1, stats[FrameLatencies.PROCESSING]['count'])
+        self.assertEqual(0, stats[FrameLatencies.TOTAL]['count'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+import threading
+import time
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.latest_frame import LatestFrameSlot
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+class LatestFrameSlotTest(unittest.TestCase):
+
+    def setUp(self):
+        self._slot = LatestFrameSlot()
+
+    def testNoFrameYet(self):
+        self.assertIsNone(self._slot.latestCounter())
+        self.assertRaises(TimeoutError, self._slot.get)
+        self.assertRaises(TimeoutError, self._slot.get, None, 0.01)
+
+    def testReturnsACopyOfReusedBuffers(self):
+        buffer = np.full((3, 4), 1, dtype=np.uint16)
+        self._slot.update(cameraFrameFromArray(buffer, 1))
+        buffer[:] = 2
+        self._slot.update(cameraFrameFromArray(buffer, 2))
+        buffer[:] = 3
+        frame = self._slot.get()
+        self.assertEqual(2, frame.counter())
+        np.testing.assert_array_equal(np.full((3, 4), 2), frame.toNumpyArray())
+        self._slot.update(cameraFrameFromArray(buffer, 3))
+        self._slot.update(cameraFrameFromArray(buffer, 4))
+        np.testing.assert_array_equal(np.full((3, 4), 2), frame.toNumpyArray())
+
+    def testOwnedFramesAreNotCopied(self):
+        frame = cameraFrameFromArray(np.zeros((3, 4)), 5)
+        self._slot.update(frame, ownsBuffer=True)
+        self.assertIs(frame, self._slot.get())
+
+    def testShapeChanges(self):
+        self._slot.update(cameraFrameFromArray(np.zeros((3, 4)), 1))
+        self._slot.update(cameraFrameFromArray(np.zeros((2, 2)), 2))
+        self._slot.update(cameraFrameFromArray(np.ones((2, 2)), 3))
+        np.testing.assert_array_equal(np.ones((2, 2)),
+                                      self._slot.get().toNumpyArray())
+
+    def testWaitsForANewerFrame(self):
+        self._slot.update(cameraFrameFromArray(np.zeros((3, 4)), 1))
+        self.assertEqual(1, self._slot.get(0).counter())
+        self.assertRaises(TimeoutError, self._slot.get, 1, 0.01)
+
+        def publish():
+            time.sleep(0.05)
+            self._slot.update(cameraFrameFromArray(np.ones((3, 4)), 2))
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        frame = self._slot.get(1, timeoutSec=2)
+        publisher.join()
+        self.assertEqual(2, frame.counter())
+        np.testing.assert_array_equal(np.ones((3, 4)), frame.toNumpyArray())
+
+    def testCopiesAlwaysOvertakenRaise(self):
+
+        class RewrittenAtEveryRead(list):
+
+            def __getitem__(self, i):
+                self[i] = list.__getitem__(self, i) + 2
+                return list.__getitem__(self, i)
+
+        self._slot.update(cameraFrameFromArray(np.zeros((3, 4)), 1))
+        self._slot._generations = RewrittenAtEveryRead(
+            self._slot._generations)
+        self.assertRaises(TimeoutError, self._slot.get)
+
+    def testReadersNeverSeeTornFrames(self):
+        stop = threading.Event()
+
+        def publish():
+            buffer = np.zeros((64, 64), dtype=np.int32)
+            counter = 0
+            while not stop.is_set():
+                counter += 1
+                buffer[:] = counter
+                self._slot.update(cameraFrameFromArray(buffer, counter))
+        publisher = threading.Thread(target=publish)
+        publisher.start()
+        try:
+            for _ in range(200):
+                try:
+                    frame = self._slot.get(timeoutSec=2)
+                except TimeoutError:
+                    continue
+                np.testing.assert_array_equal(
+                    frame.counter(), frame.toNumpyArray())
+        finally:
+            stop.set()
+            publisher.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
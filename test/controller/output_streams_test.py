@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from test.test_helper import Poller, ExecutionProbe
+from pysilico_server.camera_controller.output_streams import \
+    OutputStream, OutputStreams
+from pysilico_server.utils.frame_codec import FrameCodec, FrameDecoder
+from pysilico_server.utils.frame_protocol import FrameProtocol
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+class MyTime():
+
+    def __init__(self):
+        self.now = 10.
+
+    def time(self):
+        return self.now
+
+
+class MySocket():
+
+    def __init__(self):
+        self.messages = []
+
+    def send_multipart(self, parts, flags=0, copy=True):
+        self.messages.append(parts)
+
+
+class OutputStreamsTest(unittest.TestCase):
+
+    def setUp(self):
+        self._time = MyTime()
+        self._sent = []
+
+    def _send(self, socket, frame, ownsBuffer):
+        self._sent.append((socket, frame))
+
+    def _create(self, *streams):
+        return OutputStreams(self._send, streams, self._time)
+
+    def _publish(self, streams, nFrames, intervalSec=0.01):
+        for i in range(nFrames):
+            streams.publish(i)
+            self._time.now += intervalSec
+
+    def testFullRate(self):
+        streams = self._create(OutputStream('full', 'sock'))
+        self._publish(streams, 5)
+        self.assertEqual([('sock', i) for i in range(5)], self._sent)
+
+    def testDecimation(self):
+        streams = self._create(OutputStream('logger', 'sock', decimation=3))
+        self._publish(streams, 7)
+        self.assertEqual([0, 3, 6], [frame for _, frame in self._sent])
+        self.assertEqual({'decimation': 3, 'maxRateHz': None,
+                          'frames': 7, 'sent': 3},
+                         streams.getStreams()['logger'])
+
+    def testMaxRate(self):
+        streams = self._create(OutputStream('gui', 'sock', maxRateHz=4))
+        self._publish(streams, 20, intervalSec=0.0625)
+        self.assertEqual(list(range(0, 20, 4)),
+                         [frame for _, frame in self._sent])
+
+    def testStreamsAreIndependent(self):
+        streams = self._create(OutputStream('full', 'a'),
+                               OutputStream('logger', 'b', decimation=2))
+        self._publish(streams, 4)
+        self.assertEqual(4, len([s for s, _ in self._sent if s == 'a']))
+        self.assertEqual(2, len([s for s, _ in self._sent if s == 'b']))
+
+    def testSetRate(self):
+        streams = self._create(OutputStream('logger', 'sock', decimation=5))
+        streams.setRate('logger', 1)
+        self._publish(streams, 3)
+        self.assertEqual(3, len(self._sent))
+        self.assertRaises(KeyError, streams.setRate, 'foo', 2)
+        self.assertRaises(ValueError, streams.setRate, 'logger', 0)
+        self.assertRaises(ValueError, streams.setRate, 'logger', 1, -1)
+
+    def testCompressedStreamsAreEncodedByAWorker(self):
+        socket = MySocket()
+        streams = self._create(OutputStream(
+            'remote', socket, codec=FrameCodec.fromName('zlib+delta')))
+        streams.start()
+        self.addCleanup(streams.stop)
+        buffer = np.arange(12, dtype=np.uint16).reshape(3, 4)
+        streams.publish(cameraFrameFromArray(buffer, 7))
+        buffer[:] = 0
+
+        def _sent():
+            self.assertEqual(1, streams.getStreams()['remote'][
+                'compressorQueue']['publishedFrames'])
+        Poller(2).check(ExecutionProbe(_sent))
+        frame, header = FrameProtocol.decode(socket.messages[0],
+                                             FrameDecoder())
+        self.assertEqual('zlib+delta', header['codec'])
+        np.testing.assert_array_equal(
+            np.arange(12).reshape(3, 4), frame.toNumpyArray())
+        self.assertEqual([], self._sent)
+        stats = streams.getStreams()['remote']
+        self.assertEqual(1, stats['compression']['frames'])
+        self.assertEqual(1, stats['compressorQueue']['publishedFrames'])
+
+    def testInvalidStreams(self):
+        self.assertRaises(ValueError, OutputStream, '', 'sock')
+        self.assertRaises(ValueError, self._create,
+                          OutputStream('a', 'sock'), OutputStream('a', 'b'))
+        self.assertFalse(self._create().hasStreams())
+
+
+if __name__ == "__main__":
+    unittest.main()
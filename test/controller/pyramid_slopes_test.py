@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.pyramid_slopes import \
+    PyramidSlopeComputer
+from pysilico_server.devices.simulated_camera import \
+    SimulatedPyramidWfsCamera
+
+
+class PyramidSlopeComputerTest(unittest.TestCase):
+
+    CENTERS = np.array([[30, 10], [30, 30], [10, 10], [10, 30]])
+    RADIUS = 6
+
+    def _frame(self, pupils, dtype=np.uint16):
+        frame = np.zeros((40, 40), dtype=dtype)
+        r = self.RADIUS
+        for (y, x), pupil in zip(self.CENTERS, pupils):
+            frame[y - r: y + r, x - r: x + r] = pupil
+        return frame
+
+    def testSlopesFromUniformPupils(self):
+        computer = PyramidSlopeComputer(BufferPool(), self.CENTERS,
+                                        self.RADIUS)
+        slopes = computer.compute(self._frame([1, 3, 1, 3]))
+        n = computer.getGeometry()['nSubapertures']
+        self.assertEqual((2 * n,), slopes.shape)
+        self.assertEqual(np.float32, slopes.dtype)
+        np.testing.assert_allclose(0.5, slopes[:n])
+        np.testing.assert_allclose(0., slopes[n:])
+
+    def testSlopesMatchTheSimulatorModel(self):
+        cam = SimulatedPyramidWfsCamera()
+        self.addCleanup(cam.deinitialize)
+        cam.setScaleInMeterPerPixel(1.)
+        cam.setSlopeSaturationInRadians(1.)
+        wf = np.tile(0.3 * np.arange(2 * self.RADIUS), (2 * self.RADIUS, 1))
+        pupils = cam._pupilImagesFromWavefront(wf) * 1000
+        computer = PyramidSlopeComputer(BufferPool(), self.CENTERS,
+                                        self.RADIUS)
+        frame = self._frame(pupils, np.float32)
+        slopes = computer.compute(frame)
+        n = computer.getGeometry()['nSubapertures']
+        np.testing.assert_allclose(2. / np.pi * np.arcsin(0.3),
+                                   slopes[:n], rtol=1e-4)
+        np.testing.assert_allclose(0., slopes[n:], atol=1e-5)
+
+    def testGlobalNormalizationAndDarkPixels(self):
+        computer = PyramidSlopeComputer(BufferPool(), self.CENTERS,
+                                        self.RADIUS,
+                                        PyramidSlopeComputer.GLOBAL)
+        frame = self._frame([0, 4, 0, 4])
+        frame[30, 30] = 0
+        frame[10, 30] = 0
+        slopes = computer.compute(frame)
+        self.assertTrue(np.all(np.isfinite(slopes)))
+        self.assertEqual(0, slopes.min())
+
+    def testBuffersAreReused(self):
+        pool = BufferPool()
+        computer = PyramidSlopeComputer(pool, self.CENTERS, self.RADIUS)
+        first = computer.compute(self._frame([1, 1, 1, 1]))
+        second = computer.compute(self._frame([1, 2, 1, 2]))
+        self.assertIs(first, second)
+
+    def testPupilsOutsideTheFrame(self):
+        computer = PyramidSlopeComputer(BufferPool(), self.CENTERS + 8,
+                                        self.RADIUS)
+        self.assertIsNone(computer.compute(self._frame([1, 1, 1, 1])))
+
+    def testInvalidGeometry(self):
+        self.assertRaises(ValueError, PyramidSlopeComputer, BufferPool(),
+                          np.zeros((3, 2)), 5)
+        self.assertRaises(ValueError, PyramidSlopeComputer, BufferPool(),
+                          self.CENTERS, 5, 'foo')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.roi_publisher import RoiPublisher
+from pysilico_server.utils.frame_protocol import FrameProtocol
+
+
+class MySocket():
+
+    def __init__(self):
+        self.sent = []
+
+    def send_multipart(self, parts, flags=0, copy=True):
+        self.sent.append((bytes(parts[0]).decode(),
+                          FrameProtocol.decode(parts)[0]))
+
+
+class RoiPublisherTest(unittest.TestCase):
+
+    def setUp(self):
+        self._socket = MySocket()
+        self._pool = BufferPool()
+        self._publisher = RoiPublisher(self._socket, self._pool)
+        self._frame = CameraFrame(np.arange(48).reshape((6, 8)), counter=7)
+
+    def testRectangleIsPublishedWithItsTopic(self):
+        self._publisher.setRectangle('pupil', 1, 2, 3, 4)
+        self._publisher.publish(self._frame)
+        topic, roiFrame = self._socket.sent[0]
+        self.assertEqual('pupil', topic)
+        self.assertEqual(7, roiFrame.counter())
+        np.testing.assert_array_equal(
+            self._frame.toNumpyArray()[1:4, 2:6], roiFrame.toNumpyArray())
+
+    def testMaskIsPublishedAsVector(self):
+        mask = np.zeros((6, 8), dtype=bool)
+        mask[2, 3] = mask[4, 1] = True
+        self._publisher.setMask('valid', mask)
+        self._publisher.publish(self._frame)
+        _, roiFrame = self._socket.sent[0]
+        np.testing.assert_array_equal([19, 33], roiFrame.toNumpyArray())
+        self._publisher.publish(self._frame)
+        self.assertEqual(1, self._pool.getStatistics()['allocations'])
+
+    def testRoisNotFittingTheFrameAreSkipped(self):
+        self._publisher.setRectangle('big', 0, 0, 10, 10)
+        self._publisher.setMask('wrongShape', np.ones((3, 3)))
+        self._publisher.setRectangle('ok', 0, 0, 2, 2)
+        self._publisher.publish(self._frame)
+        self.assertEqual(['ok'], [t for t, _ in self._socket.sent])
+
+    def testRemoveAndList(self):
+        self._publisher.setRectangle('a', 0, 0, 2, 2)
+        self._publisher.setMask('b', np.ones((6, 8)))
+        rois = self._publisher.getRois()
+        self.assertEqual((0, 0, 2, 2), rois['a']['rectangle'])
+        self.assertEqual(48, rois['b']['pixels'])
+        self._publisher.remove('a')
+        self.assertEqual(['b'], list(self._publisher.getRois().keys()))
+
+    def testInvalidRois(self):
+        self.assertRaises(ValueError, self._publisher.setRectangle,
+                          'a', 0, 0, 0, 2)
+        self.assertRaises(ValueError, self._publisher.setMask,
+                          'a', np.zeros((2, 2)))
+        self.assertRaises(ValueError, self._publisher.setRectangle,
+                          '', 0, 0, 1, 1)
+
+    def testWithoutSocketRoisCannotBeSet(self):
+        publisher = RoiPublisher(None, self._pool)
+        self.assertRaises(ValueError, publisher.setRectangle,
+                          'a', 0, 0, 1, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
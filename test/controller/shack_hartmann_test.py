@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+from pysilico_server.camera_controller.buffer_pool import BufferPool
+from pysilico_server.camera_controller.shack_hartmann import \
+    ShackHartmannCentroider
+
+
+class ShackHartmannCentroiderTest(unittest.TestCase):
+
+    def _spots(self, shape, origin, subapSize, spots):
+        frame = np.zeros(shape, dtype=np.uint16)
+        for (iy, ix), (dy, dx), value in spots:
+            y = origin[0] + iy * subapSize + dy
+            x = origin[1] + ix * subapSize + dx
+            frame[y, x] = value
+        return frame
+
+    def testCentroidsOfSingleSpots(self):
+        centroider = ShackHartmannCentroider(BufferPool(), (1, 2), 4, (2, 3))
+        frame = self._spots((12, 16), (1, 2), 4,
+                            [((0, 0), (0, 3), 10),
+                             ((1, 2), (2, 1), 20)])
+        res = centroider.compute(frame)
+        self.assertEqual((3, 6), res.shape)
+        self.assertEqual(np.float32, res.dtype)
+        np.testing.assert_allclose([1.5, 0, 0, 0, 0, -0.5], res[0])
+        np.testing.assert_allclose([-1.5, 0, 0, 0, 0, 0.5], res[1])
+        np.testing.assert_allclose([10, 0, 0, 0, 0, 20], res[2])
+
+    def testThresholdAndWindow(self):
+        frame = np.full((8, 8), 5, dtype=np.uint16)
+        frame[2, 3] = 25
+        plain = ShackHartmannCentroider(BufferPool(), (0, 0), 8, 1)
+        thresholded = ShackHartmannCentroider(BufferPool(), (0, 0), 8, 1,
+                                              threshold=5)
+        self.assertLess(abs(plain.compute(frame)[0, 0]), 0.1)
+        np.testing.assert_allclose([[-0.5], [-1.5], [20]],
+                                   thresholded.compute(frame))
+        windowed = ShackHartmannCentroider(BufferPool(), (0, 0), 8, 1,
+                                           windowRadius=2)
+        self.assertEqual(12, windowed.getGeometry()['pixelsPerSubap'])
+
+    def testMatchesPerSubapertureLoop(self):
+        rng = np.random.default_rng(1)
+        frame = rng.integers(0, 1000, (50, 60)).astype(np.uint16)
+        centroider = ShackHartmannCentroider(BufferPool(), (3, 4), 6, (7, 9))
+        res = centroider.compute(frame)
+        y, x = np.mgrid[0:6, 0:6] - 2.5
+        for i in range(7):
+            for j in range(9):
+                sub = frame[3 + 6 * i: 9 + 6 * i,
+                            4 + 6 * j: 10 + 6 * j].astype(float)
+                k = i * 9 + j
+                self.assertAlmostEqual((sub * x).sum() / sub.sum(),
+                                       res[0, k], places=4)
+                self.assertAlmostEqual((sub * y).sum() / sub.sum(),
+                                       res[1, k], places=4)
+
+    def testGridOutsideTheFrame(self):
+        centroider = ShackHartmannCentroider(BufferPool(), (0, 0), 8, 3)
+        self.assertIsNone(centroider.compute(np.zeros((16, 32))))
+
+    def testInvalidGeometry(self):
+        self.assertRaises(ValueError, ShackHartmannCentroider, BufferPool(),
+                          (0, 0), 0, 3)
+        self.assertRaises(ValueError, ShackHartmannCentroider, BufferPool(),
+                          (0, 0), 4, 3, windowRadius=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
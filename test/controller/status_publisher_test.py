@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+import unittest
+from pysilico.types.camera_status import CameraStatus
+from pysilico_server.camera_controller.status_publisher import \
+    StatusPublisher
+
+
+class MyTime():
+
+    def __init__(self):
+        self.now = 10.
+
+    def time(self):
+        return self.now
+
+
+class StatusPublisherTest(unittest.TestCase):
+
+    def setUp(self):
+        self._published = []
+        self._parameters = {'temperature': 20}
+        self._time = MyTime()
+        self._status = CameraStatus('cam', 4, 3, 'uint16', 1, 10., 100.,
+                                    dict(self._parameters))
+
+    def _create(self, heartbeatSec, parameterPollSec=None):
+        return StatusPublisher(self._published.append,
+                               lambda: dict(self._parameters),
+                               self._time, heartbeatSec, parameterPollSec)
+
+    def testDefaultPublishesAtEveryCall(self):
+        publisher = self._create(0)
+        publisher.publish(self._status)
+        publisher.publish(self._status)
+        self.assertEqual(2, len(self._published))
+
+    def testPublishesOnChangeAndHeartbeat(self):
+        publisher = self._create(1.)
+        publisher.publish(self._status)
+        self._time.now += 0.5
+        publisher.publish(self._status)
+        self.assertEqual(1, len(self._published))
+        newStatus = CameraStatus('cam', 4, 3, 'uint16', 2, 10., 100.)
+        publisher.publish(newStatus)
+        self.assertIs(newStatus, self._published[-1])
+        self._time.now += 1.
+        publisher.publish(newStatus)
+        self.assertEqual(3, len(self._published))
+        stats = publisher.getStatistics()
+        self.assertEqual((2, 1), (stats['changes'], stats['heartbeats']))
+
+    def testParametersArePolledOnTheirSchedule(self):
+        publisher = self._create(1., parameterPollSec=5.)
+        self.assertIs(self._status, publisher.refreshParameters(self._status))
+        self._parameters['temperature'] = 25
+        self._time.now += 1
+        self.assertIs(self._status, publisher.refreshParameters(self._status))
+        self._time.now += 5
+        refreshed = publisher.refreshParameters(self._status)
+        self.assertEqual(25, refreshed.parameters['temperature'])
+        self.assertEqual(20, self._status.parameters['temperature'])
+        self.assertEqual(2, publisher.getStatistics()['parameterPolls'])
+
+    def testInvalidIntervals(self):
+        self.assertRaises(ValueError, self._create, -1)
+        self.assertRaises(ValueError, self._create, 1, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+import threading
+import time
+import unittest
+from pysilico_server.devices.frame_pacer import FramePacer
+
+
+class FramePacerTest(unittest.TestCase):
+
+    def testFramesFollowTheDeadlines(self):
+        pacer = FramePacer(1000.)
+        t0 = time.perf_counter()
+        for _ in range(200):
+            self.assertTrue(pacer.waitNext())
+        elapsed = time.perf_counter() - t0
+        self.assertAlmostEqual(0.199, elapsed, delta=0.02)
+        stats = pacer.getStatistics()
+        self.assertEqual(1000., stats['requestedFrameRate'])
+        self.assertEqual(200, stats['frames'])
+        self.assertAlmostEqual(1000., stats['achievedFrameRate'], delta=100)
+
+    def testWorkDoesNotLowerTheRate(self):
+        pacer = FramePacer(200.)
+        t0 = time.perf_counter()
+        for _ in range(40):
+            pacer.waitNext()
+            time.sleep(0.003)
+        self.assertLess(time.perf_counter() - t0, 0.25)
+
+    def testWithoutSpinning(self):
+        pacer = FramePacer(500., spinSec=0)
+        t0 = time.perf_counter()
+        for _ in range(50):
+            self.assertTrue(pacer.waitNext())
+        self.assertAlmostEqual(0.098, time.perf_counter() - t0, delta=0.02)
+
+    def testSlowLoopsSkipDeadlinesInsteadOfBursting(self):
+        pacer = FramePacer(1000., maxLagSec=0.01)
+        pacer.waitNext()
+        time.sleep(0.05)
+        pacer.waitNext()
+        # after the resync the next deadline is less than a period away:
+        # the two following ones take more than a period, no burst
+        t0 = time.perf_counter()
+        pacer.waitNext()
+        pacer.waitNext()
+        self.assertGreater(time.perf_counter() - t0, 0.001)
+        self.assertGreater(pacer.getStatistics()['missedFrames'], 40)
+
+    def testStop(self):
+        stopEvent = threading.Event()
+        pacer = FramePacer(1., stopEvent=stopEvent)
+        pacer.waitNext()
+        threading.Timer(0.05, stopEvent.set).start()
+        t0 = time.perf_counter()
+        self.assertFalse(pacer.waitNext())
+        self.assertLess(time.perf_counter() - t0, 0.5)
+
+    def testInvalidFrameRate(self):
+        self.assertRaises(ValueError, FramePacer, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+import unittest
+from pysilico_server.devices.parameter_cache import ParameterCache, \
+    cachedQuery, invalidatesCache
+
+
+class MyTime():
+
+    def __init__(self):
+        self.now = 10.
+
+    def time(self):
+        return self.now
+
+
+class MySlowCamera():
+
+    def __init__(self, timeMod):
+        self._parameterCache = ParameterCache(
+            {'temperatures': 2., 'gain': None}, timeMod=timeMod)
+        self.queries = {'temperatures': 0, 'gain': 0}
+        self._gain = 1
+        self._setPoint = -10
+
+    @cachedQuery('temperatures')
+    def _allTemperatures(self):
+        self.queries['temperatures'] += 1
+        return 25, self._setPoint
+
+    def temperature(self):
+        return self._allTemperatures()[0]
+
+    def temperatureSetPoint(self):
+        return self._allTemperatures()[1]
+
+    @invalidatesCache('temperatures')
+    def setTemperatureSetPoint(self, setPoint):
+        self._setPoint = setPoint
+
+    @cachedQuery('gain')
+    def gain(self):
+        self.queries['gain'] += 1
+        return self._gain
+
+    @invalidatesCache('gain')
+    def setGain(self, gain):
+        if gain < 1:
+            raise ValueError('gain must be at least 1')
+        self._gain = gain
+
+
+class ParameterCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self._time = MyTime()
+        self._cam = MySlowCamera(self._time)
+
+    def testOneQueryServesTheWholeBatch(self):
+        self.assertEqual(25, self._cam.temperature())
+        self.assertEqual(-10, self._cam.temperatureSetPoint())
+        self.assertEqual(1, self._cam.queries['temperatures'])
+
+    def testValuesExpireAfterTheirTtl(self):
+        self._cam.temperature()
+        self._time.now += 1.9
+        self._cam.temperature()
+        self.assertEqual(1, self._cam.queries['temperatures'])
+        self._time.now += 0.2
+        self._cam.temperature()
+        self.assertEqual(2, self._cam.queries['temperatures'])
+
+    def testNoneTtlNeverExpires(self):
+        self._cam.gain()
+        self._time.now += 1e6
+        self._cam.gain()
+        self.assertEqual(1, self._cam.queries['gain'])
+
+    def testSettersInvalidateTheirKeys(self):
+        self._cam.gain()
+        self._cam.temperature()
+        self._cam.setTemperatureSetPoint(-20)
+        self.assertEqual(-20, self._cam.temperatureSetPoint())
+        self.assertEqual(2, self._cam.queries['temperatures'])
+        self._cam.gain()
+        self.assertEqual(1, self._cam.queries['gain'])
+
+    def testFailingSetterInvalidatesToo(self):
+        self._cam.gain()
+        self.assertRaises(ValueError, self._cam.setGain, 0)
+        self._cam.gain()
+        self.assertEqual(2, self._cam.queries['gain'])
+
+    def testValueFetchedDuringInvalidationIsNotCached(self):
+        cache = self._cam._parameterCache
+
+        def fetch():
+            cache.invalidate('gain')
+            return 3
+
+        self.assertEqual(3, cache.get('gain', fetch))
+        self.assertEqual(1, self._cam.gain())
+        self.assertEqual(1, self._cam.queries['gain'])
+
+    def testInvalidateAll(self):
+        self._cam.gain()
+        self._cam.temperature()
+        self._cam._parameterCache.invalidate()
+        self._cam.gain()
+        self._cam.temperature()
+        self.assertEqual({'temperatures': 2, 'gain': 2}, self._cam.queries)
+
+    def testZeroTtlDisablesCaching(self):
+        self._cam._parameterCache.setTtl('gain', 0)
+        self._cam.gain()
+        self._cam.gain()
+        self.assertEqual(2, self._cam.queries['gain'])
+        self.assertRaises(ValueError,
+                          self._cam._parameterCache.setTtl, 'gain', -1)
+
+    def testStatistics(self):
+        self._cam.temperature()
+        self._cam.temperatureSetPoint()
+        self._cam.temperature()
+        stats = self._cam._parameterCache.getStatistics()
+        self.assertEqual({'temperatures': {'ttlSec': 2.,
+                                           'hits': 2,
+                                           'misses': 1}}, stats)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import numpy as np
+from astropy.io import fits
+from test.test_helper import Poller, ExecutionProbe
+from pysilico_server.devices.abstract_camera import CameraException
+from pysilico_server.devices.replay_camera import ReplayCamera
+from pysilico_server.utils.frame_utils import frameTimestamps
+
+
+class ReplayCameraTest(unittest.TestCase):
+
+    N_FRAMES = 5
+
+    def setUp(self):
+        self._folder = tempfile.mkdtemp()
+        self._cube = np.arange(self.N_FRAMES * 3 * 4,
+                               dtype=np.uint16).reshape(
+                                   (self.N_FRAMES, 3, 4))
+        self._cubePath = os.path.join(self._folder, 'cube.npy')
+        np.save(self._cubePath, self._cube)
+        self._frames = []
+        self._mutex = threading.Lock()
+
+    def tearDown(self):
+        shutil.rmtree(self._folder)
+
+    def _camera(self, path=None, **kwds):
+        camera = ReplayCamera('replay', path or self._cubePath, **kwds)
+        self.addCleanup(camera.deinitialize)
+        camera.registerCallback(self._callback)
+        return camera
+
+    def _callback(self, frame):
+        with self._mutex:
+            self._frames.append(frame)
+
+    def _waitFrames(self, nFrames):
+        def _received():
+            with self._mutex:
+                if len(self._frames) < nFrames:
+                    raise Exception('%d frames' % len(self._frames))
+        Poller(2).check(ExecutionProbe(_received))
+
+    def testGeometry(self):
+        camera = self._camera()
+        self.assertEqual(3, camera.rows())
+        self.assertEqual(4, camera.cols())
+        self.assertEqual(np.uint16, camera.dtype())
+        self.assertEqual(self.N_FRAMES, camera.getParameters()['nFrames'])
+
+    def testFramesAreViewsOfTheMappedCube(self):
+        camera = self._camera(frameRate=1000)
+        camera.startAcquisition()
+        self._waitFrames(self.N_FRAMES + 2)
+        camera.stopAcquisition()
+        for i, frame in enumerate(self._frames[:self.N_FRAMES + 2]):
+            self.assertEqual(i + 1, frame.counter())
+            np.testing.assert_array_equal(self._cube[i % self.N_FRAMES],
+                                          frame.toNumpyArray())
+        self.assertFalse(self._frames[0].toNumpyArray().flags.owndata)
+
+    def testStopsAtTheEndWithoutLoop(self):
+        camera = self._camera(frameRate=1000, loop=False)
+        camera.startAcquisition()
+        self._waitFrames(self.N_FRAMES)
+        time.sleep(0.05)
+        self.assertEqual(self.N_FRAMES, len(self._frames))
+
+    def testPlaysAtTheRecordedTimestamps(self):
+        timestamps = 100. + np.array([0., 0.01, 0.02, 0.15, 0.16])
+        timestampsPath = os.path.join(self._folder, 'timestamps.npy')
+        np.save(timestampsPath, timestamps)
+        camera = self._camera(timestampsPath=timestampsPath, loop=False)
+        self.assertAlmostEqual(4 / 0.16, camera.getFrameRate())
+        camera.startAcquisition()
+        self._waitFrames(self.N_FRAMES)
+        received = [frameTimestamps(f)['receive'] for f in self._frames]
+        self.assertGreater(received[3] - received[2], 0.1)
+        self.assertLess(received[2] - received[0], 0.1)
+        self.assertEqual([100.15, 100.16],
+                         [frameTimestamps(f)['device']
+                          for f in self._frames[3:]])
+
+    def testDirectoryOfFitsFrames(self):
+        folder = os.path.join(self._folder, 'frames')
+        os.makedirs(folder)
+        for i in range(3):
+            fits.writeto(os.path.join(folder, 'frame%02d.fits' % i),
+                         np.full((2, 2), i, dtype=np.float32))
+        camera = self._camera(folder)
+        self.assertEqual(3, camera.getParameters()['nFrames'])
+        np.testing.assert_array_equal(np.full((2, 2), 0), camera.readFrame())
+        np.testing.assert_array_equal(np.full((2, 2), 1), camera.readFrame())
+
+    def testUint16FitsCube(self):
+        path = os.path.join(self._folder, 'cube.fits')
+        fits.writeto(path, self._cube)
+        camera = self._camera(path)
+        self.assertEqual(np.uint16, camera.dtype())
+        self.assertEqual(self.N_FRAMES, camera.getParameters()['nFrames'])
+        np.testing.assert_array_equal(self._cube[0], camera.readFrame())
+        np.testing.assert_array_equal(self._cube[1], camera.readFrame())
+
+    def testParameters(self):
+        camera = self._camera()
+        camera.setParameter('position', 3)
+        np.testing.assert_array_equal(self._cube[3], camera.readFrame())
+        self.assertRaises(CameraException, camera.setParameter,
+                          'position', self.N_FRAMES)
+        self.assertRaises(CameraException, camera.setParameter,
+                          'recordedTimestamps', True)
+        self.assertRaises(CameraException, camera.setBinning, 2)
+        self.assertRaises(CameraException, camera.setParameter, 'foo', 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,12 @@
 #!/usr/bin/env python
+import time
 import unittest
 import numpy as np
 import logging
 from pysilico_server.devices.simulated_auxiliary_camera import \
     SimulatedAuxiliaryCamera
 from plico.utils.logger import Logger
+from pysilico_server.utils.frame_utils import frameTimestamps
 
 
 class SimulatedAuxiliaryCameraTest(unittest.TestCase):
@@ -50,6 +52,75 @@ class SimulatedAuxiliaryCameraTest(unittest.TestCase):
         self.assertEqual(self._camera.MAX_VALUE,
                          frame.max())
 
+    def testSeededNoiseIsReproducible(self):
+        self._camera.setFrameRate(1000)
+        self._camera.setSeed(7)
+        frames = [self._camera.readFrame() for _ in range(2)]
+        self.assertFalse(np.array_equal(frames[0], frames[1]))
+        self._camera.setSeed(7)
+        np.testing.assert_array_equal(frames[0], self._camera.readFrame())
+        other = SimulatedAuxiliaryCamera(seed=7)
+        self.addCleanup(other.deinitialize)
+        other.setFrameRate(1000)
+        np.testing.assert_array_equal(frames[0], other.readFrame())
+
+    def testNoiseBank(self):
+        self._camera.setFrameRate(1000)
+        self._camera.setNoiseInCount(100.)
+        self._camera.setNoiseBankSize(3)
+        self.assertEqual(3, self._camera.getNoiseBankSize())
+        f1 = self._camera.readFrame()
+        f2 = self._camera.readFrame()
+        self.assertAlmostEqual(100, np.std(f1[0:100, 0:100]), delta=3)
+        self.assertFalse(np.array_equal(f1, f2))
+        self.assertRaises(ValueError, self._camera.setNoiseBankSize, -1)
+
+    def testSceneIsCached(self):
+        self._camera.setFrameRate(1000)
+        self._camera.setNoiseInCount(0)
+        f1 = self._camera.readFrame()
+        scene = self._camera._getScene()
+        np.testing.assert_array_equal(f1, self._camera.readFrame())
+        self.assertIs(scene, self._camera._getScene())
+        self._camera.setBinning(2)
+        self.assertEqual((self._camera.rows(), self._camera.cols()),
+                         self._camera.readFrame().shape)
+
+    def testFramesAreProducedAtTheRequestedRate(self):
+        frames = []
+        self._camera.registerCallback(frames.append)
+        self._camera.setBinning(4)
+        self._camera.setFrameRate(200)
+        self._camera.startAcquisition()
+        time.sleep(0.5)
+        self._camera.stopAcquisition()
+        self.assertAlmostEqual(100, len(frames), delta=15)
+        stats = self._camera.getPacingStatistics()
+        self.assertEqual(200, stats['requestedFrameRate'])
+        self.assertEqual(0, stats['missedFrames'])
+
+    def testFramesAreComputedAndStampedAtTheirDeadline(self):
+        frames = []
+        self._camera.registerCallback(frames.append)
+        self._camera.setFrameRate(20)
+        self._camera.startAcquisition()
+        time.sleep(0.3)
+        self._camera.stopAcquisition()
+        received = [frameTimestamps(f)['receive'] for f in frames]
+        np.testing.assert_allclose(0.05, np.diff(received), atol=0.02)
+
+    def testReadFrameReturnsTheLatestFrameWhileAcquiring(self):
+        frames = []
+        self._camera.registerCallback(frames.append)
+        self._camera.setFrameRate(5)
+        self._camera.startAcquisition()
+        time.sleep(0.1)
+        t0 = time.time()
+        frame = self._camera.readFrame()
+        self.assertLess(time.time() - t0, 0.05)
+        self._camera.stopAcquisition()
+        np.testing.assert_array_equal(frames[-1].toNumpyArray(), frame)
+
 
 if __name__ == "__main__":
     unittest.main()
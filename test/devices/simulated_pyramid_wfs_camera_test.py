@@ -86,6 +86,43 @@ class SimulatedPyramidWfsCameraTest(unittest.TestCase):
         self.assertTrue(np.allclose(ttCoeff, ttFromFlux, rtol=0.05),
                         "Wanted %s, got %s" % (ttCoeff, ttFromFlux))
 
+    def testNoiselessFrameIsCachedUntilTheWavefrontChanges(self):
+        self._camera.setFrameRate(1000)
+        self._camera.setNoiseInCount(0)
+        frame = self._camera.readFrame()
+        noiseless = self._camera._getNoiselessFrame()
+        np.testing.assert_array_equal(frame, self._camera.readFrame())
+        self.assertIs(noiseless, self._camera._getNoiselessFrame())
+        self._camera.setWavefrontFromZernikeVector([0, 1e-6])
+        self.assertIsNot(noiseless, self._camera._getNoiselessFrame())
+        self.assertFalse(np.array_equal(frame, self._camera.readFrame()))
+        noiseless = self._camera._getNoiselessFrame()
+        exposureTime = self._camera.exposureTime()
+        self._camera.setExposureTime(2 * exposureTime)
+        np.testing.assert_allclose(2 * noiseless,
+                                   self._camera._getNoiselessFrame())
+
+    def testPupilImagesMatchTheLeastSquaresSolution(self):
+        wf = np.random.default_rng(1).normal(size=(20, 20)) * 1e-7
+        pupils = self._camera._pupilImagesFromWavefront(wf)
+        fluxes = np.array([pupils[0] + pupils[2], pupils[1] + pupils[3],
+                           pupils[2] + pupils[3], pupils[0] + pupils[1]])
+        (dyMap, dxMap) = np.gradient(
+            wf / self._camera.getScaleInMeterPerPixel())
+        sat = self._camera.getSlopeSaturationInRadians()
+        dx = 2. / np.pi * np.arcsin(dxMap.clip(-sat, sat) / sat)
+        np.testing.assert_allclose(0.5 * (1 - dx), fluxes[0], atol=1e-12)
+        np.testing.assert_allclose(0.5 * (1 + dx), fluxes[1], atol=1e-12)
+
+    def testNoiseOfBinnedFrames(self):
+        self._camera.setFrameRate(1000)
+        self._camera.setNoiseInCount(10.)
+        self._camera.setTotalFluxPerMilliSecond(0)
+        self._camera.setBinning(4)
+        frame = self._camera.readFrame().astype(float)
+        self.assertAlmostEqual(3 * 10. * 16, frame.mean(), delta=1)
+        self.assertAlmostEqual(10. * 4, frame.std(), delta=1)
+
     def _callback(self, frame):
         self._logger.debug('callback. Counter: %d' % frame.counter())
         self._lastFrameCounter = frame.counter()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+import time
+import unittest
+import numpy as np
+from pysilico_server.devices.abstract_camera import CameraException
+from pysilico_server.devices.synthetic_stress_camera import \
+    SyntheticStressCamera
+
+
+class SyntheticStressCameraTest(unittest.TestCase):
+
+    def setUp(self):
+        self._camera = SyntheticStressCamera(shape=(8, 6), dtype=np.float32,
+                                             nFrames=4, frameRate=5000,
+                                             seed=1)
+        self._frames = []
+        self._camera.registerCallback(self._frames.append)
+
+    def tearDown(self):
+        self._camera.deinitialize()
+
+    def testGeometry(self):
+        self.assertEqual(8, self._camera.rows())
+        self.assertEqual(6, self._camera.cols())
+        self.assertEqual(np.float32, self._camera.dtype())
+        self.assertEqual((8, 6), self._camera.readFrame().shape)
+
+    def testEmitsFramesOfTheRingAtTheRequestedRate(self):
+        self._camera.startAcquisition()
+        time.sleep(0.2)
+        self._camera.stopAcquisition()
+        nFrames = len(self._frames)
+        self.assertAlmostEqual(1000, nFrames, delta=150)
+        self.assertEqual(list(range(1, nFrames + 1)),
+                         [f.counter() for f in self._frames])
+        self.assertIs(self._frames[0].toNumpyArray().base,
+                      self._frames[4].toNumpyArray().base)
+        np.testing.assert_array_equal(self._frames[0].toNumpyArray(),
+                                      self._frames[4].toNumpyArray())
+        params = self._camera.getParameters()
+        self.assertEqual(5000, params['requestedFrameRate'])
+        self.assertAlmostEqual(5000, params['achievedFrameRate'],
+                               delta=750)
+        self.assertEqual(4, params['ringFrames'])
+
+    def testIntegerFrames(self):
+        camera = SyntheticStressCamera(shape=(4, 4), dtype=np.uint16)
+        self.addCleanup(camera.deinitialize)
+        frame = camera.readFrame()
+        self.assertEqual(np.uint16, frame.dtype)
+        self.assertLessEqual(frame.max(), 4095)
+
+    def testInvalidSettings(self):
+        self.assertRaises(CameraException, self._camera.setFrameRate, 0)
+        self.assertRaises(CameraException, self._camera.setBinning, 2)
+        self.assertRaises(CameraException, SyntheticStressCamera, nFrames=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+import importlib.util
+import unittest
+import numpy as np
+from pysilico_server.utils.frame_codec import FrameCodec, FrameDecoder
+from pysilico_server.utils.frame_protocol import FrameProtocol
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+def _header(array, counter, codec, reference):
+    return FrameProtocol.decodeHeader(FrameProtocol.encodeHeader(
+        array, counter, 0., codec=codec, reference=reference))
+
+
+class FrameCodecTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        self._frames = [rng.integers(0, 4096, (16, 20), dtype=np.uint16)
+                        for _ in range(2)]
+        self._frames += [self._frames[1] ^ 1, np.zeros((16, 20), np.uint16)]
+
+    def _roundTrip(self, codec, frames):
+        decoder = FrameDecoder()
+        res = []
+        for counter, frame in enumerate(frames):
+            payload, reference = codec.encode(frame, counter)
+            res.append(decoder.decode(
+                _header(frame, counter, codec.name(), reference), payload))
+        return res
+
+    def _checkLossless(self, codec, frames):
+        for frame, decoded in zip(frames, self._roundTrip(codec, frames)):
+            np.testing.assert_array_equal(frame, decoded)
+            self.assertEqual(frame.dtype, decoded.dtype)
+
+    def testLosslessWithAllOptions(self):
+        for name in ('none', 'zlib', 'zlib+shuffle', 'zlib+delta',
+                     'zlib+shuffle+delta', 'none+shuffle+delta'):
+            self._checkLossless(FrameCodec.fromName(name), self._frames)
+
+    def testLosslessWithOtherDtypes(self):
+        rng = np.random.default_rng(2)
+        for dtype in (np.int16, np.uint8, np.float32):
+            frames = [rng.normal(0, 100, (8, 6)).astype(dtype)
+                      for _ in range(3)]
+            self._checkLossless(FrameCodec.fromName('zlib+shuffle+delta'),
+                                frames)
+
+    def testDeltaCompressesStaticFrames(self):
+        codec = FrameCodec.fromName('zlib+shuffle+delta')
+        payload, reference = codec.encode(self._frames[0], 0)
+        self.assertIsNone(reference)
+        deltaPayload, reference = codec.encode(self._frames[0], 1)
+        self.assertEqual(0, reference)
+        self.assertLess(len(deltaPayload) * 10, len(payload))
+
+    def testKeyframeInterval(self):
+        codec = FrameCodec('zlib', delta=True, keyframeInterval=2)
+        references = [codec.encode(self._frames[0], i)[1] for i in range(5)]
+        self.assertEqual([None, 0, None, 2, None], references)
+        self.assertEqual(3, codec.getStatistics()['keyframes'])
+
+    def testShapeChangeForcesAKeyframe(self):
+        codec = FrameCodec('zlib', delta=True)
+        codec.encode(self._frames[0], 0)
+        self.assertIsNone(codec.encode(self._frames[0][:4], 1)[1])
+
+    def testDecoderWaitsForAKeyframe(self):
+        codec = FrameCodec('zlib', delta=True, keyframeInterval=3)
+        encoded = [codec.encode(self._frames[0], i) for i in range(4)]
+        decoder = FrameDecoder()
+        decoded = [decoder.decode(_header(self._frames[0], i, codec.name(),
+                                          encoded[i][1]), encoded[i][0])
+                   for i in range(1, 4)]
+        self.assertIsNone(decoded[0])
+        self.assertIsNone(decoded[1])
+        np.testing.assert_array_equal(self._frames[0], decoded[2])
+
+    def testStatistics(self):
+        codec = FrameCodec.fromName('zlib+shuffle')
+        codec.encode(np.zeros((100, 100), np.uint16), 0)
+        stats = codec.getStatistics()
+        self.assertEqual('zlib+shuffle', stats['codec'])
+        self.assertEqual(20000, stats['rawBytes'])
+        self.assertGreater(stats['compressionRatio'], 50)
+
+    def testInvalidCodecs(self):
+        self.assertRaises(ValueError, FrameCodec.fromName, 'foo')
+        self.assertRaises(ValueError, FrameCodec.fromName, 'zlib+foo')
+        self.assertRaises(ValueError, FrameCodec, 'zlib', keyframeInterval=0)
+
+    @unittest.skipIf(importlib.util.find_spec('lz4') is None,
+                     'lz4 not installed')
+    def testLz4(self):
+        self._checkLossless(FrameCodec.fromName('lz4+shuffle+delta'),
+                            self._frames)
+
+    @unittest.skipIf(importlib.util.find_spec('zstandard') is None,
+                     'zstandard not installed')
+    def testZstd(self):
+        self._checkLossless(FrameCodec.fromName('zstd+shuffle+delta'),
+                            self._frames)
+
+    def testFrameProtocolRoundTrip(self):
+        codec = FrameCodec.fromName('zlib+shuffle+delta')
+        decoder = FrameDecoder()
+        for counter, array in enumerate(self._frames):
+            parts = FrameProtocol.encodeCompressed(
+                cameraFrameFromArray(array, counter), codec, topic='remote')
+            self.assertEqual(b'remote', parts[0])
+            frame, header = FrameProtocol.decode(parts, decoder)
+            self.assertEqual(FrameProtocol.VERSION_COMPRESSED,
+                             header['version'])
+            self.assertEqual(codec.name(), header['codec'])
+            self.assertEqual(counter, frame.counter())
+            np.testing.assert_array_equal(array, frame.toNumpyArray())
+        self.assertRaises(ValueError, FrameProtocol.decode, parts)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+import unittest
+import numpy as np
+import zmq
+from pysilico.types.camera_frame import CameraFrame
+from pysilico_server.utils.frame_protocol import FrameProtocol
+from pysilico_server.utils.frame_utils import cameraFrameFromArray
+
+
+class FrameProtocolTest(unittest.TestCase):
+
+    def setUp(self):
+        self._context = zmq.Context()
+        self._sender = self._context.socket(zmq.PAIR)
+        self._receiver = self._context.socket(zmq.PAIR)
+        self._sender.bind('inproc://frames')
+        self._receiver.connect('inproc://frames')
+
+    def tearDown(self):
+        self._sender.close()
+        self._receiver.close()
+        self._context.term()
+
+    def _roundTrip(self, frame, protocol, topic=None, copy=True):
+        FrameProtocol.send(self._sender, frame, protocol, topic,
+                           timestamp=12.5, copy=copy)
+        return self._receiver.recv_multipart(copy=False)
+
+    def testRawRoundTripPreservesArrayAndHeader(self):
+        array = np.arange(24, dtype=np.int32).reshape((4, 6)) - 5
+        parts = self._roundTrip(cameraFrameFromArray(array, 42),
+                                FrameProtocol.RAW, copy=False)
+        self.assertEqual(2, len(parts))
+        frame, header = FrameProtocol.decode(parts)
+        np.testing.assert_array_equal(array, frame.toNumpyArray())
+        self.assertEqual(np.int32, frame.toNumpyArray().dtype)
+        self.assertEqual(42, frame.counter())
+        self.assertEqual(12.5, header['timestamp'])
+        self.assertEqual((4, 6), header['shape'])
+
+    def testRawNonContiguousArrayOnTopic(self):
+        array = np.arange(48, dtype=np.uint16).reshape((6, 8))[1:4, 2:5]
+        parts = self._roundTrip(cameraFrameFromArray(array, 1),
+                                FrameProtocol.RAW, topic='pupil')
+        self.assertEqual(b'pupil', parts[0].bytes)
+        frame, header = FrameProtocol.decode(parts)
+        np.testing.assert_array_equal(array, frame.toNumpyArray())
+        self.assertEqual('pupil', header['roiId'])
+
+    def testPickleIsTheLegacySinglePartMessage(self):
+        frame = CameraFrame(np.ones((3, 3)), counter=7)
+        parts = self._roundTrip(frame, FrameProtocol.PICKLE)
+        self.assertEqual(1, len(parts))
+        decoded, header = FrameProtocol.decode(parts)
+        self.assertIsNone(header)
+        self.assertEqual(frame, decoded)
+
+    def testUnknownVersionIsRejected(self):
+        header = bytearray(FrameProtocol.encodeHeader(np.zeros(3), 0, 0.))
+        header[4] = FrameProtocol.VERSION + 1
+        self.assertRaises(ValueError, FrameProtocol.decodeHeader,
+                          bytes(header))
+        self.assertRaises(ValueError, FrameProtocol.checkProtocol, 'foo')
+
+
+if __name__ == "__main__":
+    unittest.main()
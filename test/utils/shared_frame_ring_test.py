@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+import os
+import unittest
+import numpy as np
+from pysilico_server.utils.shared_frame_ring import SharedFrameRing
+
+
+class SharedFrameRingTest(unittest.TestCase):
+
+    def setUp(self):
+        self._name = 'pysilico_test_%d' % os.getpid()
+        self._writer = SharedFrameRing.create(self._name, 3, 1000)
+        self._reader = SharedFrameRing.attach(self._name)
+
+    def tearDown(self):
+        self._reader.close()
+        self._writer.close()
+
+    def testReaderSeesTheWrittenFrameWithoutCopy(self):
+        array = np.arange(12, dtype=np.int32).reshape((3, 4))
+        notification = self._writer.write(array, 7, 1.5)
+        slot, sequence, counter = SharedFrameRing.decodeNotification(
+            notification)
+        self.assertEqual(7, counter)
+        view, counter, timestamp, _ = self._reader.read(slot, sequence)
+        np.testing.assert_array_equal(array, view)
+        self.assertEqual(np.int32, view.dtype)
+        self.assertEqual((7, 1.5), (counter, timestamp))
+        self.assertFalse(view.flags.writeable)
+        del view
+
+    def testOverwrittenSlotsAreDetected(self):
+        first = SharedFrameRing.decodeNotification(
+            self._writer.write(np.zeros(4), 1, 0.))
+        res = self._reader.read(first[0], first[1])
+        for i in range(3):
+            self._writer.write(np.full(4, i + 2.), i + 2, 0.)
+        self.assertFalse(self._reader.isValid(first[0], res[3]))
+        self.assertIsNone(self._reader.read(first[0], first[1]))
+        self.assertIsNone(self._reader.readCopy(first[0], first[1]))
+        res = None
+        slot, sequence, _ = SharedFrameRing.decodeNotification(
+            self._writer.write(np.full(4, 9.), 9, 0.))
+        copied, counter, _, _ = self._reader.readCopy(slot, sequence)
+        np.testing.assert_array_equal(np.full(4, 9.), copied)
+
+    def testFramesLargerThanASlotAreNotWritten(self):
+        self.assertEqual(1024, self._writer.slotBytes())
+        self.assertIsNone(self._writer.write(np.zeros(200), 1, 0.))
+
+    def testEmptySlotCannotBeRead(self):
+        self.assertIsNone(self._reader.read(0))
+
+
+if __name__ == "__main__":
+    unittest.main()